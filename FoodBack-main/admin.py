@@ -0,0 +1,454 @@
+import base64
+import json
+from datetime import datetime, timedelta
+from flask import Blueprint, Response, request, jsonify, stream_with_context, current_app
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from extensions import db
+from models import (
+    Empresa, ONG, Credencial, Doacao, Solicitacao, DoacaoArquivada, SolicitacaoArquivada, MensagemOutbox
+)
+from contas import invalidar_conta
+from banco import somente_leitura
+from estatisticas import consultar, DIMENSOES, DIMENSOES_POR_EVENTO
+from metricas import metricas
+from cache import estatisticas_catalogo
+from compressao import estatisticas_compressao
+from limitador import estatisticas_limitador
+from outbox import estatisticas_outbox
+from idempotencia import estatisticas_idempotencia
+from arquivamento import com_historico
+from serializers import (
+    consulta_doacoes, consulta_solicitacoes, linha_doacao_to_dict, linha_solicitacao_to_dict, stream_json_array,
+    stream_ndjson, stream_csv, CAMPOS_DOACAO, CAMPOS_SOLICITACAO
+)
+
+# ------------------------------
+# Criação do Blueprint de Administração
+# ------------------------------
+admin_bp = Blueprint('admin', __name__, url_prefix='/api/admin')
+
+LIMITE_PADRAO = 50
+LIMITE_MAXIMO = 500
+LOTE_APROVACAO_MAXIMO = 1000
+
+# Tipo de conta -> (modelo, coluna de ID, coluna de nome)
+CONTAS = {
+    "empresa": (Empresa, Empresa.id_empresa, Empresa.nome_empresa),
+    "ong": (ONG, ONG.id_ong, ONG.nome_ong),
+}
+
+
+def is_admin():
+    current_user = get_jwt_identity()
+    return current_user.get("tipo") == "admin"
+
+
+# ------------------------------
+# Fila de contas pendentes
+# ------------------------------
+def codificar_cursor(data_cadastro, tipo, id_usuario):
+    bruto = json.dumps([data_cadastro.isoformat(), tipo, id_usuario])
+    return base64.urlsafe_b64encode(bruto.encode('utf-8')).decode('ascii')
+
+
+def decodificar_cursor(cursor):
+    try:
+        data_iso, tipo, id_usuario = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return datetime.fromisoformat(data_iso), tipo, int(id_usuario)
+    except Exception as e:
+        raise ValueError("Cursor inválido") from e
+
+
+def _pendentes_do_tipo(tipo, limite, cursor):
+    """Até `limite` contas pendentes do tipo, em ordem (data_cadastro, tipo, id), após o cursor.
+
+    Cada tipo é uma leitura de faixa no índice (is_approved, rejeitado_em, data_cadastro, id);
+    contas rejeitadas saem da fila.
+    """
+    modelo, coluna_id, coluna_nome = CONTAS[tipo]
+    query = db.session.query(coluna_id, coluna_nome, modelo.email, modelo.cnpj, modelo.data_cadastro) \
+        .filter(modelo.is_approved == False, modelo.rejeitado_em.is_(None))
+
+    if cursor:
+        cursor_data, cursor_tipo, cursor_id = cursor
+        if tipo > cursor_tipo:
+            query = query.filter(modelo.data_cadastro >= cursor_data)
+        elif tipo < cursor_tipo:
+            query = query.filter(modelo.data_cadastro > cursor_data)
+        else:
+            query = query.filter(db.or_(
+                modelo.data_cadastro > cursor_data,
+                db.and_(modelo.data_cadastro == cursor_data, coluna_id > cursor_id),
+            ))
+
+    linhas = query.order_by(modelo.data_cadastro, coluna_id).limit(limite).all()
+    return [
+        {
+            "tipo": tipo,
+            "id": linha[0],
+            "nome": linha[1],
+            "email": linha.email,
+            "cnpj": linha.cnpj,
+            "data_cadastro": linha.data_cadastro.isoformat() if linha.data_cadastro else None,
+            "_ordem": (linha.data_cadastro, tipo, linha[0]),
+        }
+        for linha in linhas
+    ]
+
+
+@admin_bp.route('/pendentes', methods=['GET'])
+@jwt_required()
+@somente_leitura
+def listar_pendentes():
+    """Fila paginada (cursor) de Empresas e ONGs aguardando aprovação, das mais antigas às mais novas.
+
+    Parâmetros (query string): tipo (empresa|ong, padrão ambos), limite, cursor.
+    """
+    if not is_admin():
+        return jsonify({"msg": "Acesso negado. Somente Administradores."}), 403
+
+    tipo = request.args.get("tipo")
+    if tipo and tipo not in CONTAS:
+        return jsonify({"msg": "Tipo de usuário inválido"}), 400
+    tipos = [tipo] if tipo else sorted(CONTAS)
+
+    try:
+        limite = min(max(int(request.args.get("limite", LIMITE_PADRAO)), 1), LIMITE_MAXIMO)
+        cursor = decodificar_cursor(request.args["cursor"]) if request.args.get("cursor") else None
+    except ValueError:
+        return jsonify({"msg": "Parâmetros 'limite' ou 'cursor' inválidos."}), 400
+
+    # Busca limite+1 de cada tipo e intercala: a página nunca precisa de mais que isso
+    contas = []
+    for t in tipos:
+        contas.extend(_pendentes_do_tipo(t, limite + 1, cursor))
+    contas.sort(key=lambda c: c["_ordem"])
+
+    proximo_cursor = None
+    if len(contas) > limite:
+        contas = contas[:limite]
+        proximo_cursor = codificar_cursor(*contas[-1]["_ordem"])
+
+    for conta in contas:
+        del conta["_ordem"]
+    return jsonify({"pendentes": contas, "proximo_cursor": proximo_cursor})
+
+
+# ------------------------------
+# Aprovação / rejeição em lote
+# ------------------------------
+def aplicar_aprovacao(tipo, ids, aprovado):
+    """Aplica is_approved a todos os IDs existentes do tipo com um UPDATE por tabela (sem commit).
+
+    Rejeitar também grava rejeitado_em, que tira a conta da fila de pendentes; aprovar limpa.
+    Retorna o conjunto de IDs encontrados.
+    """
+    modelo, coluna_id, _ = CONTAS[tipo]
+    encontrados = {id_usuario for (id_usuario,) in db.session.query(coluna_id).filter(coluna_id.in_(ids))}
+    if encontrados:
+        db.session.query(modelo).filter(coluna_id.in_(encontrados)).update(
+            {"is_approved": aprovado, "rejeitado_em": None if aprovado else datetime.utcnow()},
+            synchronize_session=False
+        )
+        # Mesma regra de credenciais.definir_aprovacao: versão nova só se a aprovação mudou
+        Credencial.query.filter(Credencial.tipo == tipo, Credencial.id_usuario.in_(encontrados),
+                                Credencial.is_approved != aprovado).update(
+            {"is_approved": aprovado, "versao": Credencial.versao + 1}, synchronize_session=False
+        )
+    return encontrados
+
+
+@admin_bp.route('/approve/lote', methods=['POST'])
+@jwt_required()
+def aprovar_em_lote():
+    """Aprova ou rejeita várias contas numa única transação.
+
+    Corpo: {"acao": "aprovar"|"rejeitar", "empresas": [ids], "ongs": [ids]}.
+    Rejeitar retira a aprovação (e invalida os tokens já emitidos) da conta e a tira da fila de pendentes.
+    """
+    if not is_admin():
+        return jsonify({"msg": "Acesso negado. Somente Administradores."}), 403
+
+    data = request.json or {}
+    acao = data.get("acao")
+    if acao not in ("aprovar", "rejeitar"):
+        return jsonify({"msg": "Ação inválida. Use 'aprovar' ou 'rejeitar'."}), 400
+
+    pedidos = {"empresa": data.get("empresas") or [], "ong": data.get("ongs") or []}
+    try:
+        pedidos = {tipo: [int(i) for i in ids] for tipo, ids in pedidos.items()}
+    except (TypeError, ValueError):
+        return jsonify({"msg": "Os IDs devem ser números inteiros."}), 400
+
+    if sum(len(ids) for ids in pedidos.values()) > LOTE_APROVACAO_MAXIMO:
+        return jsonify({"msg": f"Máximo de {LOTE_APROVACAO_MAXIMO} contas por requisição."}), 400
+
+    aprovado = acao == "aprovar"
+    encontrados = {}
+    try:
+        for tipo, ids in pedidos.items():
+            if ids:
+                encontrados[tipo] = aplicar_aprovacao(tipo, ids, aprovado)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"msg": f"Erro ao aplicar a aprovação em lote. Detalhe: {e}"}), 500
+
+    status_ok = "aprovado" if aprovado else "rejeitado"
+    resultados = []
+    for tipo, ids in pedidos.items():
+        for id_usuario in ids:
+            ok = id_usuario in encontrados.get(tipo, ())
+            if ok:
+                invalidar_conta(tipo, id_usuario)
+            resultados.append({"tipo": tipo, "id": id_usuario, "status": status_ok if ok else "nao_encontrado"})
+
+    return jsonify({"acao": acao, "resultados": resultados})
+
+
+# ------------------------------
+# Estatísticas (resumo incremental)
+# ------------------------------
+@admin_bp.route('/estatisticas', methods=['GET'])
+@jwt_required()
+@somente_leitura
+def estatisticas():
+    """Totais de doações e quantidades por empresa, ONG ou tipo de alimento.
+
+    Parâmetros (query string): dimensao (empresa|ong|tipo), evento (criada|reservada|removida|expirada),
+    de, ate (YYYY-MM-DD), chave (filtra um grupo), por_dia (1 para separar por dia).
+    """
+    if not is_admin():
+        return jsonify({"msg": "Acesso negado. Somente Administradores."}), 403
+
+    args = request.args
+    dimensao = args.get("dimensao", "tipo")
+    evento = args.get("evento", "criada")
+    if dimensao not in DIMENSOES or evento not in DIMENSOES_POR_EVENTO:
+        return jsonify({"msg": "Parâmetros 'dimensao' ou 'evento' inválidos."}), 400
+
+    try:
+        de = datetime.strptime(args["de"], '%Y-%m-%d').date() if args.get("de") else None
+        ate = datetime.strptime(args["ate"], '%Y-%m-%d').date() if args.get("ate") else None
+    except ValueError:
+        return jsonify({"msg": "Formato de data inválido. Use YYYY-MM-DD."}), 400
+
+    return jsonify({
+        "dimensao": dimensao,
+        "evento": evento,
+        "grupos": consultar(dimensao, evento, de, ate, args.get("chave"), args.get("por_dia") == "1"),
+    })
+
+
+# ------------------------------
+# Métricas (formato Prometheus) e requisições lentas
+# ------------------------------
+@admin_bp.route('/metrics', methods=['GET'])
+@jwt_required()
+def exportar_metricas():
+    """Métricas por endpoint deste processo no formato texto do Prometheus."""
+    if not is_admin():
+        return jsonify({"msg": "Acesso negado. Somente Administradores."}), 403
+
+    cache = estatisticas_catalogo()
+    extras = [
+        ("foodback_catalogo_cache_entradas", "gauge", "Respostas no cache do catálogo.", cache["entradas"]),
+        ("foodback_catalogo_cache_acertos_total", "counter", "Acertos no cache do catálogo.", cache["acertos"]),
+        ("foodback_catalogo_cache_falhas_total", "counter", "Falhas no cache do catálogo.", cache["falhas"]),
+        ("foodback_catalogo_cache_despejos_total", "counter", "Despejos do cache do catálogo.", cache["despejos"]),
+    ]
+    comprimidos = estatisticas_compressao()
+    extras += [
+        ("foodback_compressao_cache_entradas", "gauge", "Corpos comprimidos em cache.", comprimidos["entradas"]),
+        ("foodback_compressao_cache_acertos_total", "counter", "Corpos comprimidos reaproveitados.",
+         comprimidos["acertos"]),
+        ("foodback_compressao_cache_falhas_total", "counter", "Corpos comprimidos gerados.", comprimidos["falhas"]),
+    ]
+    rejeicoes = estatisticas_limitador(current_app)
+    extras += [
+        (f"foodback_limitador_rejeicoes_{motivo}_total", "counter",
+         f"Requisições de login/registro recusadas com 429 (limite por {motivo}).", total)
+        for motivo, total in rejeicoes.items()
+    ]
+    idempotencia = estatisticas_idempotencia(current_app)
+    if idempotencia is not None:
+        extras += [
+            ("foodback_idempotencia_chaves", "gauge", "Chaves de idempotência guardadas neste processo.",
+             idempotencia["chaves"]),
+            ("foodback_idempotencia_executadas_total", "counter", "Escritas com Idempotency-Key executadas.",
+             idempotencia["executadas"]),
+            ("foodback_idempotencia_repetidas_total", "counter", "Repetições respondidas com a resposta guardada.",
+             idempotencia["repetidas"]),
+            ("foodback_idempotencia_esperaram_total", "counter",
+             "Repetições que esperaram a primeira execução terminar.", idempotencia["esperaram"]),
+            ("foodback_idempotencia_conflitos_total", "counter", "Chaves reusadas com outro corpo (422).",
+             idempotencia["conflitos"]),
+            ("foodback_idempotencia_em_andamento_total", "counter",
+             "Repetições recusadas com 409 por a primeira não ter terminado a tempo.", idempotencia["em_andamento"]),
+        ]
+    outbox = estatisticas_outbox(current_app)
+    if outbox is not None:
+        extras += [
+            ("foodback_outbox_pendentes", "gauge", "Mensagens da outbox esperando entrega.", outbox["pendentes"]),
+            ("foodback_outbox_mortas", "gauge", "Mensagens da outbox que esgotaram as tentativas.",
+             outbox["mortas_na_fila"]),
+            ("foodback_outbox_expandidas_total", "counter", "Entregas geradas a partir de mudanças de doação.",
+             outbox["expandidas"]),
+            ("foodback_outbox_entregues_total", "counter", "Notificações entregues.", outbox["entregues"]),
+            ("foodback_outbox_falhas_total", "counter", "Tentativas de entrega que falharam.", outbox["falhas"]),
+            ("foodback_outbox_lotes_total", "counter", "Lotes reservados pelos entregadores.", outbox["lotes"]),
+            ("foodback_outbox_entrega_segundos_total", "counter", "Tempo gasto nas entregas bem-sucedidas.",
+             outbox["segundos_entrega"]),
+        ]
+    return Response(metricas.texto_prometheus(extras), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+
+@admin_bp.route('/outbox', methods=['GET'])
+@jwt_required()
+def situacao_outbox():
+    """Contadores dos entregadores de notificações e as últimas mensagens que esgotaram as tentativas."""
+    if not is_admin():
+        return jsonify({"msg": "Acesso negado. Somente Administradores."}), 403
+
+    estatisticas = estatisticas_outbox(current_app)
+    if estatisticas is None:
+        return jsonify({"msg": "Notificações desligadas (NOTIFICACAO_DESTINO vazio)."}), 404
+
+    mortas = (
+        db.session.query(MensagemOutbox.id_mensagem, MensagemOutbox.evento, MensagemOutbox.id_ong,
+                         MensagemOutbox.tentativas, MensagemOutbox.ultimo_erro, MensagemOutbox.criada_em)
+        .filter(MensagemOutbox.status == 'morta')
+        .order_by(MensagemOutbox.id_mensagem.desc())
+        .limit(LIMITE_PADRAO)
+    )
+    estatisticas["ultimas_mortas"] = [
+        dict(linha._mapping, criada_em=linha.criada_em.isoformat()) for linha in mortas
+    ]
+    return jsonify(estatisticas)
+
+
+@admin_bp.route('/metrics/lentas', methods=['GET'])
+@jwt_required()
+def requisicoes_lentas():
+    """Últimas requisições acima de SLOW_REQUEST_MS, com a lista de consultas de cada uma."""
+    if not is_admin():
+        return jsonify({"msg": "Acesso negado. Somente Administradores."}), 403
+    return jsonify({"limite_ms": metricas.limite_lenta_ms, "requisicoes": list(metricas.lentas)})
+
+
+# ------------------------------
+# Listagens completas e exportação (stream)
+# ------------------------------
+# O corpo é escrito aos poucos enquanto o cursor do servidor é lido em lotes (yield_per),
+# então nem a lista de linhas nem o corpo inteiro ficam em memória.
+FORMATOS_EXPORTACAO = {
+    "csv": "text/csv",  # o werkzeug acrescenta charset=utf-8
+    "ndjson": "application/x-ndjson",
+}
+
+
+def _ler_periodo(args):
+    """(de, ate) da query string como datetimes [de, ate + 1 dia). Lança ValueError se malformados."""
+    de = datetime.strptime(args["de"], '%Y-%m-%d') if args.get("de") else None
+    ate = datetime.strptime(args["ate"], '%Y-%m-%d') + timedelta(days=1) if args.get("ate") else None
+    return de, ate
+
+
+def _consulta_doacoes_admin(args, de=None, ate=None):
+    """Doações em ordem de ID com os filtros da query string (status, id_empresa, id_ong, historico)."""
+    def montar(origem):
+        consulta = consulta_doacoes(origem)
+        if args.get("status"):
+            consulta = consulta.filter(origem.status == args["status"])
+        if args.get("id_empresa", type=int):
+            consulta = consulta.filter(origem.id_empresa == args.get("id_empresa", type=int))
+        if args.get("id_ong", type=int):
+            consulta = consulta.filter(origem.id_ong_recebedora == args.get("id_ong", type=int))
+        if de:
+            consulta = consulta.filter(origem.data_criacao >= de)
+        if ate:
+            consulta = consulta.filter(origem.data_criacao < ate)
+        return consulta
+
+    return com_historico(montar, args.get("historico") == "1", Doacao, DoacaoArquivada).order_by(Doacao.id_doacao)
+
+
+def _consulta_solicitacoes_admin(args, de=None, ate=None):
+    """Solicitações em ordem de ID com os filtros da query string (status, id_ong, historico)."""
+    def montar(origem):
+        consulta = consulta_solicitacoes(origem)
+        if args.get("status"):
+            consulta = consulta.filter(origem.status == args["status"])
+        if args.get("id_ong", type=int):
+            consulta = consulta.filter(origem.id_ong == args.get("id_ong", type=int))
+        if de:
+            consulta = consulta.filter(origem.data_criacao >= de)
+        if ate:
+            consulta = consulta.filter(origem.data_criacao < ate)
+        return consulta
+
+    return com_historico(montar, args.get("historico") == "1", Solicitacao, SolicitacaoArquivada) \
+        .order_by(Solicitacao.id_solicitacao)
+
+
+@admin_bp.route('/doacoes', methods=['GET'])
+@jwt_required()
+@somente_leitura
+def listar_todas_doacoes():
+    """Todas as doações, em ordem de ID. Filtros opcionais: status, id_empresa, id_ong, historico=1."""
+    if not is_admin():
+        return jsonify({"msg": "Acesso negado. Somente Administradores."}), 403
+
+    consulta = _consulta_doacoes_admin(request.args)
+    return Response(stream_with_context(stream_json_array(consulta, linha_doacao_to_dict)),
+                    mimetype='application/json')
+
+
+@admin_bp.route('/solicitacoes', methods=['GET'])
+@jwt_required()
+@somente_leitura
+def listar_todas_solicitacoes():
+    """Todas as solicitações, em ordem de ID. Filtros opcionais: status, id_ong, historico=1."""
+    if not is_admin():
+        return jsonify({"msg": "Acesso negado. Somente Administradores."}), 403
+
+    consulta = _consulta_solicitacoes_admin(request.args)
+    return Response(stream_with_context(stream_json_array(consulta, linha_solicitacao_to_dict)),
+                    mimetype='application/json')
+
+
+@admin_bp.route('/exportar/<tabela>', methods=['GET'])
+@jwt_required()
+@somente_leitura
+def exportar(tabela):
+    """Relatório de doações ou solicitações em CSV ou NDJSON, enviado aos pedaços (chunked).
+
+    Parâmetros (query string): formato (csv|ndjson), de, ate (YYYY-MM-DD, pela data de criação),
+    status, id_empresa (só doações), id_ong, historico (1 para incluir o arquivo).
+    """
+    if not is_admin():
+        return jsonify({"msg": "Acesso negado. Somente Administradores."}), 403
+
+    if tabela == "doacoes":
+        montar, campos, serializar = _consulta_doacoes_admin, CAMPOS_DOACAO, linha_doacao_to_dict
+    elif tabela == "solicitacoes":
+        montar, campos, serializar = _consulta_solicitacoes_admin, CAMPOS_SOLICITACAO, linha_solicitacao_to_dict
+    else:
+        return jsonify({"msg": "Use /exportar/doacoes ou /exportar/solicitacoes."}), 404
+
+    formato = request.args.get("formato", "csv")
+    if formato not in FORMATOS_EXPORTACAO:
+        return jsonify({"msg": f"Formato inválido. Use um de: {', '.join(FORMATOS_EXPORTACAO)}."}), 400
+    try:
+        de, ate = _ler_periodo(request.args)
+    except ValueError:
+        return jsonify({"msg": "Formato de data inválido. Use YYYY-MM-DD."}), 400
+
+    consulta = montar(request.args, de, ate)
+    if formato == "csv":
+        corpo = stream_csv(consulta, campos, serializar)
+    else:
+        corpo = stream_ndjson(consulta, serializar)
+    nome = f"{tabela}-{datetime.utcnow():%Y%m%d-%H%M%S}.{formato}"
+    return Response(stream_with_context(corpo), mimetype=FORMATOS_EXPORTACAO[formato],
+                    headers={"Content-Disposition": f'attachment; filename="{nome}"'})
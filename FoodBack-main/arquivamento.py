@@ -0,0 +1,139 @@
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from extensions import db
+from models import Doacao, Solicitacao, DoacaoArquivada, SolicitacaoArquivada
+
+# ------------------------------
+# ARQUIVAMENTO DE DOAÇÕES E SOLICITAÇÕES ENCERRADAS (tabelas quentes x arquivo)
+# ------------------------------
+# Doações e solicitações em estado final ficam para sempre em `doacao`/`solicitacao` e pesam em
+# toda listagem, índice e backup. Depois de ARQUIVO_IDADE_DIAS elas são movidas para
+# `doacao_arquivo`/`solicitacao_arquivo` (mesmas colunas, ver models.py), em lotes no estilo da
+# varredura de expiração: SELECT dos IDs na faixa do índice (status, data_criacao), INSERT ... SELECT
+# no arquivo e DELETE na tabela quente com a mesma condição, tudo na transação do lote.
+#
+# As leituras só consultam o arquivo quando o histórico é pedido (?historico=1): com_historico()
+# junta a consulta da tabela quente e a do arquivo num UNION ALL.
+#
+# Configuração (app.config):
+#   ARQUIVO_IDADE_DIAS  idade mínima para arquivar: desde a criação e desde o encerramento (doações:
+#                       data_status, a última mudança de status; sem ela, a última atualização)
+#   ARQUIVO_LOTE        linhas por transação
+#   ARQUIVO_INTERVALO   segundos entre execuções da thread; 0 desliga (use `flask arquivar` via cron)
+
+ARQUIVO_IDADE_PADRAO = 180
+ARQUIVO_LOTE_PADRAO = 500
+
+# 'solicitada' é o estado final de uma doação reservada enquanto não há etapa de conclusão
+STATUS_DOACAO_ARQUIVAVEIS = ('concluida', 'expirada', 'solicitada')
+STATUS_SOLICITACAO_ARQUIVAVEIS = ('atendida', 'cancelada', 'expirada')
+
+logger = logging.getLogger(__name__)
+
+
+def _mover_em_lotes(modelo, arquivo, coluna_id, condicao, ordem, tamanho_lote, agora):
+    """Move em lotes as linhas de `modelo` que atendem `condicao` para `arquivo`. Retorna (linhas, lotes)."""
+    nomes = [coluna.name for coluna in modelo.__table__.columns]
+    total = 0
+    lotes = 0
+    while True:
+        ids = [i for (i,) in db.session.query(coluna_id).filter(*condicao).order_by(ordem).limit(tamanho_lote)]
+        if not ids:
+            break
+
+        # A condição é repetida no INSERT e no DELETE: uma linha que mudou desde o SELECT fica onde está
+        origem = db.select(*modelo.__table__.columns, db.literal(agora, db.DateTime)) \
+            .where(coluna_id.in_(ids), *condicao)
+        db.session.execute(db.insert(arquivo.__table__).from_select(nomes + ['arquivada_em'], origem))
+        resultado = db.session.execute(
+            db.delete(modelo).where(coluna_id.in_(ids), *condicao).execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        total += resultado.rowcount
+        lotes += 1
+        if len(ids) < tamanho_lote:
+            break
+    return total, lotes
+
+
+def arquivar(idade_dias=ARQUIVO_IDADE_PADRAO, tamanho_lote=ARQUIVO_LOTE_PADRAO, agora=None):
+    """Executa um arquivamento completo e retorna as métricas da execução. Precisa de app context."""
+    agora = agora or datetime.utcnow()
+    limite = agora - timedelta(days=idade_dias)
+    inicio = time.perf_counter()
+
+    # Doações primeiro: uma solicitação só sai da tabela quente quando nenhuma doação viva aponta para ela
+    doacoes, lotes_doacoes = _mover_em_lotes(
+        Doacao, DoacaoArquivada, Doacao.id_doacao,
+        (Doacao.status.in_(STATUS_DOACAO_ARQUIVAVEIS), Doacao.data_criacao < limite,
+         # Reservada ontem não é antiga, mesmo que criada há meses
+         db.func.coalesce(Doacao.data_status, Doacao.data_atualizacao, Doacao.data_criacao) < limite),
+        Doacao.data_criacao, tamanho_lote, agora)
+
+    vinculada = db.session.query(Doacao.id_doacao) \
+        .filter(Doacao.id_solicitacao == Solicitacao.id_solicitacao).exists()
+    solicitacoes, lotes_solicitacoes = _mover_em_lotes(
+        Solicitacao, SolicitacaoArquivada, Solicitacao.id_solicitacao,
+        (Solicitacao.status.in_(STATUS_SOLICITACAO_ARQUIVAVEIS), Solicitacao.data_criacao < limite, ~vinculada),
+        Solicitacao.data_criacao, tamanho_lote, agora)
+
+    return {
+        "doacoes_arquivadas": doacoes,
+        "solicitacoes_arquivadas": solicitacoes,
+        "lotes": lotes_doacoes + lotes_solicitacoes,
+        "duracao_s": round(time.perf_counter() - inicio, 4),
+    }
+
+
+def com_historico(montar, historico, modelo, arquivo):
+    """`montar(origem)` monta a consulta sobre a tabela `modelo` ou `arquivo`.
+
+    Sem histórico, só a tabela quente. Com histórico, UNION ALL das duas; filtros e ordenação
+    encadeados depois usam as colunas de `modelo`.
+    """
+    consulta = montar(modelo)
+    if historico:
+        consulta = consulta.union_all(montar(arquivo))
+    return consulta
+
+
+class Arquivador(threading.Thread):
+    """Thread daemon que roda arquivar a cada `intervalo` segundos e acumula métricas."""
+
+    def __init__(self, app, intervalo, idade_dias=ARQUIVO_IDADE_PADRAO, tamanho_lote=ARQUIVO_LOTE_PADRAO):
+        super().__init__(name="arquivador", daemon=True)
+        self.app = app
+        self.intervalo = intervalo
+        self.idade_dias = idade_dias
+        self.tamanho_lote = tamanho_lote
+        self._parar = threading.Event()
+        self.execucoes = 0
+        self.total_doacoes = 0
+        self.total_solicitacoes = 0
+        self.ultima_execucao = None
+
+    def run(self):
+        while not self._parar.is_set():
+            try:
+                with self.app.app_context():
+                    metricas = arquivar(self.idade_dias, self.tamanho_lote)
+                self.execucoes += 1
+                self.total_doacoes += metricas["doacoes_arquivadas"]
+                self.total_solicitacoes += metricas["solicitacoes_arquivadas"]
+                self.ultima_execucao = metricas
+                logger.info("Arquivamento: %s", metricas)
+            except Exception:
+                logger.exception("Falha no arquivamento")
+            self._parar.wait(self.intervalo)
+
+    def parar(self):
+        self._parar.set()
+
+
+def iniciar_arquivador(app):
+    arquivador = Arquivador(app, app.config["ARQUIVO_INTERVALO"], app.config["ARQUIVO_IDADE_DIAS"],
+                            app.config["ARQUIVO_LOTE"])
+    arquivador.start()
+    return arquivador
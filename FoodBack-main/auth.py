@@ -1,8 +1,16 @@
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import create_access_token
+from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
 # Importa as extensões do arquivo neutro extensions.py
-from extensions import db, bcrypt 
-from models import Admin, Empresa, ONG # Importa os modelos
+from extensions import db
+from models import Empresa, ONG # Importa os modelos
+from credenciais import (
+    buscar_credencial, registrar_credencial, gerar_hash, verificar_senha,
+    precisa_rehash, atualizar_hash, hash_ficticio
+)
+from contas import claims_da_conta
+from limitador import limitar
+from geo import resolver_localizacao, indice_geo
+from cache import invalidar_catalogo
 
 # Criação do Blueprint de Autenticação
 auth_bp = Blueprint('auth', __name__, url_prefix='/api/auth')
@@ -11,6 +19,7 @@ auth_bp = Blueprint('auth', __name__, url_prefix='/api/auth')
 # Registro de Usuários
 # ------------------------------
 @auth_bp.route('/register', methods=['POST'])
+@limitar("registro")
 def register():
     data = request.json
     nome = data.get("nome")
@@ -25,7 +34,17 @@ def register():
     if not nome or not email or not senha:
           return jsonify({"msg": "Dados obrigatórios (nome, email, senha) faltando."}), 400
 
-    hashed_password = bcrypt.generate_password_hash(senha).decode('utf-8')
+    # O email é único entre todos os tipos de conta (índice unificado de credenciais)
+    if buscar_credencial(email):
+        return jsonify({"msg": "Erro: Email já está cadastrado."}), 400
+
+    # Localização opcional: latitude/longitude ou o endereço na tabela local de geocodificação
+    try:
+        localizacao = resolver_localizacao(data) or (None, None)
+    except ValueError as e:
+        return jsonify({"msg": str(e)}), 400
+
+    hashed_password = gerar_hash(senha)
     user = None
     
     try:
@@ -39,6 +58,9 @@ def register():
                 email=email,
                 senha=hashed_password,
                 cnpj=cnpj,
+                endereco=data.get("endereco"),
+                latitude=localizacao[0],
+                longitude=localizacao[1],
                 is_approved=False
             )
         
@@ -52,11 +74,18 @@ def register():
                 email=email,
                 senha=hashed_password,
                 cnpj=cnpj,
+                endereco=data.get("endereco"),
+                latitude=localizacao[0],
+                longitude=localizacao[1],
                 is_approved=False
             )
         
         db.session.add(user)
+        db.session.flush()  # Obtém o ID do novo usuário para a credencial
+        registrar_credencial(email, tipo, user.get_id(), hashed_password, is_approved=False)
         db.session.commit()
+        if tipo == "empresa":
+            indice_geo.mover_empresa(user.id_empresa, user.latitude, user.longitude)
         return jsonify({"msg": f"{tipo.capitalize()} registrado com sucesso. Aguarde aprovação do admin!"}), 201
         
     except Exception as e:
@@ -69,6 +98,7 @@ def register():
 # Login
 # ------------------------------
 @auth_bp.route('/login', methods=['POST'])
+@limitar("login")
 def login():
     data = request.json
     email = data.get("email")
@@ -77,38 +107,74 @@ def login():
     if not email or not senha:
         return jsonify({"msg": "Email e senha são obrigatórios."}), 400
         
-    user = None
-    tipo = None
-    
-    # 1. Tentar Admin
-    admin = Admin.query.filter_by(email=email).first()
-    if admin and bcrypt.check_password_hash(admin.senha, senha):
-        user = admin
-        tipo = "admin"
-    
-    # 2. Tentar Empresa
-    if not user:
-        empresa = Empresa.query.filter_by(email=email).first()
-        if empresa and bcrypt.check_password_hash(empresa.senha, senha):
-            if not empresa.is_approved:
-                return jsonify({"msg": "Empresa aguardando aprovação do administrador"}), 403
-            user = empresa
-            tipo = "empresa"
-    
-    # 3. Tentar ONG
+    # Uma consulta indexada e exatamente uma verificação bcrypt (contra um hash fictício se o
+    # email não existe, para o tempo de resposta não revelar quais emails estão cadastrados)
+    credencial = buscar_credencial(email)
+    valida = verificar_senha(credencial.senha if credencial else hash_ficticio(), senha)
+    if not credencial or not valida:
+        return jsonify({"msg": "Credenciais inválidas"}), 401
+
+    tipo = credencial.tipo
+    if tipo == "empresa" and not credencial.is_approved:
+        return jsonify({"msg": "Empresa aguardando aprovação do administrador"}), 403
+    if tipo == "ong" and not credencial.is_approved:
+        return jsonify({"msg": "ONG aguardando aprovação do administrador"}), 403
+
+    # Rehash transparente quando o fator de custo configurado mudou
+    if precisa_rehash(credencial.senha):
+        atualizar_hash(credencial, gerar_hash(senha))
+        db.session.commit()
+
+    # Cria o token com a ID correta e o tipo de usuário
+    # A aprovação e a versão da conta vão como claims para as rotas não consultarem o banco
+    access_token = create_access_token(
+        identity={"id": credencial.id_usuario, "tipo": tipo},
+        additional_claims=claims_da_conta(credencial)
+    )
+    return jsonify(access_token=access_token, user_type=tipo) # Retorna user_type para o cliente
+
+
+# ------------------------------
+# Localização da conta (Empresa/ONG)
+# ------------------------------
+@auth_bp.route('/localizacao', methods=['PUT'])
+@jwt_required()
+def atualizar_localizacao():
+    """Atualiza endereço e coordenadas da própria conta.
+
+    Corpo: latitude e longitude, ou só endereco (resolvido pela tabela local de geocodificação).
+    """
+    current_user = get_jwt_identity()
+    tipo = current_user.get("tipo")
+    if tipo == "empresa":
+        user = db.session.get(Empresa, current_user["id"])
+    elif tipo == "ong":
+        user = db.session.get(ONG, current_user["id"])
+    else:
+        return jsonify({"msg": "Apenas Empresas e ONGs têm localização."}), 403
     if not user:
-        ong = ONG.query.filter_by(email=email).first()
-        if ong and bcrypt.check_password_hash(ong.senha, senha):
-            if not ong.is_approved:
-                return jsonify({"msg": "ONG aguardando aprovação do administrador"}), 403
-            user = ong
-            tipo = "ong"
-            
-    if user:
-        # Cria o token com a ID correta e o tipo de usuário
-        access_token = create_access_token(
-            identity={"id": user.get_id(), "tipo": tipo}
-        )
-        return jsonify(access_token=access_token, user_type=tipo) # Retorna user_type para o cliente
-
-    return jsonify({"msg": "Credenciais inválidas"}), 401
+        return jsonify({"msg": "Conta não encontrada."}), 404
+
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({"msg": "Corpo da requisição deve ser um objeto JSON."}), 400
+    if data.get("endereco") is not None and not isinstance(data["endereco"], str):
+        return jsonify({"msg": "O campo 'endereco' deve ser texto."}), 400
+    try:
+        localizacao = resolver_localizacao(data)
+    except ValueError as e:
+        return jsonify({"msg": str(e)}), 400
+    if localizacao is None:
+        return jsonify({"msg": "Endereço não encontrado na tabela de geocodificação. Informe latitude e longitude."}), 400
+
+    if "endereco" in data:
+        user.endereco = data["endereco"]
+    user.latitude, user.longitude = localizacao
+    db.session.commit()
+
+    if tipo == "empresa":
+        # As doações da empresa mudam de lugar junto com ela
+        indice_geo.mover_empresa(user.id_empresa, user.latitude, user.longitude)
+        invalidar_catalogo()
+    return jsonify({"msg": "Localização atualizada.", "endereco": user.endereco,
+                    "latitude": user.latitude, "longitude": user.longitude})
@@ -0,0 +1,40 @@
+import random
+from functools import wraps
+from flask import g, has_app_context, current_app
+from flask_sqlalchemy.session import Session
+
+# ------------------------------
+# ROTEAMENTO DE LEITURAS PARA RÉPLICAS
+# ------------------------------
+# Endpoints marcados com @somente_leitura mandam seus SELECTs para uma das réplicas
+# configuradas (REPLICA_BINDS, ver config.py), sempre a mesma durante a requisição.
+# Escritas, flushes e todo o resto continuam no primário. Sem réplicas, nada muda.
+
+
+class SessaoRoteada(Session):
+    """Session do Flask-SQLAlchemy que escolhe a réplica em requisições somente leitura."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and getattr(clause, 'is_select', False):
+            replica = _replica_da_requisicao()
+            if replica is not None:
+                return self._db.engines[replica]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def _replica_da_requisicao():
+    if not has_app_context() or not g.get('somente_leitura'):
+        return None
+    if 'replica' not in g:
+        replicas = current_app.config.get('REPLICA_BINDS') or []
+        g.replica = random.choice(replicas) if replicas else None
+    return g.replica
+
+
+def somente_leitura(f):
+    """Marca o endpoint como somente leitura: suas consultas podem ir para uma réplica."""
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        g.somente_leitura = True
+        return f(*args, **kwargs)
+    return decorated
@@ -0,0 +1,326 @@
+import os
+import sys
+import argparse
+import json
+import platform
+import random
+import subprocess
+import tempfile
+import time
+from collections import Counter
+from datetime import date, datetime, timedelta
+
+# Adiciona o diretório do projeto ao PATH
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(RAIZ)
+
+
+# ------------------------------
+# BENCHMARK DOS ENDPOINTS (app real + Flask test client)
+# ------------------------------
+# Monta o app de app.py contra um SQLite temporário (ou o banco de --db), popula volumes
+# configuráveis de Empresa, ONG, Doacao e Solicitacao com um gerador determinístico (--semente)
+# e mede cada endpoint: p50/p95/p99, vazão e número de consultas SQL por requisição.
+# O resultado sai em JSON (--saida) para comparar entre commits (--comparar base.json).
+#
+#   python benchmarks/bench_endpoints.py --doacoes 50000 --saida atual.json --comparar base.json
+
+TIPOS = ["arroz", "feijão", "leite", "pão", "frutas", "legumes", "carne", "óleo", "açúcar", "café",
+         "macarrão", "farinha", "ovos", "queijo", "iogurte", "biscoito", "enlatados", "verduras"]
+UNIDADES = ["kg", "g", "litros", "unidades", "caixas", "pacotes"]
+SENHA = "senha-benchmark"
+# Região onde ficam as empresas sintéticas (busca por proximidade)
+CENTRO = (-23.55, -46.63)
+ESPALHAMENTO = 0.5
+
+
+def percentil(amostras, p):
+    ordenadas = sorted(amostras)
+    return ordenadas[min(int(len(ordenadas) * p / 100), len(ordenadas) - 1)]
+
+
+def commit_atual():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=RAIZ,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# ------------------------------
+# GERADOR DE DADOS
+# ------------------------------
+def popular(db, args, senha_hash):
+    """Insere os volumes pedidos em blocos (Core executemany). Mesma semente, mesmos dados."""
+    from models import Empresa, ONG, Doacao, Solicitacao, Credencial
+    from quantidades import interpretar_quantidade
+
+    rnd = random.Random(args.semente)
+    # Gerador próprio para as coordenadas: o resto dos dados continua igual ao de execuções antigas
+    rnd_geo = random.Random(args.semente + 2)
+    agora = datetime(2025, 1, 1)
+    hoje = date.today()
+
+    def inserir(modelo, linhas):
+        for i in range(0, len(linhas), 5000):
+            db.session.execute(db.insert(modelo), linhas[i:i + 5000])
+
+    inserir(Empresa, [
+        {"id_empresa": i, "nome_empresa": f"Empresa {i}", "email": f"empresa{i}@bench", "cnpj": f"E{i:013d}",
+         "senha": senha_hash, "is_approved": True, "data_cadastro": agora,
+         "latitude": CENTRO[0] + rnd_geo.uniform(-ESPALHAMENTO, ESPALHAMENTO),
+         "longitude": CENTRO[1] + rnd_geo.uniform(-ESPALHAMENTO, ESPALHAMENTO)}
+        for i in range(1, args.empresas + 1)
+    ])
+    inserir(ONG, [
+        {"id_ong": i, "nome_ong": f"ONG {i}", "email": f"ong{i}@bench", "cnpj": f"O{i:013d}",
+         "senha": senha_hash, "is_approved": True, "data_cadastro": agora}
+        for i in range(1, args.ongs + 1)
+    ])
+    inserir(Credencial, [
+        {"email": f"empresa{i}@bench", "tipo": "empresa", "id_usuario": i, "senha": senha_hash,
+         "is_approved": True, "versao": 1}
+        for i in range(1, args.empresas + 1)
+    ] + [
+        {"email": f"ong{i}@bench", "tipo": "ong", "id_usuario": i, "senha": senha_hash,
+         "is_approved": True, "versao": 1}
+        for i in range(1, args.ongs + 1)
+    ])
+
+    doacoes = []
+    for i in range(1, args.doacoes + 1):
+        quantidade = f"{rnd.randint(1, 500)} {rnd.choice(UNIDADES)}"
+        valor, unidade = interpretar_quantidade(quantidade)
+        # ~70% disponíveis; o resto já reservado por alguma ONG
+        disponivel = rnd.random() < 0.7
+        doacoes.append({
+            "titulo": f"Doação {i} de {rnd.choice(TIPOS)}",
+            "descricao": "Gerada pelo benchmark",
+            "tipo_alimento": rnd.choice(TIPOS),
+            "quantidade": quantidade,
+            "quantidade_valor": valor,
+            "quantidade_unidade": unidade,
+            "data_disponibilidade": hoje,
+            "data_validade": hoje + timedelta(days=rnd.randint(1, 120)),
+            "status": "disponivel" if disponivel else "solicitada",
+            "data_criacao": agora + timedelta(seconds=i),
+            "id_empresa": rnd.randint(1, args.empresas),
+            "id_ong_recebedora": None if disponivel else rnd.randint(1, args.ongs),
+        })
+    inserir(Doacao, doacoes)
+
+    solicitacoes = []
+    for i in range(1, args.solicitacoes + 1):
+        quantidade = f"{rnd.randint(1, 200)} {rnd.choice(UNIDADES)}"
+        valor, unidade = interpretar_quantidade(quantidade)
+        solicitacoes.append({
+            "titulo": f"Necessidade {i}",
+            "item_necessario": rnd.choice(TIPOS),
+            "quantidade_necessaria": quantidade,
+            "quantidade_necessaria_valor": valor,
+            "quantidade_necessaria_unidade": unidade,
+            "data_limite": hoje + timedelta(days=rnd.randint(1, 60)),
+            "status": "aberta",
+            "id_ong": rnd.randint(1, args.ongs),
+        })
+    inserir(Solicitacao, solicitacoes)
+    db.session.commit()
+
+    ids_disponiveis = [i for (i,) in db.session.query(Doacao.id_doacao).filter(Doacao.status == 'disponivel')]
+    tipos_usados = sorted({d["tipo_alimento"] for d in doacoes})
+    return ids_disponiveis, tipos_usados
+
+
+# ------------------------------
+# MEDIÇÃO
+# ------------------------------
+class ContadorConsultas:
+    """Conta as consultas SQL executadas em todas as engines (primário e réplicas)."""
+
+    def __init__(self, engines):
+        from sqlalchemy import event
+        self.total = 0
+        for engine in engines:
+            event.listen(engine, "before_cursor_execute", self._contar)
+
+    def _contar(self, *args):
+        self.total += 1
+
+
+def medir(nome, cliente, contador, requisicoes, antes=None):
+    """Executa as requisições [(método, url, kwargs)] e devolve as métricas do endpoint."""
+    tempos = []
+    consultas = []
+    status = Counter()
+    inicio_total = time.perf_counter()
+    for metodo, url, kwargs in requisicoes:
+        if antes:
+            antes()
+        consultas_antes = contador.total
+        inicio = time.perf_counter()
+        resposta = cliente.open(url, method=metodo, **kwargs)
+        tempos.append((time.perf_counter() - inicio) * 1000)
+        consultas.append(contador.total - consultas_antes)
+        status[resposta.status_code] += 1
+    duracao = time.perf_counter() - inicio_total
+
+    resultado = {
+        "requisicoes": len(tempos),
+        "p50_ms": round(percentil(tempos, 50), 3),
+        "p95_ms": round(percentil(tempos, 95), 3),
+        "p99_ms": round(percentil(tempos, 99), 3),
+        "media_ms": round(sum(tempos) / len(tempos), 3),
+        "max_ms": round(max(tempos), 3),
+        "vazao_rps": round(len(tempos) / duracao, 1),
+        "consultas_media": round(sum(consultas) / len(consultas), 2),
+        "consultas_max": max(consultas),
+        "status": {str(codigo): n for codigo, n in sorted(status.items())},
+    }
+    print(f"{nome:<24} n={resultado['requisicoes']:>5}  p50={resultado['p50_ms']:8.2f}ms  "
+          f"p95={resultado['p95_ms']:8.2f}ms  p99={resultado['p99_ms']:8.2f}ms  "
+          f"{resultado['vazao_rps']:8.1f} req/s  consultas={resultado['consultas_media']:.1f}  "
+          f"status={resultado['status']}")
+    return resultado
+
+
+def comparar(atual, caminho_base):
+    with open(caminho_base, encoding='utf-8') as f:
+        base = json.load(f)
+    print(f"\nComparação com {caminho_base} (commit {base['meta'].get('commit')}):")
+    for nome, metricas in atual["endpoints"].items():
+        anterior = base["endpoints"].get(nome)
+        if not anterior:
+            continue
+        variacao = (metricas["p95_ms"] - anterior["p95_ms"]) / anterior["p95_ms"] * 100 if anterior["p95_ms"] else 0
+        print(f"{nome:<24} p95 {anterior['p95_ms']:8.2f} -> {metricas['p95_ms']:8.2f}ms ({variacao:+6.1f}%)  "
+              f"consultas {anterior['consultas_media']:.1f} -> {metricas['consultas_media']:.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark dos endpoints com dados sintéticos.")
+    parser.add_argument("--empresas", type=int, default=200)
+    parser.add_argument("--ongs", type=int, default=200)
+    parser.add_argument("--doacoes", type=int, default=20_000)
+    parser.add_argument("--solicitacoes", type=int, default=5_000)
+    parser.add_argument("--requisicoes", type=int, default=300, help="requisições medidas por endpoint")
+    parser.add_argument("--logins", type=int, default=30, help="requisições medidas no login (bcrypt é caro)")
+    parser.add_argument("--bcrypt-rounds", type=int, default=12, help="custo bcrypt (o de produção é 12)")
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--db", help="URL do banco (padrão: SQLite temporário). O banco é recriado!")
+    parser.add_argument("--saida", help="arquivo JSON com o resultado")
+    parser.add_argument("--comparar", help="JSON de uma execução anterior para comparar")
+    args = parser.parse_args()
+
+    url = args.db or "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench.db")
+    os.environ["DATABASE_URL"] = url
+
+    from app import create_app
+    # Sem controle de admissão: todos os logins saem do mesmo "IP" do test client
+    app = create_app({"BCRYPT_LOG_ROUNDS": args.bcrypt_rounds, "VARREDOR_INTERVALO": 0,
+                      "LIMITE_HABILITADO": False})
+    from extensions import db
+    from credenciais import gerar_hash
+    from cache import invalidar_catalogo
+
+    rnd = random.Random(args.semente + 1)
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        inicio = time.perf_counter()
+        ids_disponiveis, tipos = popular(db, args, gerar_hash(SENHA))
+        print(f"Banco: {url}  (populado em {time.perf_counter() - inicio:.1f}s)")
+        contador = ContadorConsultas(db.engines.values())
+
+    cliente = app.test_client()
+
+    def token(email):
+        resposta = cliente.post('/api/auth/login', json={"email": email, "senha": SENHA})
+        return {"Authorization": "Bearer " + resposta.get_json()["access_token"]}
+
+    tokens_ong = [token(f"ong{i}@bench") for i in rnd.sample(range(1, args.ongs + 1), min(10, args.ongs))]
+    tokens_empresa = [token(f"empresa{i}@bench")
+                      for i in rnd.sample(range(1, args.empresas + 1), min(10, args.empresas))]
+
+    # Páginas seguintes usam cursores reais, obtidos percorrendo a listagem antes da medição
+    cursores = [None]
+    resposta = cliente.get('/api/doacoes/disponiveis?limite=50', headers=tokens_ong[0])
+    for _ in range(20):
+        proximo = resposta.get_json().get("proximo_cursor")
+        if not proximo:
+            break
+        cursores.append(proximo)
+        resposta = cliente.get(f'/api/doacoes/disponiveis?limite=50&cursor={proximo}', headers=tokens_ong[0])
+
+    def url_disponiveis():
+        partes = ["limite=50"]
+        cursor = rnd.choice(cursores)
+        if cursor:
+            partes.append(f"cursor={cursor}")
+        elif rnd.random() < 0.5:
+            partes.append(f"tipo_alimento={rnd.choice(tipos)}")
+        return '/api/doacoes/disponiveis?' + '&'.join(partes)
+
+    def url_proximas():
+        lat = CENTRO[0] + rnd.uniform(-ESPALHAMENTO, ESPALHAMENTO)
+        lon = CENTRO[1] + rnd.uniform(-ESPALHAMENTO, ESPALHAMENTO)
+        filtro = rnd.choice(["raio_km=5", "proximas=50", "raio_km=10&limite=50"])
+        return f'/api/doacoes/disponiveis?{filtro}&lat={lat:.5f}&lon={lon:.5f}'
+
+    def sem_cache():
+        with app.app_context():
+            invalidar_catalogo()
+
+    n = args.requisicoes
+    reservas = rnd.sample(ids_disponiveis, min(n, len(ids_disponiveis)))
+    emails = [f"ong{rnd.randint(1, args.ongs)}@bench" for _ in range(args.logins)]
+
+    print()
+    endpoints = {
+        "auth.login": medir("auth.login", cliente, contador, [
+            ('POST', '/api/auth/login', {"json": {"email": email, "senha": SENHA}}) for email in emails
+        ]),
+        "disponiveis": medir("disponiveis", cliente, contador, [
+            ('GET', url_disponiveis(), {"headers": rnd.choice(tokens_ong)}) for _ in range(n)
+        ]),
+        "disponiveis_sem_cache": medir("disponiveis_sem_cache", cliente, contador, [
+            ('GET', url_disponiveis(), {"headers": rnd.choice(tokens_ong)}) for _ in range(n)
+        ], antes=sem_cache),
+        "minhas_doacoes": medir("minhas_doacoes", cliente, contador, [
+            ('GET', '/api/doacoes/minhas', {"headers": rnd.choice(tokens_empresa)}) for _ in range(n)
+        ]),
+        "disponiveis_proximas": medir("disponiveis_proximas", cliente, contador, [
+            ('GET', url_proximas(), {"headers": rnd.choice(tokens_ong)}) for _ in range(n)
+        ]),
+        "solicitar_doacao": medir("solicitar_doacao", cliente, contador, [
+            ('POST', f'/api/solicitacoes/{doacao_id}', {"headers": rnd.choice(tokens_ong)}) for doacao_id in reservas
+        ]),
+    }
+
+    resultado = {
+        "meta": {
+            "commit": commit_atual(),
+            "data": datetime.now().isoformat(timespec='seconds'),
+            "python": platform.python_version(),
+            "banco": url.split(':', 1)[0],
+            "semente": args.semente,
+            "bcrypt_rounds": args.bcrypt_rounds,
+            "volumes": {
+                "empresas": args.empresas,
+                "ongs": args.ongs,
+                "doacoes": args.doacoes,
+                "solicitacoes": args.solicitacoes,
+            },
+        },
+        "endpoints": endpoints,
+    }
+
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as f:
+            json.dump(resultado, f, ensure_ascii=False, indent=2)
+        print(f"\nResultado gravado em {args.saida}")
+    if args.comparar:
+        comparar(resultado, args.comparar)
+
+
+if __name__ == '__main__':
+    main()
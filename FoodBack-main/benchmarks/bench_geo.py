@@ -0,0 +1,110 @@
+import os
+import sys
+import argparse
+import random
+import time
+
+# Adiciona o diretório do projeto ao PATH
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from geo import IndiceGeo, distancia_km
+
+
+# ------------------------------
+# BENCHMARK DO ÍNDICE GEOGRÁFICO (sem banco)
+# ------------------------------
+# Espalha N doações disponíveis entre empresas numa região (padrão: uma caixa em volta da Grande
+# São Paulo, com parte das empresas concentrada no centro) e mede a busca por raio e pelas N mais
+# próximas no índice em grade contra a varredura completa (distância de todas + ordenação), que é
+# o que a listagem faria sem índice. Cada resposta do índice é conferida com a da varredura.
+
+CENTRO = (-23.55, -46.63)
+ESPALHAMENTO = 0.6  # graus em volta do centro
+
+
+def percentil(amostras, p):
+    ordenadas = sorted(amostras)
+    return ordenadas[min(int(len(ordenadas) * p / 100), len(ordenadas) - 1)]
+
+
+def medir(nome, funcao, argumentos):
+    tempos = []
+    for args in argumentos:
+        inicio = time.perf_counter()
+        funcao(*args)
+        tempos.append((time.perf_counter() - inicio) * 1e6)
+    print(f"{nome:<28} n={len(tempos):>6}  p50={percentil(tempos, 50):9.1f}µs  "
+          f"p95={percentil(tempos, 95):9.1f}µs  p99={percentil(tempos, 99):9.1f}µs")
+
+
+def ponto(rnd):
+    # 30% das empresas no centro expandido, o resto espalhado pela região
+    raio = ESPALHAMENTO / 6 if rnd.random() < 0.3 else ESPALHAMENTO
+    return CENTRO[0] + rnd.uniform(-raio, raio), CENTRO[1] + rnd.uniform(-raio, raio)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark da busca por proximidade.")
+    parser.add_argument("--doacoes", type=int, default=100_000)
+    parser.add_argument("--empresas", type=int, default=5_000)
+    parser.add_argument("--consultas", type=int, default=500)
+    parser.add_argument("--raio", type=float, default=5.0, help="raio das buscas por raio, em km")
+    parser.add_argument("--proximas", type=int, default=50)
+    parser.add_argument("--celula", type=float, default=None, help="lado da célula em graus")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rnd = random.Random(args.seed)
+    indice = IndiceGeo(args.celula) if args.celula else IndiceGeo()
+    indice.carregado = True  # Populado à mão, sem banco
+
+    empresas = {i: ponto(rnd) for i in range(1, args.empresas + 1)}
+    doacoes = [(i, rnd.randint(1, args.empresas)) for i in range(1, args.doacoes + 1)]
+
+    inicio = time.perf_counter()
+    for id_empresa, (lat, lon) in empresas.items():
+        indice.mover_empresa(id_empresa, lat, lon)
+    for id_doacao, id_empresa in doacoes:
+        indice.atualizar_doacao({"id_doacao": id_doacao, "id_empresa": id_empresa, "status": "disponivel"})
+    print(f"Carga de {args.doacoes} doações em {args.empresas} empresas: {time.perf_counter() - inicio:.2f}s  "
+          f"{indice.estatisticas()}")
+
+    def varredura(lat, lon, raio_km=None, limite=None):
+        """Sem índice: distância de todas as doações, ordena e corta."""
+        todas = []
+        for id_doacao, id_empresa in doacoes:
+            e_lat, e_lon = empresas[id_empresa]
+            distancia = distancia_km(lat, lon, e_lat, e_lon)
+            if raio_km is None or distancia <= raio_km:
+                todas.append((distancia, -id_doacao))
+        todas.sort()
+        return [(d, -i) for d, i in (todas[:limite] if limite else todas)]
+
+    origens = [ponto(rnd) for _ in range(args.consultas)]
+
+    # Confere o índice contra a varredura antes de medir
+    for lat, lon in origens[:20]:
+        esperado = varredura(lat, lon, args.raio)
+        obtido, _ = indice.proximas(lat, lon, args.raio)
+        assert [i for _, i in obtido] == [i for _, i in esperado], "busca por raio divergiu da varredura"
+        esperado = varredura(lat, lon, limite=args.proximas)
+        obtido, _ = indice.proximas(lat, lon, minimo=args.proximas)
+        assert [i for _, i in obtido[:args.proximas]] == [i for _, i in esperado], "N mais próximas divergiu"
+    print("Resultados do índice conferem com a varredura completa.\n")
+
+    amostra = origens[:max(1, args.consultas // 10)]  # A varredura é lenta: mede menos vezes
+    medir(f"raio {args.raio:g}km (índice)", lambda la, lo: indice.proximas(la, lo, args.raio), origens)
+    medir(f"raio {args.raio:g}km (varredura)", lambda la, lo: varredura(la, lo, args.raio), amostra)
+    medir(f"{args.proximas} mais próximas (índice)",
+          lambda la, lo: indice.proximas(la, lo, minimo=args.proximas), origens)
+    medir(f"{args.proximas} mais próximas (varr.)",
+          lambda la, lo: varredura(la, lo, limite=args.proximas), amostra)
+
+    ids = rnd.sample(range(1, args.doacoes + 1), min(args.consultas, args.doacoes))
+    medir("remover_doacao", indice.remover_doacao, [(i,) for i in ids])
+    medir("mover_empresa", indice.mover_empresa,
+          [(rnd.randint(1, args.empresas), *ponto(rnd)) for _ in range(args.consultas)])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+import os
+import sys
+import argparse
+import random
+import time
+from datetime import date, timedelta
+
+# Adiciona o diretório do projeto ao PATH
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from matching import IndiceCompatibilidade
+
+
+# ------------------------------
+# BENCHMARK DO ÍNDICE DE COMPATIBILIDADE (sem banco)
+# ------------------------------
+# Popula o índice direto em memória com N solicitações abertas e N doações disponíveis
+# e mede as duas consultas e as atualizações incrementais.
+
+TIPOS = [f"tipo {i}" for i in range(60)]
+
+
+def percentil(amostras, p):
+    ordenadas = sorted(amostras)
+    return ordenadas[min(int(len(ordenadas) * p / 100), len(ordenadas) - 1)]
+
+
+def medir(nome, funcao, argumentos):
+    tempos = []
+    for args in argumentos:
+        inicio = time.perf_counter()
+        funcao(*args)
+        tempos.append((time.perf_counter() - inicio) * 1e6)
+    print(f"{nome:<28} n={len(tempos):>6}  p50={percentil(tempos, 50):8.1f}µs  "
+          f"p95={percentil(tempos, 95):8.1f}µs  p99={percentil(tempos, 99):8.1f}µs")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do índice de compatibilidade.")
+    parser.add_argument("--registros", type=int, default=100_000, help="solicitações e doações abertas (cada)")
+    parser.add_argument("--ongs", type=int, default=10_000)
+    parser.add_argument("--consultas", type=int, default=5_000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rnd = random.Random(args.seed)
+    hoje = date(2026, 1, 1)
+    indice = IndiceCompatibilidade()
+    indice.carregado = True  # Populado à mão, sem banco
+
+    inicio = time.perf_counter()
+    for i in range(1, args.registros + 1):
+        indice.atualizar_solicitacao({
+            "id_solicitacao": i, "titulo": f"Solicitação {i}", "item_necessario": rnd.choice(TIPOS),
+            "quantidade_necessaria": "10 kg", "data_limite": hoje + timedelta(days=rnd.randint(0, 90)),
+            "id_ong": rnd.randint(1, args.ongs), "status": "aberta",
+        })
+        indice.atualizar_doacao({
+            "id_doacao": i, "titulo": f"Doação {i}", "tipo_alimento": rnd.choice(TIPOS), "quantidade": "5 kg",
+            "data_validade": hoje + timedelta(days=rnd.randint(0, 60)), "data_disponibilidade": None,
+            "id_empresa": rnd.randint(1, 1000), "status": "disponivel",
+        })
+    print(f"Carga de {args.registros} solicitações + {args.registros} doações: {time.perf_counter() - inicio:.2f}s")
+
+    medir("solicitacoes_para_doacao", lambda t: indice.solicitacoes_para_doacao(t, hoje=hoje),
+          [(rnd.choice(TIPOS),) for _ in range(args.consultas)])
+    medir("doacoes_para_ong", lambda o: indice.doacoes_para_ong(o, hoje=hoje),
+          [(rnd.randint(1, args.ongs),) for _ in range(args.consultas)])
+
+    ids = rnd.sample(range(1, args.registros + 1), min(args.consultas, args.registros))
+    medir("remover_doacao", indice.remover_doacao, [(i,) for i in ids])
+    medir("atualizar_solicitacao", indice.atualizar_solicitacao, [({
+        "id_solicitacao": i, "titulo": "x", "item_necessario": rnd.choice(TIPOS), "quantidade_necessaria": "1",
+        "data_limite": hoje + timedelta(days=rnd.randint(0, 90)), "id_ong": 1, "status": "aberta",
+    },) for i in ids])
+
+
+if __name__ == '__main__':
+    main()
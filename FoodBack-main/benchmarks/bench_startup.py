@@ -0,0 +1,104 @@
+import os
+import sys
+import argparse
+import json
+import statistics
+import subprocess
+import tempfile
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+# ------------------------------
+# BENCHMARK DE INICIALIZAÇÃO (importação, create_app, primeira requisição)
+# ------------------------------
+# Cada repetição roda num interpretador novo (sem módulos em cache) e mede, em sequência:
+#   import_app        importar o módulo app (só a fábrica)
+#   create_app_cli    create_app(com_rotas=False), o caminho dos scripts e comandos de CLI
+#   create_app        create_app() completo, com blueprints (processo separado)
+#   primeira_req      primeira requisição autenticada depois do create_app
+#   primeira_req_fork primeira requisição num processo filho de um app pré-carregado
+#                     (gunicorn --preload): o filho herda tudo já importado
+
+MEDICAO = r'''
+import json, os, sys, time
+sys.path.insert(0, {raiz!r})
+modo = {modo!r}
+t0 = time.perf_counter()
+import app as modulo_app
+t1 = time.perf_counter()
+if modo == "cli":
+    modulo_app.create_app(com_rotas=False)
+    t2 = time.perf_counter()
+    print(json.dumps({{"import_app": t1 - t0, "create_app_cli": t2 - t1}}))
+    sys.exit(0)
+
+app = modulo_app.create_app({{"VARREDOR_INTERVALO": 0}})
+t2 = time.perf_counter()
+from flask_jwt_extended import create_access_token
+from extensions import db
+with app.app_context():
+    db.create_all()
+    token = create_access_token(identity={{"id": 1, "tipo": "admin"}})
+cabecalhos = {{"Authorization": "Bearer " + token}}
+
+if modo == "fork":
+    leitura, escrita = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        t3 = time.perf_counter()
+        app.test_client().get("/api/protected", headers=cabecalhos)
+        os.write(escrita, str(time.perf_counter() - t3).encode())
+        os._exit(0)
+    os.waitpid(pid, 0)
+    print(json.dumps({{"primeira_req_fork": float(os.read(leitura, 64))}}))
+    sys.exit(0)
+
+t3 = time.perf_counter()
+app.test_client().get("/api/protected", headers=cabecalhos)
+t4 = time.perf_counter()
+print(json.dumps({{"import_app": t1 - t0, "create_app": t2 - t1, "primeira_req": t4 - t3}}))
+'''
+
+
+def medir(modo, env):
+    codigo = MEDICAO.format(raiz=RAIZ, modo=modo)
+    saida = subprocess.check_output([sys.executable, "-c", codigo], env=env, text=True)
+    return json.loads(saida.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tempo de importação, create_app e primeira requisição.")
+    parser.add_argument("--repeticoes", type=int, default=10)
+    parser.add_argument("--saida", help="arquivo JSON com o resultado")
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "startup.db")
+    env.pop("VARREDOR_INTERVALO", None)
+
+    modos = ["cli", "completo"] + (["fork"] if hasattr(os, "fork") else [])
+    amostras = {}
+    for _ in range(args.repeticoes):
+        for modo in modos:
+            for nome, valor in medir(modo, env).items():
+                amostras.setdefault(nome, []).append(valor * 1000)
+
+    resultado = {}
+    for nome, valores in amostras.items():
+        resultado[nome] = {
+            "mediana_ms": round(statistics.median(valores), 2),
+            "min_ms": round(min(valores), 2),
+            "max_ms": round(max(valores), 2),
+        }
+        print(f"{nome:<18} mediana={resultado[nome]['mediana_ms']:8.2f}ms  "
+              f"min={resultado[nome]['min_ms']:8.2f}ms  max={resultado[nome]['max_ms']:8.2f}ms")
+
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as f:
+            json.dump({"repeticoes": args.repeticoes, "medicoes": resultado}, f, indent=2)
+        print(f"\nResultado gravado em {args.saida}")
+
+
+if __name__ == '__main__':
+    main()
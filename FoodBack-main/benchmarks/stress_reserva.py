@@ -0,0 +1,106 @@
+import os
+import sys
+import argparse
+import tempfile
+import threading
+import time
+from collections import Counter
+
+# Adiciona o diretório do projeto (onde estão extensions.py, models.py, doacao.py) ao PATH
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from extensions import db
+from models import Empresa, ONG, Doacao
+from doacao import reservar_doacao
+
+
+# ------------------------------
+# TESTE DE ESTRESSE DA RESERVA (compare-and-set)
+# ------------------------------
+# Várias threads (uma por ONG) disputam as mesmas doações chamando reservar_doacao.
+# Ao final confere que cada doação teve exatamente um vencedor e que o banco concorda.
+
+def criar_app(url):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = url
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    if url.startswith('sqlite'):
+        # Espera pelo lock de escrita do SQLite em vez de falhar com "database is locked"
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {"connect_args": {"timeout": 30}}
+    db.init_app(app)
+    return app
+
+
+def popular(app, total_doacoes, total_ongs):
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        empresa = Empresa(nome_empresa="Empresa Estresse", email="estresse@empresa", senha="x", is_approved=True)
+        db.session.add(empresa)
+        db.session.flush()
+        for i in range(total_ongs):
+            db.session.add(ONG(nome_ong=f"ONG {i}", email=f"ong{i}@estresse", senha="x", is_approved=True))
+        for i in range(total_doacoes):
+            db.session.add(Doacao(titulo=f"Doação {i}", tipo_alimento="arroz", quantidade="1 kg", id_empresa=empresa.id_empresa))
+        db.session.commit()
+        ids_ongs = [o.id_ong for o in ONG.query.all()]
+        ids_doacoes = [d.id_doacao for d in Doacao.query.all()]
+    return ids_ongs, ids_doacoes
+
+
+def disputar(app, ids_ongs, ids_doacoes):
+    vitorias = Counter()
+    vencedores = {}
+    lock = threading.Lock()
+    largada = threading.Barrier(len(ids_ongs))
+
+    def ong_worker(ong_id):
+        with app.app_context():
+            largada.wait()
+            for doacao_id in ids_doacoes:
+                if reservar_doacao(doacao_id, ong_id):
+                    with lock:
+                        vitorias[doacao_id] += 1
+                        vencedores[doacao_id] = ong_id
+
+    threads = [threading.Thread(target=ong_worker, args=(ong_id,)) for ong_id in ids_ongs]
+    inicio = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return vitorias, vencedores, time.perf_counter() - inicio
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Estresse da reserva concorrente de doações.")
+    parser.add_argument("--doacoes", type=int, default=200)
+    parser.add_argument("--ongs", type=int, default=16)
+    parser.add_argument("--db", help="URL do banco (padrão: SQLite temporário)")
+    args = parser.parse_args()
+
+    url = args.db or "sqlite:///" + os.path.join(tempfile.mkdtemp(), "estresse.db")
+    app = criar_app(url)
+    ids_ongs, ids_doacoes = popular(app, args.doacoes, args.ongs)
+    vitorias, vencedores, duracao = disputar(app, ids_ongs, ids_doacoes)
+
+    tentativas = len(ids_ongs) * len(ids_doacoes)
+    print(f"Banco: {url}")
+    print(f"{tentativas} tentativas de {len(ids_ongs)} ONGs em {duracao:.3f}s "
+          f"({tentativas / duracao:.0f} tentativas/s, {len(vencedores) / duracao:.0f} reservas/s)")
+
+    erros = [d for d in ids_doacoes if vitorias[d] != 1]
+    with app.app_context():
+        for doacao in Doacao.query.all():
+            if doacao.status != 'solicitada' or doacao.id_ong_recebedora != vencedores.get(doacao.id_doacao):
+                erros.append(doacao.id_doacao)
+
+    if erros:
+        print(f"❌ FALHA: {len(set(erros))} doações sem exatamente um vencedor: {sorted(set(erros))[:10]}")
+        sys.exit(1)
+    print(f"✅ Exatamente um vencedor para cada uma das {len(ids_doacoes)} doações.")
+
+
+if __name__ == '__main__':
+    main()
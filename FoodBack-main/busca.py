@@ -0,0 +1,122 @@
+import math
+import re
+import threading
+from collections import defaultdict
+from extensions import db
+from models import Doacao
+from texto import normalizar
+
+# ------------------------------
+# BUSCA TEXTUAL EM DOAÇÕES DISPONÍVEIS (titulo + descricao)
+# ------------------------------
+# No MySQL a busca usa o índice FULLTEXT de doacao (MATCH ... AGAINST); a collation
+# utf8mb4_unicode_ci já ignora acentos. Nos demais bancos (SQLite nos testes) usa este índice
+# invertido em memória, com termos sem acento e ranking BM25. O título conta em dobro.
+# O índice em memória é carregado no primeiro uso e atualizado a cada escrita em doacao.py.
+
+PESO_TITULO = 2
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+STOPWORDS = {
+    "a", "o", "as", "os", "de", "da", "do", "das", "dos", "e", "em", "no", "na", "nos", "nas",
+    "um", "uma", "para", "por", "com", "sem", "ao", "aos",
+}
+
+_TERMO = re.compile(r"\w+")
+
+
+def tokenizar(texto):
+    """Termos normalizados (sem acento, minúsculos), sem stopwords."""
+    return [t for t in _TERMO.findall(normalizar(texto)) if len(t) > 1 and t not in STOPWORDS]
+
+
+class IndiceInvertido:
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.carregado = False
+        self._limpar()
+
+    def _limpar(self):
+        self._postings = defaultdict(dict)  # termo -> {id_doacao: frequência}
+        self._termos = {}                   # id_doacao -> termos do documento (para remoção)
+        self._tamanhos = {}                 # id_doacao -> número de termos
+        self._tamanho_total = 0
+
+    def carregar(self):
+        linhas = db.session.query(Doacao.id_doacao, Doacao.titulo, Doacao.descricao) \
+            .filter(Doacao.status == 'disponivel')
+        with self._lock:
+            self._limpar()
+            for linha in linhas:
+                self._inserir(linha.id_doacao, linha.titulo, linha.descricao)
+            self.carregado = True
+
+    def garantir_carregado(self):
+        if not self.carregado:
+            self.carregar()
+
+    def invalidar(self):
+        with self._lock:
+            self.carregado = False
+
+    def _inserir(self, id_doacao, titulo, descricao):
+        frequencias = defaultdict(int)
+        for termo in tokenizar(titulo):
+            frequencias[termo] += PESO_TITULO
+        for termo in tokenizar(descricao):
+            frequencias[termo] += 1
+        for termo, freq in frequencias.items():
+            self._postings[termo][id_doacao] = freq
+        tamanho = sum(frequencias.values())
+        self._termos[id_doacao] = list(frequencias)
+        self._tamanhos[id_doacao] = tamanho
+        self._tamanho_total += tamanho
+
+    def remover_doacao(self, id_doacao):
+        with self._lock:
+            for termo in self._termos.pop(id_doacao, ()):
+                docs = self._postings.get(termo)
+                if docs is not None:
+                    docs.pop(id_doacao, None)
+                    if not docs:
+                        del self._postings[termo]
+            self._tamanho_total -= self._tamanhos.pop(id_doacao, 0)
+
+    def atualizar_doacao(self, dados):
+        """Aplica o estado atual de uma doação (dict de serializers.linha_doacao_to_dict)."""
+        if not self.carregado:
+            return
+        with self._lock:
+            self.remover_doacao(dados["id_doacao"])
+            if dados.get("status") == 'disponivel':
+                self._inserir(dados["id_doacao"], dados.get("titulo"), dados.get("descricao"))
+
+    def buscar(self, consulta, limite=20):
+        """Retorna [(id_doacao, relevância)] ordenado pela relevância BM25."""
+        termos = set(tokenizar(consulta))
+        with self._lock:
+            total_docs = len(self._tamanhos)
+            if not termos or not total_docs:
+                return []
+            media = self._tamanho_total / total_docs
+            pontuacao = defaultdict(float)
+            for termo in termos:
+                docs = self._postings.get(termo)
+                if not docs:
+                    continue
+                idf = math.log(1 + (total_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+                for id_doacao, freq in docs.items():
+                    norma = BM25_K1 * (1 - BM25_B + BM25_B * self._tamanhos[id_doacao] / media)
+                    pontuacao[id_doacao] += idf * freq * (BM25_K1 + 1) / (freq + norma)
+        melhores = sorted(pontuacao.items(), key=lambda item: (-item[1], -item[0]))
+        return [(id_doacao, round(valor, 4)) for id_doacao, valor in melhores[:limite]]
+
+
+indice_busca = IndiceInvertido()
+
+
+def usa_fulltext():
+    """True quando o banco primário é MySQL (índice FULLTEXT disponível)."""
+    return db.engine.dialect.name == 'mysql'
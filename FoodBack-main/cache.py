@@ -0,0 +1,127 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app
+
+# ------------------------------
+# CACHE VERSIONADO DE RESPOSTAS (listagem de doações disponíveis)
+# ------------------------------
+# O catálogo só muda quando uma rota de escrita de doacao.py faz commit; essas rotas chamam
+# invalidar_catalogo(), que incrementa a versão. As respostas serializadas ficam guardadas por
+# (versão, parâmetros da listagem), então um poll repetido não consulta o banco nem refaz o JSON.
+# O ETag é o hash do corpo (forte e igual entre workers); como a versão é por processo, cada
+# entrada também expira após CATALOGO_CACHE_TTL segundos para limitar a defasagem de outros workers.
+
+CATALOGO_CACHE_MAX_PADRAO = 256
+CATALOGO_CACHE_TTL_PADRAO = 5
+
+
+class RespostaCacheada:
+    """Corpo JSON já codificado e seu ETag."""
+
+    __slots__ = ('corpo', 'etag', 'expira_em')
+
+    def __init__(self, corpo, etag, expira_em):
+        self.corpo = corpo
+        self.etag = etag
+        self.expira_em = expira_em
+
+
+class CacheRespostas:
+    """Cache LRU limitado em número de entradas, com contadores de acerto/falha."""
+
+    def __init__(self, max_entradas=CATALOGO_CACHE_MAX_PADRAO, ttl=CATALOGO_CACHE_TTL_PADRAO):
+        self.max_entradas = max_entradas
+        self.ttl = ttl
+        self.acertos = 0
+        self.falhas = 0
+        self.despejos = 0
+        self._dados = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obter(self, chave):
+        with self._lock:
+            item = self._dados.get(chave)
+            if item is None or item.expira_em < time.monotonic():
+                if item is not None:
+                    del self._dados[chave]
+                self.falhas += 1
+                return None
+            self._dados.move_to_end(chave)
+            self.acertos += 1
+            return item
+
+    def guardar(self, chave, corpo):
+        item = RespostaCacheada(corpo, gerar_etag(corpo), time.monotonic() + self.ttl)
+        with self._lock:
+            self._dados[chave] = item
+            self._dados.move_to_end(chave)
+            while len(self._dados) > self.max_entradas:
+                self._dados.popitem(last=False)
+                self.despejos += 1
+        return item
+
+    def limpar(self):
+        with self._lock:
+            self._dados.clear()
+
+    def estatisticas(self):
+        with self._lock:
+            return {
+                "entradas": len(self._dados),
+                "acertos": self.acertos,
+                "falhas": self.falhas,
+                "despejos": self.despejos,
+            }
+
+
+def gerar_etag(corpo):
+    """ETag forte: hash do corpo já codificado."""
+    return hashlib.sha1(corpo).hexdigest()
+
+
+# ------------------------------
+# VERSÃO DO CATÁLOGO
+# ------------------------------
+_versao = 0
+_versao_lock = threading.Lock()
+_cache = None
+
+
+def cache_catalogo():
+    global _cache
+    if _cache is None:
+        with _versao_lock:
+            if _cache is None:
+                _cache = CacheRespostas(
+                    max_entradas=current_app.config.get("CATALOGO_CACHE_MAX", CATALOGO_CACHE_MAX_PADRAO),
+                    ttl=current_app.config.get("CATALOGO_CACHE_TTL", CATALOGO_CACHE_TTL_PADRAO),
+                )
+    return _cache
+
+
+def estatisticas_catalogo():
+    """Contadores do cache do catálogo (zerados se ele ainda não foi criado)."""
+    if _cache is None:
+        return {"entradas": 0, "acertos": 0, "falhas": 0, "despejos": 0}
+    return _cache.estatisticas()
+
+
+def versao_catalogo():
+    return _versao
+
+
+def invalidar_catalogo():
+    """Chamar após o commit de qualquer escrita que altere doações."""
+    global _versao
+    with _versao_lock:
+        _versao += 1
+    # Entradas de versões antigas nunca mais serão lidas; libera a memória já
+    if _cache is not None:
+        _cache.limpar()
+
+
+def chave_listagem(args):
+    """Chave do cache: versão atual do catálogo + parâmetros da listagem (ordem irrelevante)."""
+    return (versao_catalogo(), tuple(sorted(args.items(multi=True))))
@@ -0,0 +1,82 @@
+import click
+
+# ------------------------------
+# COMANDOS DE CLI (flask --app app <comando>)
+# ------------------------------
+# Registrados pela fábrica (create_app), então reaproveitam a mesma configuração do servidor:
+#   flask --app app init-db [--recriar]
+#   flask --app app seed-admin [--nome ... --email ...]
+#   flask --app app varrer-expirados [--lote N]
+#   flask --app app arquivar [--idade-dias N --lote N]
+#   flask --app app importar-geocodificacao ARQUIVO.csv   (colunas: chave,latitude,longitude)
+#   flask --app app drenar-outbox [--max-lotes N]
+
+
+def registrar_comandos(app):
+
+    @app.cli.command('init-db')
+    @click.option('--recriar', is_flag=True, help="Apaga todas as tabelas antes de criá-las (perde os dados!).")
+    def init_db(recriar):
+        """Cria as tabelas que ainda não existem."""
+        from extensions import db
+        if recriar:
+            click.confirm("Isto apaga TODOS os dados do banco. Continuar?", abort=True)
+            db.drop_all()
+        db.create_all()
+        click.echo("✅ Tabelas criadas (ou já existentes).")
+
+    @app.cli.command('seed-admin')
+    @click.option('--nome', prompt="Nome do Administrador")
+    @click.option('--email', prompt="Email (será usado para login)")
+    @click.password_option('--senha', prompt="Senha", confirmation_prompt="Confirme a Senha")
+    def seed_admin(nome, email, senha):
+        """Cria o Administrador inicial (se ainda não houver nenhum)."""
+        from seed_admin import existe_admin, criar_admin
+        if existe_admin():
+            click.echo("Um administrador já existe no banco de dados. Operação cancelada.")
+            return
+        sucesso, mensagem = criar_admin(nome, email, senha)
+        click.echo(f"✅ Sucesso! {mensagem}" if sucesso else f"❌ {mensagem}")
+        if not sucesso:
+            raise SystemExit(1)
+
+    @app.cli.command('varrer-expirados')
+    @click.option('--lote', type=int, default=None, help="linhas por transação")
+    def varrer_expirados(lote):
+        """Expira doações e solicitações vencidas (uma varredura)."""
+        import json
+        from expiracao import varrer_expirados as varrer, VARREDURA_LOTE_PADRAO
+        click.echo(json.dumps(varrer(lote or VARREDURA_LOTE_PADRAO)))
+
+    @app.cli.command('arquivar')
+    @click.option('--idade-dias', type=int, default=None, help="idade mínima (padrão: ARQUIVO_IDADE_DIAS)")
+    @click.option('--lote', type=int, default=None, help="linhas por transação (padrão: ARQUIVO_LOTE)")
+    def arquivar(idade_dias, lote):
+        """Move doações e solicitações encerradas antigas para as tabelas de arquivo (uma execução)."""
+        import json
+        from arquivamento import arquivar as executar
+        if idade_dias is None:
+            idade_dias = app.config["ARQUIVO_IDADE_DIAS"]
+        click.echo(json.dumps(executar(idade_dias, lote or app.config["ARQUIVO_LOTE"])))
+
+    @app.cli.command('importar-geocodificacao')
+    @click.argument('arquivo', type=click.File('r', encoding='utf-8'))
+    def importar_geocodificacao(arquivo):
+        """Carrega a tabela local de geocodificação (CEP, prefixo de CEP ou cidade/uf -> coordenadas)."""
+        import csv
+        from geo import importar_geocodificacao as importar
+        try:
+            total = importar(csv.DictReader(arquivo))
+        except (KeyError, ValueError) as e:
+            raise click.ClickException(f"Linha inválida: {e}")
+        click.echo(f"✅ {total} chaves de geocodificação gravadas.")
+
+    @app.cli.command('drenar-outbox')
+    @click.option('--max-lotes', type=int, default=None, help="para depois de N lotes")
+    def drenar_outbox(max_lotes):
+        """Entrega as notificações pendentes da outbox (com NOTIFICACAO_WORKERS=0, rodar via cron)."""
+        entregadores = app.extensions.get("outbox")
+        if entregadores is None:
+            raise click.ClickException("Notificações desligadas: defina NOTIFICACAO_DESTINO.")
+        total = entregadores.drenar(max_lotes)
+        click.echo(f"✅ {total} mensagens tratadas. {entregadores.estatisticas()}")
@@ -0,0 +1,234 @@
+import threading
+import zlib
+from collections import OrderedDict
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # brotli é opcional
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # zstandard é opcional
+    zstandard = None
+
+# ------------------------------
+# COMPRESSÃO NEGOCIADA DAS RESPOSTAS (gzip / br / zstd)
+# ------------------------------
+# Um after_request escolhe a codificação pelo Accept-Encoding do cliente (zstd, br e gzip, nessa
+# preferência quando o cliente aceita mais de uma; br e zstd só com os pacotes instalados) e
+# comprime respostas JSON/texto a partir de COMPRESSAO_MIN_BYTES. Toda resposta comprimível
+# leva Vary: Accept-Encoding.
+#
+# Respostas com ETag (a listagem cacheada de doações) têm o corpo comprimido guardado por
+# (ETag, codificação): como o ETag é o hash do corpo, a versão comprimida é gerada uma vez por
+# mudança do catálogo e servida pronta nas próximas requisições. O ETag comprimido vira fraco
+# (W/"..."), como faz o nginx, e o If-None-Match é comparado de forma fraca (ver doacao.py).
+# O 304 leva o mesmo ETag (e o mesmo Vary) que o 200 levaria nesta requisição: ver cabecalhos_304().
+#
+# Respostas em stream são comprimidas pedaço a pedaço, com flush a cada pedaço, para que cada
+# evento do SSE ou lote do array chegue ao cliente na hora.
+#
+# COMPRESSAO_MIN_BYTES     corpos menores não são comprimidos (padrão 1024)
+# COMPRESSAO_NIVEL_GZIP    nível do gzip, 1-9 (padrão 6)
+# COMPRESSAO_NIVEL_BR      qualidade do brotli, 0-11 (padrão 5)
+# COMPRESSAO_NIVEL_ZSTD    nível do zstd, 1-22 (padrão 3)
+# COMPRESSAO_CACHE_MAX     corpos comprimidos guardados por ETag (padrão 256)
+
+COMPRESSAO_MIN_BYTES_PADRAO = 1024
+COMPRESSAO_CACHE_MAX_PADRAO = 256
+NIVEIS_PADRAO = {"gzip": 6, "br": 5, "zstd": 3}
+
+TIPOS_COMPRIMIVEIS = {
+    "application/json",
+    "application/x-ndjson",
+    "application/javascript",
+    "application/xml",
+    "image/svg+xml",
+}
+
+
+# ------------------------------
+# CODIFICAÇÕES
+# ------------------------------
+class _Gzip:
+
+    def comprimir(self, dados, nivel):
+        compressor = zlib.compressobj(nivel, zlib.DEFLATED, 31)
+        return compressor.compress(dados) + compressor.flush()
+
+    def incremental(self, nivel):
+        compressor = zlib.compressobj(nivel, zlib.DEFLATED, 31)
+        return (
+            compressor.compress,
+            lambda: compressor.flush(zlib.Z_SYNC_FLUSH),
+            compressor.flush,
+        )
+
+
+class _Brotli:
+
+    def comprimir(self, dados, nivel):
+        return brotli.compress(dados, quality=nivel)
+
+    def incremental(self, nivel):
+        compressor = brotli.Compressor(quality=nivel)
+        return compressor.process, compressor.flush, compressor.finish
+
+
+class _Zstd:
+
+    def comprimir(self, dados, nivel):
+        return zstandard.ZstdCompressor(level=nivel).compress(dados)
+
+    def incremental(self, nivel):
+        compressor = zstandard.ZstdCompressor(level=nivel).compressobj()
+        return (
+            compressor.compress,
+            lambda: compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK),
+            compressor.flush,
+        )
+
+
+# Em ordem de preferência do servidor
+CODIFICACOES = OrderedDict()
+if zstandard is not None:
+    CODIFICACOES["zstd"] = _Zstd()
+if brotli is not None:
+    CODIFICACOES["br"] = _Brotli()
+CODIFICACOES["gzip"] = _Gzip()
+
+
+def escolher_codificacao(accept_encodings):
+    """Melhor codificação disponível para o Accept-Encoding do cliente, ou None (identity)."""
+    return accept_encodings.best_match(list(CODIFICACOES))
+
+
+# ------------------------------
+# CACHE DE CORPOS COMPRIMIDOS (por ETag)
+# ------------------------------
+class CacheComprimidos:
+    """LRU de (etag, codificação) -> corpo comprimido."""
+
+    def __init__(self, max_entradas=COMPRESSAO_CACHE_MAX_PADRAO):
+        self.max_entradas = max_entradas
+        self.acertos = 0
+        self.falhas = 0
+        self._dados = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obter_ou_gerar(self, chave, gerar):
+        with self._lock:
+            corpo = self._dados.get(chave)
+            if corpo is not None:
+                self._dados.move_to_end(chave)
+                self.acertos += 1
+                return corpo
+            self.falhas += 1
+        # Comprime fora do lock; duas requisições simultâneas no máximo comprimem duas vezes
+        corpo = gerar()
+        with self._lock:
+            self._dados[chave] = corpo
+            while len(self._dados) > self.max_entradas:
+                self._dados.popitem(last=False)
+        return corpo
+
+    def estatisticas(self):
+        with self._lock:
+            return {"entradas": len(self._dados), "acertos": self.acertos, "falhas": self.falhas}
+
+
+# ------------------------------
+# HOOK DO FLASK
+# ------------------------------
+def _comprimivel(resposta):
+    tipo = resposta.mimetype or ""
+    return tipo.startswith("text/") or tipo in TIPOS_COMPRIMIVEIS
+
+
+def _stream_comprimido(pedacos, codec, nivel):
+    comprimir, descarregar, finalizar = codec.incremental(nivel)
+    try:
+        for pedaco in pedacos:
+            if isinstance(pedaco, str):
+                pedaco = pedaco.encode('utf-8')
+            saida = comprimir(pedaco) + descarregar()
+            if saida:
+                yield saida
+        yield finalizar()
+    finally:
+        if hasattr(pedacos, 'close'):
+            pedacos.close()
+
+
+class Compressao:
+
+    def __init__(self, app):
+        self.min_bytes = app.config.get("COMPRESSAO_MIN_BYTES", COMPRESSAO_MIN_BYTES_PADRAO)
+        self.niveis = {
+            nome: app.config.get(f"COMPRESSAO_NIVEL_{nome.upper()}", padrao)
+            for nome, padrao in NIVEIS_PADRAO.items()
+        }
+        self.cache = CacheComprimidos(app.config.get("COMPRESSAO_CACHE_MAX", COMPRESSAO_CACHE_MAX_PADRAO))
+        app.after_request(self.processar)
+
+    def processar(self, resposta):
+        if (resposta.status_code < 200 or resposta.status_code in (204, 304)
+                or resposta.direct_passthrough or "Content-Encoding" in resposta.headers
+                or not _comprimivel(resposta)):
+            return resposta
+
+        resposta.vary.add("Accept-Encoding")
+        codificacao = escolher_codificacao(request.accept_encodings)
+        if codificacao is None:
+            return resposta
+        codec = CODIFICACOES[codificacao]
+        nivel = self.niveis[codificacao]
+
+        if resposta.is_streamed:
+            resposta.response = _stream_comprimido(resposta.response, codec, nivel)
+            resposta.headers.pop("Content-Length", None)
+        else:
+            corpo = resposta.get_data()
+            if len(corpo) < self.min_bytes:
+                return resposta
+            etag, fraco = resposta.get_etag()
+            if etag and not fraco:
+                comprimido = self.cache.obter_ou_gerar(
+                    (etag, codificacao), lambda: codec.comprimir(corpo, nivel))
+                resposta.set_etag(etag, weak=True)
+            else:
+                comprimido = codec.comprimir(corpo, nivel)
+            resposta.set_data(comprimido)
+
+        resposta.headers["Content-Encoding"] = codificacao
+        return resposta
+
+
+_compressao = None
+
+
+def cabecalhos_304(resposta, etag, tamanho):
+    """Dá ao 304 o ETag e o Vary do 200 que ele substitui: W/"<etag>" se o corpo de `tamanho`
+    bytes sairia comprimido para o Accept-Encoding desta requisição, senão o ETag forte."""
+    comprimido = False
+    if _compressao is not None:
+        resposta.vary.add("Accept-Encoding")
+        comprimido = (tamanho >= _compressao.min_bytes
+                      and escolher_codificacao(request.accept_encodings) is not None)
+    resposta.set_etag(etag, weak=comprimido)
+    return resposta
+
+
+def iniciar_compressao(app):
+    global _compressao
+    _compressao = Compressao(app)
+    return _compressao
+
+
+def estatisticas_compressao():
+    """Contadores do cache de corpos comprimidos (zerados se a compressão não foi iniciada)."""
+    if _compressao is None:
+        return {"entradas": 0, "acertos": 0, "falhas": 0}
+    return _compressao.cache.estatisticas()
@@ -0,0 +1,101 @@
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from flask import current_app
+from extensions import db
+from models import Credencial
+
+# ------------------------------
+# CACHE DE ESTADO DAS CONTAS (aprovação + versão do token)
+# ------------------------------
+# As rotas quentes leem a aprovação do próprio token (claims "aprovado" e "versao") e só
+# conferem aqui se a versão continua válida. Com o cache quente isso não faz nenhuma consulta.
+# O cache é por processo: approve_user invalida a entrada local na hora e os demais workers
+# enxergam a mudança quando a entrada expira (CONTAS_CACHE_TTL).
+
+CONTAS_CACHE_TTL_PADRAO = 30       # segundos
+CONTAS_CACHE_MAX_PADRAO = 10000    # entradas
+
+EstadoConta = namedtuple('EstadoConta', ['aprovado', 'versao'])
+
+
+class CacheContas:
+    """Cache LRU com expiração por tempo, seguro para várias threads."""
+
+    def __init__(self, max_entradas=CONTAS_CACHE_MAX_PADRAO, ttl=CONTAS_CACHE_TTL_PADRAO):
+        self.max_entradas = max_entradas
+        self.ttl = ttl
+        self._dados = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obter(self, chave):
+        with self._lock:
+            item = self._dados.get(chave)
+            if item is None:
+                return None
+            valor, expira_em = item
+            if expira_em < time.monotonic():
+                del self._dados[chave]
+                return None
+            self._dados.move_to_end(chave)
+            return valor
+
+    def guardar(self, chave, valor):
+        with self._lock:
+            self._dados[chave] = (valor, time.monotonic() + self.ttl)
+            self._dados.move_to_end(chave)
+            while len(self._dados) > self.max_entradas:
+                self._dados.popitem(last=False)
+
+    def remover(self, chave):
+        with self._lock:
+            self._dados.pop(chave, None)
+
+    def limpar(self):
+        with self._lock:
+            self._dados.clear()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def _cache_contas():
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = CacheContas(
+                    max_entradas=current_app.config.get("CONTAS_CACHE_MAX", CONTAS_CACHE_MAX_PADRAO),
+                    ttl=current_app.config.get("CONTAS_CACHE_TTL", CONTAS_CACHE_TTL_PADRAO),
+                )
+    return _cache
+
+
+def estado_conta(tipo, id_usuario):
+    """Retorna EstadoConta(aprovado, versao) da conta, ou None se ela não existir."""
+    chave = (tipo, id_usuario)
+    estado = _cache_contas().obter(chave)
+    if estado is not None:
+        return estado
+
+    linha = (
+        db.session.query(Credencial.is_approved, Credencial.versao)
+        .filter_by(tipo=tipo, id_usuario=id_usuario)
+        .first()
+    )
+    if linha is None:
+        return None
+    estado = EstadoConta(aprovado=bool(linha.is_approved), versao=linha.versao)
+    _cache_contas().guardar(chave, estado)
+    return estado
+
+
+def invalidar_conta(tipo, id_usuario):
+    """Descarta o estado em cache da conta (chamar após o commit de uma mudança de aprovação)."""
+    _cache_contas().remover((tipo, id_usuario))
+
+
+def claims_da_conta(credencial):
+    """Claims extras gravadas no token emitido pelo login."""
+    return {"aprovado": bool(credencial.is_approved), "versao": credencial.versao}
@@ -6,9 +6,11 @@ import sys
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 try:
-    # A importação agora deve funcionar perfeitamente
-    from app import app, db
+    # Só a fábrica e o db: sem blueprints, o script sobe mais rápido
+    from app import create_app
+    from extensions import db
 
+    app = create_app(com_rotas=False)
     with app.app_context():
         # Este comando apaga todas as tabelas e as recria com base nos modelos (models.py)
         db.drop_all()
@@ -0,0 +1,152 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+from extensions import db, bcrypt
+from models import Admin, Empresa, ONG, Credencial
+from metricas import registrar_bcrypt
+
+# ------------------------------
+# POOL DE HASHING (bcrypt fora da thread da requisição)
+# ------------------------------
+# O bcrypt libera o GIL, então um pool pequeno e limitado impede que uma rajada de logins
+# ocupe todos os workers com hashing: no máximo BCRYPT_MAX_WORKERS operações rodam ao mesmo tempo.
+
+BCRYPT_LOG_ROUNDS_PADRAO = 12
+BCRYPT_MAX_WORKERS_PADRAO = 4
+
+_pool = None
+_pool_lock = threading.Lock()
+
+# Tabela do usuário de origem de cada tipo de credencial
+MODELOS_POR_TIPO = {
+    "admin": Admin,
+    "empresa": Empresa,
+    "ong": ONG,
+}
+
+
+def _executor():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadPoolExecutor(
+                    max_workers=current_app.config.get("BCRYPT_MAX_WORKERS", BCRYPT_MAX_WORKERS_PADRAO),
+                    thread_name_prefix="bcrypt",
+                )
+    return _pool
+
+
+def reiniciar_pool():
+    """Descarta o pool herdado num fork (as threads dele não existem no processo filho)."""
+    global _pool, _pool_lock
+    _pool = None
+    _pool_lock = threading.Lock()
+
+
+def custo_atual():
+    """Fator de custo (log rounds) configurado para novos hashes."""
+    return current_app.config.get("BCRYPT_LOG_ROUNDS", BCRYPT_LOG_ROUNDS_PADRAO)
+
+
+def gerar_hash(senha):
+    """Gera o hash bcrypt da senha no pool, com o custo configurado."""
+    rounds = custo_atual()
+    inicio = time.perf_counter()
+    futuro = _executor().submit(bcrypt.generate_password_hash, senha, rounds)
+    senha_hash = futuro.result().decode('utf-8')
+    registrar_bcrypt(time.perf_counter() - inicio)
+    return senha_hash
+
+
+_hashes_ficticios = {}
+
+
+def hash_ficticio():
+    """Hash de uma senha que ninguém usa, no custo configurado (gerado uma vez por custo).
+
+    O login de um email desconhecido verifica a senha contra ele, gastando o mesmo bcrypt de um
+    email cadastrado: o tempo de resposta não revela quais emails existem.
+    """
+    custo = custo_atual()
+    senha_hash = _hashes_ficticios.get(custo)
+    if senha_hash is None:
+        senha_hash = _hashes_ficticios[custo] = gerar_hash("credencial-inexistente")
+    return senha_hash
+
+
+def verificar_senha(senha_hash, senha):
+    """Verifica a senha contra o hash no pool."""
+    inicio = time.perf_counter()
+    valida = _executor().submit(bcrypt.check_password_hash, senha_hash, senha).result()
+    registrar_bcrypt(time.perf_counter() - inicio)
+    return valida
+
+
+def precisa_rehash(senha_hash):
+    """True se o hash foi gerado com um custo diferente do configurado ($2b$<custo>$...)."""
+    try:
+        return int(senha_hash.split('$')[2]) != custo_atual()
+    except (IndexError, ValueError):
+        return True
+
+
+# ------------------------------
+# MANUTENÇÃO DO ÍNDICE DE CREDENCIAIS
+# ------------------------------
+def buscar_credencial(email):
+    """Login em uma consulta: busca pela PK (email) no índice unificado."""
+    return db.session.get(Credencial, email)
+
+
+def registrar_credencial(email, tipo, id_usuario, senha_hash, is_approved=False):
+    """Adiciona a credencial à sessão atual (o commit fica com quem chamou)."""
+    credencial = Credencial(
+        email=email,
+        tipo=tipo,
+        id_usuario=id_usuario,
+        senha=senha_hash,
+        is_approved=is_approved,
+    )
+    db.session.add(credencial)
+    return credencial
+
+
+def atualizar_hash(credencial, novo_hash):
+    """Troca o hash na credencial e na tabela de origem do usuário (sem commit)."""
+    credencial.senha = novo_hash
+    modelo = MODELOS_POR_TIPO[credencial.tipo]
+    usuario = db.session.get(modelo, credencial.id_usuario)
+    if usuario:
+        usuario.senha = novo_hash
+
+
+def definir_aprovacao(tipo, id_usuario, aprovado):
+    """Propaga is_approved de Empresa/ONG para o índice de credenciais (sem commit).
+
+    A versão da credencial é incrementada só se a aprovação de fato mudou, revogando tokens
+    emitidos antes da mudança (reaprovar uma conta aprovada não desloga ninguém); quem chama
+    deve invalidar o cache de contas (contas.invalidar_conta) após o commit.
+    """
+    Credencial.query.filter(
+        Credencial.tipo == tipo, Credencial.id_usuario == id_usuario, Credencial.is_approved != aprovado
+    ).update(
+        {"is_approved": aprovado, "versao": Credencial.versao + 1}, synchronize_session=False
+    )
+
+
+def sincronizar_credenciais():
+    """Cria as credenciais que faltam para usuários já existentes (migração de bases antigas)."""
+    existentes = {email for (email,) in db.session.query(Credencial.email)}
+    criadas = 0
+    for tipo, modelo in MODELOS_POR_TIPO.items():
+        for usuario in modelo.query.all():
+            if usuario.email in existentes:
+                continue
+            aprovado = True if tipo == "admin" else bool(usuario.is_approved)
+            registrar_credencial(usuario.email, tipo, usuario.get_id(), usuario.senha, aprovado)
+            existentes.add(usuario.email)
+            criadas += 1
+    db.session.commit()
+    return criadas
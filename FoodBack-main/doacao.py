@@ -1,8 +1,31 @@
-from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask import Blueprint, request, jsonify, current_app, Response
+from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
 from extensions import db  
-from models import Doacao, Empresa, ONG, Solicitacao
+from models import Doacao, Solicitacao, DoacaoArquivada, SolicitacaoArquivada
+from serializers import (
+    consulta_doacoes, serializar_doacoes, serializar_doacao, linha_doacao_to_dict,
+    consulta_solicitacoes, serializar_solicitacoes
+)
+from json_rapido import json_bytes
+from contas import estado_conta
+from cache import cache_catalogo, chave_listagem, invalidar_catalogo
+from compressao import cabecalhos_304
+from eventos import barramento, publicar_evento, gerar_stream
+from banco import somente_leitura
+from matching import indice, INDICE_TTL_PADRAO
+from busca import indice_busca, usa_fulltext
+from geo import indice_geo, ler_coordenadas, localizacao_conta
+from texto import normalizar
+from sqlalchemy.dialects.mysql import match
+from estatisticas import registrar_evento
+from outbox import registrar_mensagem, acordar_entregadores
+from arquivamento import com_historico
+from idempotencia import idempotente, resultado_definitivo
+from importacao import importar_doacoes, FORMATOS, LOTE_TAMANHO_PADRAO, LOTE_MAX_ERROS_PADRAO
 from datetime import datetime
+import base64
+import json
+import math
 
 # ------------------------------
 # Criação dos Blueprints de Doação e Solicitação
@@ -10,6 +33,17 @@ from datetime import datetime
 doacao_bp = Blueprint('doacao', __name__, url_prefix='/api/doacoes')
 solicitacao_bp = Blueprint('solicitacao', __name__, url_prefix='/api/solicitacoes')
 
+# Campos de Doacao usados pelo resumo estatístico (estatisticas.py)
+CAMPOS_RESUMO = ("id_empresa", "id_ong_recebedora", "tipo_alimento", "quantidade_valor", "quantidade_unidade")
+# Campos que a empresa pode editar; a notificação "atualizada" só sai se algum deles mudou
+CAMPOS_EDITAVEIS = ("titulo", "descricao", "tipo_alimento", "quantidade", "data_disponibilidade", "data_validade")
+
+# Tamanho de página da listagem de doações disponíveis
+LIMITE_PADRAO = 50
+LIMITE_MAXIMO = 200
+# Candidatas do índice geográfico conferidas no banco (filtros) por consulta
+GEO_BLOCO = 500
+
 # ------------------------------
 # Funções Auxiliares de Segurança
 # ------------------------------
@@ -23,44 +57,79 @@ def get_user_id():
     current_user = get_jwt_identity()
     return current_user.get("id")
 
-def doacao_to_dict(doacao):
-    """Converte um objeto Doacao em um dicionário JSON."""
-    empresa_nome = Empresa.query.get(doacao.id_empresa).nome_empresa if doacao.id_empresa else None
-
-    return {
-        "id_doacao": doacao.id_doacao,
-        "titulo": doacao.titulo,
-        "descricao": doacao.descricao,
-        "tipo_alimento": doacao.tipo_alimento,
-        "quantidade": doacao.quantidade,
-        "data_disponibilidade": doacao.data_disponibilidade.isoformat() if doacao.data_disponibilidade else None,
-        "status": doacao.status,
-        "data_criacao": doacao.data_criacao.isoformat(),
-        "id_empresa": doacao.id_empresa,
-        "empresa": empresa_nome,
-        "id_solicitacao_vinculada": doacao.id_solicitacao,
-        "id_ong_recebedora": doacao.id_ong_recebedora
-    }
+def conta_aprovada():
+    """Confere a aprovação pelo token (claims) e pelo cache de contas, sem consultar o banco
+    quando o cache está quente. Tokens com versão antiga (conta revogada) são recusados."""
+    claims = get_jwt()
+    if not claims.get("aprovado"):
+        return False
+    estado = estado_conta(get_user_type(), get_user_id())
+    return estado is not None and estado.aprovado and estado.versao == claims.get("versao")
+
+def catalogo_alterado(evento, dados):
+    """Chamar após o commit de toda escrita em doações: invalida o cache da listagem,
+    atualiza os índices em memória (compatibilidade, busca e proximidade), publica o evento
+    para /api/doacoes/stream e acorda os entregadores da outbox."""
+    invalidar_catalogo()
+    acordar_entregadores()
+    if evento in ("criada", "atualizada"):
+        indice.atualizar_doacao(dados)
+        indice_busca.atualizar_doacao(dados)
+        indice_geo.atualizar_doacao(dados)
+    elif evento in ("removida", "reservada"):
+        indice.remover_doacao(dados["id_doacao"])
+        indice_busca.remover_doacao(dados["id_doacao"])
+        indice_geo.remover_doacao(dados["id_doacao"])
+    elif evento == "expiradas":
+        for id_doacao in dados["ids"]:
+            indice.remover_doacao(id_doacao)
+            indice_busca.remover_doacao(id_doacao)
+            indice_geo.remover_doacao(id_doacao)
+    else:
+        indice.invalidar()
+        indice_busca.invalidar()
+        indice_geo.invalidar()
+    publicar_evento(evento, dados)
+
+def parse_data(valor):
+    """Converte uma string YYYY-MM-DD em date (None se vazia). Lança ValueError se inválida."""
+    if not valor:
+        return None
+    return datetime.strptime(valor, '%Y-%m-%d').date()
+
+def codificar_cursor(doacao):
+    """Gera o cursor opaco (data_criacao, id_doacao) que aponta para depois desta doação."""
+    bruto = json.dumps([doacao.data_criacao.isoformat(), doacao.id_doacao])
+    return base64.urlsafe_b64encode(bruto.encode('utf-8')).decode('ascii')
+
+def decodificar_cursor(cursor):
+    """Inverte codificar_cursor. Lança ValueError se o cursor estiver malformado."""
+    try:
+        data_iso, id_doacao = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return datetime.fromisoformat(data_iso), int(id_doacao)
+    except Exception as e:
+        raise ValueError("Cursor inválido") from e
 
 # ------------------------------
 # ROTAS DE DOAÇÃO (Empresa)
 # ------------------------------
 @doacao_bp.route('/', methods=['POST'])
 @jwt_required()
+@idempotente
 def criar_doacao():
     """Endpoint para Empresas criarem uma nova Doação."""
     if get_user_type() != 'empresa':
         return jsonify({"msg": "Acesso negado. Apenas Empresas podem criar doações."}), 403
 
     data = request.json
-    empresa = Empresa.query.get(get_user_id())
 
     # Garante que a empresa está aprovada
-    if not empresa.is_approved:
+    if not conta_aprovada():
         return jsonify({"msg": "Sua conta de Empresa precisa ser aprovada pelo Admin para criar doações."}), 403
 
     try:
         data_disp = datetime.strptime(data.get("data_disponibilidade"), '%Y-%m-%d').date()
+        data_val = parse_data(data.get("data_validade"))
     except:
         return jsonify({"msg": "Formato de data inválido. Use YYYY-MM-DD."}), 400
 
@@ -70,23 +139,66 @@ def criar_doacao():
         tipo_alimento=data.get("tipo_alimento"),
         quantidade=data.get("quantidade"),
         data_disponibilidade=data_disp,
+        data_validade=data_val,
         id_empresa=get_user_id()
     )
 
     db.session.add(nova_doacao)
+    registrar_evento("criada", [nova_doacao])
+    registrar_mensagem("criada", nova_doacao)
     db.session.commit()
-    return jsonify({"msg": "Doação criada com sucesso!", "doacao": doacao_to_dict(nova_doacao)}), 201
+    dados = serializar_doacao(nova_doacao.id_doacao)
+    catalogo_alterado("criada", dados)
+    return jsonify({"msg": "Doação criada com sucesso!", "doacao": dados}), 201
+
+
+@doacao_bp.route('/lote', methods=['POST'])
+@jwt_required()
+def importar_lote_doacoes():
+    """Endpoint para Empresas importarem muitas Doações de uma vez.
+
+    O corpo é um stream NDJSON (application/x-ndjson) ou CSV com cabeçalho (text/csv), com os
+    mesmos campos de criar_doacao. Linhas inválidas são rejeitadas individualmente.
+    """
+    if get_user_type() != 'empresa':
+        return jsonify({"msg": "Acesso negado. Apenas Empresas podem criar doações."}), 403
+
+    if not conta_aprovada():
+        return jsonify({"msg": "Sua conta de Empresa precisa ser aprovada pelo Admin para criar doações."}), 403
+
+    formato = FORMATOS.get(request.mimetype)
+    if not formato:
+        return jsonify({"msg": "Formato não suportado. Use application/x-ndjson ou text/csv."}), 415
+
+    resumo = importar_doacoes(
+        request.stream,
+        formato,
+        get_user_id(),
+        tamanho_lote=current_app.config.get("LOTE_TAMANHO", LOTE_TAMANHO_PADRAO),
+        max_erros=current_app.config.get("LOTE_MAX_ERROS", LOTE_MAX_ERROS_PADRAO),
+    )
+
+    if resumo["inseridas"]:
+        catalogo_alterado("lote_importado", {"id_empresa": get_user_id(), "inseridas": resumo["inseridas"]})
+
+    status = 201 if resumo["inseridas"] else 400
+    return jsonify(resumo), status
 
 
 @doacao_bp.route('/minhas', methods=['GET'])
 @jwt_required()
+@somente_leitura
 def listar_minhas_doacoes():
-    """Endpoint para Empresas listarem suas próprias Doações."""
+    """Endpoint para Empresas listarem suas próprias Doações (com ?historico=1, também as arquivadas)."""
     if get_user_type() != 'empresa':
         return jsonify({"msg": "Acesso negado. Apenas Empresas podem listar suas doações."}), 403
 
-    doacoes = Doacao.query.filter_by(id_empresa=get_user_id()).all()
-    return jsonify([doacao_to_dict(d) for d in doacoes])
+    id_empresa = get_user_id()
+    doacoes = com_historico(
+        lambda origem: consulta_doacoes(origem).filter(origem.id_empresa == id_empresa),
+        request.args.get("historico") == "1", Doacao, DoacaoArquivada,
+    ).order_by(Doacao.id_doacao).all()
+    return jsonify(serializar_doacoes(doacoes))
 
 
 @doacao_bp.route('/<int:doacao_id>', methods=['PUT'])
@@ -104,6 +216,11 @@ def atualizar_doacao(doacao_id):
     if doacao.status != 'disponivel':
         return jsonify({"msg": "Não é possível alterar uma doação que não está 'disponivel'."}), 403
 
+    # Estado anterior, para corrigir o resumo se tipo ou quantidade mudarem e para só notificar
+    # as ONGs quando algum campo de fato mudou
+    antes = {campo: getattr(doacao, campo) for campo in CAMPOS_RESUMO}
+    editados_antes = {campo: getattr(doacao, campo) for campo in CAMPOS_EDITAVEIS}
+
     data = request.json
     doacao.titulo = data.get("titulo", doacao.titulo)
     doacao.descricao = data.get("descricao", doacao.descricao)
@@ -116,8 +233,24 @@ def atualizar_doacao(doacao_id):
         except:
             return jsonify({"msg": "Formato de data inválido. Use YYYY-MM-DD."}), 400
 
+    if "data_validade" in data:
+        try:
+            doacao.data_validade = parse_data(data["data_validade"])
+        except ValueError:
+            return jsonify({"msg": "Formato de data inválido. Use YYYY-MM-DD."}), 400
+
+    if any(getattr(doacao, campo) != valor for campo, valor in antes.items()):
+        # A correção vai para o dia em que a doação foi criada, não para o dia da edição
+        dia = doacao.data_criacao.date() if doacao.data_criacao else None
+        registrar_evento("criada", [antes], sinal=-1, dia=dia)
+        registrar_evento("criada", [doacao], dia=dia)
+
+    if any(getattr(doacao, campo) != valor for campo, valor in editados_antes.items()):
+        registrar_mensagem("atualizada", doacao)
     db.session.commit()
-    return jsonify({"msg": "Doação atualizada com sucesso!", "doacao": doacao_to_dict(doacao)})
+    dados = serializar_doacao(doacao.id_doacao)
+    catalogo_alterado("atualizada", dados)
+    return jsonify({"msg": "Doação atualizada com sucesso!", "doacao": dados})
 
 
 @doacao_bp.route('/<int:doacao_id>', methods=['DELETE'])
@@ -135,77 +268,425 @@ def deletar_doacao(doacao_id):
     if doacao.status != 'disponivel':
         return jsonify({"msg": "Não é possível deletar uma doação que já foi solicitada ou concluída."}), 403
 
+    registrar_evento("removida", [doacao])
+    registrar_mensagem("removida", doacao)
     db.session.delete(doacao)
     db.session.commit()
+    catalogo_alterado("removida", {"id_doacao": doacao_id})
     return jsonify({"msg": "Doação deletada com sucesso!"}), 200
 
+@doacao_bp.route('/<int:doacao_id>/solicitacoes-compativeis', methods=['GET'])
+@jwt_required()
+def solicitacoes_compativeis(doacao_id):
+    """Solicitações abertas que esta doação pode atender, das mais urgentes às menos urgentes."""
+    user_type = get_user_type()
+    if user_type not in ['empresa', 'admin']:
+        return jsonify({"msg": "Acesso negado."}), 403
+
+    doacao = db.session.get(Doacao, doacao_id)
+    if not doacao or (user_type == 'empresa' and doacao.id_empresa != get_user_id()):
+        return jsonify({"msg": "Doação não encontrada ou acesso negado."}), 404
+
+    limite = min(max(request.args.get("limite", 10, type=int), 1), LIMITE_MAXIMO)
+    indice.garantir_carregado(current_app.config.get("INDICE_TTL", INDICE_TTL_PADRAO))
+    return jsonify(indice.consultar_confirmando(
+        lambda: indice.solicitacoes_para_doacao(doacao.tipo_alimento, doacao.data_disponibilidade, limite)))
+
 # ------------------------------
 # ROTAS DE VISUALIZAÇÃO (ONG)
 # ------------------------------
 @doacao_bp.route('/disponiveis', methods=['GET'])
 @jwt_required()
+@somente_leitura
 def listar_doacoes_disponiveis():
-    """Endpoint para ONGs visualizarem todas as Doações disponíveis."""
+    """Endpoint para ONGs visualizarem as Doações disponíveis, paginadas por cursor.
+
+    Parâmetros (query string): limite, cursor, tipo_alimento, validade_de, validade_ate.
+    Busca por proximidade (ordenada pela distância, sem cursor): raio_km e/ou proximas=N, a partir
+    de lat/lon (para ONGs, o padrão é a localização cadastrada da própria ONG).
+    """
     user_type = get_user_type()
     if user_type not in ['ong', 'admin']:
         return jsonify({"msg": "Acesso negado. Apenas ONGs e Admin podem visualizar."}), 403
 
     if user_type == 'ong':
-        ong = ONG.query.get(get_user_id())
-        if not ong.is_approved:
+        if not conta_aprovada():
             return jsonify({"msg": "Sua conta de ONG precisa ser aprovada pelo Admin para visualizar doações."}), 403
 
-    doacoes = Doacao.query.filter_by(status='disponivel').order_by(Doacao.data_criacao.desc()).all()
-    return jsonify([doacao_to_dict(d) for d in doacoes])
+    args = request.args
+    if busca_por_proximidade(args) and not (args.get("lat") and args.get("lon")):
+        # A origem entra nos parâmetros para fazer parte da chave do cache
+        origem = localizacao_conta('ong', get_user_id()) if user_type == 'ong' else None
+        if origem is None:
+            return jsonify({"msg": "Informe 'lat' e 'lon' (ou cadastre a localização da ONG)."}), 400
+        args = args.copy()
+        args["lat"], args["lon"] = str(origem[0]), str(origem[1])
+
+    # Poll repetido com o catálogo inalterado: resposta sai do cache (ou 304) sem tocar no banco
+    cache = cache_catalogo()
+    chave = chave_listagem(args)
+    item = cache.obter(chave)
+    if item is None:
+        try:
+            pagina = pagina_disponiveis(args)
+        except ValueError as e:
+            return jsonify({"msg": str(e)}), 400
+        item = cache.guardar(chave, json_bytes(pagina))
+
+    return resposta_com_etag(item)
+
+@doacao_bp.route('/busca', methods=['GET'])
+@jwt_required()
+@somente_leitura
+def buscar_doacoes():
+    """Busca textual nas Doações disponíveis (titulo e descricao), ordenada por relevância.
+
+    Parâmetros (query string): q, limite. A busca ignora acentos e maiúsculas.
+    """
+    user_type = get_user_type()
+    if user_type not in ['ong', 'admin']:
+        return jsonify({"msg": "Acesso negado. Apenas ONGs e Admin podem visualizar."}), 403
+
+    if user_type == 'ong' and not conta_aprovada():
+        return jsonify({"msg": "Sua conta de ONG precisa ser aprovada pelo Admin para visualizar doações."}), 403
+
+    consulta = request.args.get("q", "").strip()
+    if not consulta:
+        return jsonify({"msg": "Informe o termo de busca em 'q'."}), 400
+    limite = min(max(request.args.get("limite", 20, type=int), 1), LIMITE_MAXIMO)
+
+    if usa_fulltext():
+        relevancia = match(Doacao.titulo, Doacao.descricao, against=consulta).in_natural_language_mode()
+        linhas = (
+            consulta_doacoes()
+            .add_columns(relevancia.label('relevancia'))
+            .filter(Doacao.status == 'disponivel', relevancia > 0)
+            .order_by(relevancia.desc())
+            .limit(limite)
+            .all()
+        )
+        resultados = [dict(linha_doacao_to_dict(linha), relevancia=float(linha.relevancia)) for linha in linhas]
+    else:
+        indice_busca.garantir_carregado()
+        ranking = indice_busca.buscar(consulta, limite)
+        linhas = {
+            linha.id_doacao: linha
+            for linha in consulta_doacoes().filter(
+                Doacao.id_doacao.in_([id_doacao for id_doacao, _ in ranking]),
+                Doacao.status == 'disponivel',
+            )
+        }
+        resultados = [
+            dict(linha_doacao_to_dict(linhas[id_doacao]), relevancia=valor)
+            for id_doacao, valor in ranking if id_doacao in linhas
+        ]
+
+    return jsonify(resultados)
+
+@doacao_bp.route('/stream', methods=['GET'])
+@jwt_required(locations=["headers", "query_string"])
+def stream_doacoes():
+    """Stream SSE de alterações no catálogo (criada, atualizada, reservada, removida).
+
+    Aceita o token também em ?jwt= (EventSource não envia cabeçalhos) e retoma a partir
+    do cabeçalho Last-Event-ID (ou ?last_event_id=) enquanto o evento estiver no buffer.
+    """
+    user_type = get_user_type()
+    if user_type not in ['ong', 'admin']:
+        return jsonify({"msg": "Acesso negado. Apenas ONGs e Admin podem acompanhar doações."}), 403
+
+    if user_type == 'ong' and not conta_aprovada():
+        return jsonify({"msg": "Sua conta de ONG precisa ser aprovada pelo Admin para visualizar doações."}), 403
+
+    bus = barramento()
+    ultimo_id = request.headers.get("Last-Event-ID") or request.args.get("last_event_id")
+    try:
+        ultimo_id = int(ultimo_id) if ultimo_id else bus.ultimo_id
+    except ValueError:
+        return jsonify({"msg": "Last-Event-ID inválido."}), 400
+
+    heartbeat = current_app.config.get("EVENTOS_HEARTBEAT", 15)
+    resposta = Response(gerar_stream(bus, ultimo_id, heartbeat), mimetype='text/event-stream')
+    resposta.headers["Cache-Control"] = "no-cache"
+    resposta.headers["X-Accel-Buffering"] = "no"  # Impede o nginx de bufferizar o stream
+    return resposta
+
+def resposta_com_etag(item):
+    """Responde 304 se o cliente já tem este ETag, senão o corpo cacheado."""
+    # Comparação fraca: a versão comprimida da mesma resposta volta como W/"<etag>" (compressao.py)
+    if request.if_none_match.contains_weak(item.etag):
+        return cabecalhos_304(Response(status=304), item.etag, len(item.corpo))
+    resposta = Response(item.corpo, mimetype='application/json')
+    resposta.set_etag(item.etag)
+    return resposta
+
+def pagina_disponiveis(args):
+    """Monta uma página da listagem de doações disponíveis. Lança ValueError para parâmetros inválidos."""
+    try:
+        limite = min(max(int(args.get("limite", LIMITE_PADRAO)), 1), LIMITE_MAXIMO)
+    except ValueError:
+        raise ValueError("Parâmetro 'limite' deve ser um número inteiro.")
+
+    try:
+        validade_de = parse_data(args.get("validade_de"))
+        validade_ate = parse_data(args.get("validade_ate"))
+    except ValueError:
+        raise ValueError("Formato de data inválido. Use YYYY-MM-DD.")
+
+    if busca_por_proximidade(args):
+        return pagina_proximas(args, limite, args.get("tipo_alimento"), validade_de, validade_ate)
+
+    query = consulta_doacoes().filter(Doacao.status == 'disponivel')
+    if args.get("tipo_alimento"):
+        query = query.filter(Doacao.tipo_alimento == args["tipo_alimento"])
+    if validade_de:
+        query = query.filter(Doacao.data_validade >= validade_de)
+    if validade_ate:
+        query = query.filter(Doacao.data_validade <= validade_ate)
+
+    # Keyset: continua estritamente depois da última (data_criacao, id_doacao) já entregue
+    if args.get("cursor"):
+        try:
+            cursor_data, cursor_id = decodificar_cursor(args["cursor"])
+        except ValueError:
+            raise ValueError("Cursor inválido.")
+        query = query.filter(db.or_(
+            Doacao.data_criacao < cursor_data,
+            db.and_(Doacao.data_criacao == cursor_data, Doacao.id_doacao < cursor_id),
+        ))
+
+    # Busca um registro a mais só para saber se existe próxima página
+    doacoes = query.order_by(Doacao.data_criacao.desc(), Doacao.id_doacao.desc()).limit(limite + 1).all()
+    proximo_cursor = None
+    if len(doacoes) > limite:
+        doacoes = doacoes[:limite]
+        proximo_cursor = codificar_cursor(doacoes[-1])
+
+    return {
+        "doacoes": serializar_doacoes(doacoes),
+        "proximo_cursor": proximo_cursor,
+    }
+
+def busca_por_proximidade(args):
+    return bool(args.get("raio_km") or args.get("proximas"))
+
+def atende_filtros(linha, tipo_alimento, validade_de, validade_ate):
+    """Os filtros da listagem, conferidos numa linha de consulta_doacoes() já buscada.
+
+    O tipo é comparado sem acento nem maiúsculas, como faz a collation do MySQL no filtro SQL.
+    """
+    if linha.status != 'disponivel':
+        return False
+    if tipo_alimento and normalizar(linha.tipo_alimento) != normalizar(tipo_alimento):
+        return False
+    if validade_de and (linha.data_validade is None or linha.data_validade < validade_de):
+        return False
+    if validade_ate and (linha.data_validade is None or linha.data_validade > validade_ate):
+        return False
+    return True
+
+def pagina_proximas(args, limite, tipo_alimento=None, validade_de=None, validade_ate=None):
+    """Doações disponíveis mais perto de (lat, lon), dentro de raio_km e/ou as `proximas` N.
+
+    O índice em grade (geo.py) entrega as candidatas já em ordem de distância. Cada bloco delas é
+    buscado só pela chave primária (com o filtro de status no SQL o otimizador prefere varrer o
+    índice de status) e os filtros da listagem são conferidos nas linhas, até completar a página.
+    """
+    if args.get("cursor"):
+        raise ValueError("A busca por proximidade não usa cursor; ajuste 'raio_km' ou 'proximas'.")
+    lat, lon = ler_coordenadas(args.get("lat"), args.get("lon"))
+    try:
+        raio_km = float(args["raio_km"]) if args.get("raio_km") else None
+        if args.get("proximas"):
+            limite = min(max(int(args["proximas"]), 1), LIMITE_MAXIMO)
+    except ValueError:
+        raise ValueError("Parâmetros 'raio_km' e 'proximas' devem ser números.")
+    if raio_km is not None and not (math.isfinite(raio_km) and raio_km > 0):
+        raise ValueError("Parâmetro 'raio_km' deve ser um número positivo.")
+
+    indice_geo.garantir_carregado(current_app.config.get("INDICE_TTL", INDICE_TTL_PADRAO))
+    doacoes = []
+    conferidas = 0
+    minimo = limite
+    while True:
+        candidatas, completo = indice_geo.proximas(lat, lon, raio_km, minimo)
+        # Cada rodada devolve um prefixo maior da mesma ordem: só confere o que ainda não viu
+        for inicio in range(conferidas, len(candidatas), GEO_BLOCO):
+            bloco = candidatas[inicio:inicio + GEO_BLOCO]
+            linhas = {
+                linha.id_doacao: linha
+                for linha in consulta_doacoes().filter(Doacao.id_doacao.in_([id_doacao for _, id_doacao in bloco]))
+            }
+            for distancia, id_doacao in bloco:
+                linha = linhas.get(id_doacao)
+                if linha is not None and atende_filtros(linha, tipo_alimento, validade_de, validade_ate):
+                    doacoes.append(dict(linha_doacao_to_dict(linha), distancia_km=round(distancia, 3)))
+                    if len(doacoes) == limite:
+                        return {"doacoes": doacoes, "proximo_cursor": None}
+        conferidas = len(candidatas)
+        if completo:
+            return {"doacoes": doacoes, "proximo_cursor": None}
+        minimo *= 4
 
 # ------------------------------
 # ROTAS DE SOLICITAÇÃO (ONG)
 # ------------------------------
+def reservar_doacao(doacao_id, ong_id):
+    """Reserva a doação para a ONG com compare-and-set: UPDATE ... WHERE status='disponivel'.
+
+    Sob concorrência exatamente uma ONG vê rowcount == 1; as demais recebem False sem
+    precisar de lock explícito nem de leitura prévia. Faz o commit da transação.
+    """
+    resultado = db.session.execute(
+        db.update(Doacao)
+        .where(Doacao.id_doacao == doacao_id, Doacao.status == 'disponivel')
+        .values(status='solicitada', id_ong_recebedora=ong_id, data_status=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    venceu = resultado.rowcount == 1
+    if venceu:
+        # Só o vencedor lê a linha, para somar a reserva no resumo e avisar as ONGs na mesma transação
+        reservada = db.session.query(*[getattr(Doacao, campo) for campo in CAMPOS_RESUMO],
+                                     Doacao.id_doacao, Doacao.titulo) \
+            .filter(Doacao.id_doacao == doacao_id).one()
+        registrar_evento("reservada", [reservada])
+        registrar_mensagem("reservada", reservada)
+    db.session.commit()
+    return venceu
+
 @solicitacao_bp.route('/<int:doacao_id>', methods=['POST'])
 @jwt_required()
+@idempotente
 def solicitar_doacao(doacao_id):
     """Endpoint para ONGs solicitarem uma doação disponível."""
     if get_user_type() != 'ong':
         return jsonify({"msg": "Acesso negado. Apenas ONGs podem solicitar doações."}), 403
 
     ong_id = get_user_id()
-    ong = ONG.query.get(ong_id)
 
-    if not ong.is_approved:
+    if not conta_aprovada():
         return jsonify({"msg": "Sua conta de ONG precisa ser aprovada pelo Admin para solicitar doações."}), 403
 
-    doacao = Doacao.query.get(doacao_id)
+    # Caminho quente: um único UPDATE condicional decide quem ganha a doação
+    if not reservar_doacao(doacao_id, ong_id):
+        # Só quem perdeu paga a consulta extra para distinguir "não existe" de "já reservada"
+        if db.session.get(Doacao, doacao_id) is None:
+            return jsonify({"msg": "Doação não encontrada."}), 404
+        # Perder a corrida é o resultado desta reserva: a repetição com a mesma chave recebe o mesmo
+        resultado_definitivo()
+        return jsonify({"msg": "Esta doação não está mais disponível para solicitação."}), 403
 
-    if not doacao:
-        return jsonify({"msg": "Doação não encontrada."}), 404
+    catalogo_alterado("reservada", {"id_doacao": doacao_id, "id_ong_recebedora": ong_id})
+
+    return jsonify({
+        "msg": f"Solicitação enviada com sucesso para a Doação ID {doacao_id}.",
+        "id_doacao": doacao_id,
+        "id_ong_recebedora": ong_id
+    }), 201
 
-    if doacao.status != 'disponivel':
-        return jsonify({"msg": "Esta doação não está mais disponível para solicitação."}), 403
 
-    solicitacao_existente = Solicitacao.query.filter_by(
-        id_doacao=doacao_id,
-        id_ong=ong_id,
-        status_solicitacao='pendente'
-    ).first()
+# ------------------------------
+# ROTAS DE NECESSIDADES (Solicitações criadas por ONG)
+# ------------------------------
+STATUS_SOLICITACAO = ('aberta', 'atendida', 'cancelada')
 
-    if solicitacao_existente:
-        return jsonify({"msg": "Você já possui uma solicitação pendente para esta doação."}), 400
+@solicitacao_bp.route('/', methods=['POST'])
+@jwt_required()
+def criar_solicitacao():
+    """Endpoint para ONGs registrarem o que precisam receber."""
+    if get_user_type() != 'ong':
+        return jsonify({"msg": "Acesso negado. Apenas ONGs podem criar solicitações."}), 403
+
+    if not conta_aprovada():
+        return jsonify({"msg": "Sua conta de ONG precisa ser aprovada pelo Admin para criar solicitações."}), 403
+
+    data = request.json
+    if not data.get("titulo") or not data.get("item_necessario") or not data.get("quantidade_necessaria"):
+        return jsonify({"msg": "Dados obrigatórios (titulo, item_necessario, quantidade_necessaria) faltando."}), 400
 
-    nova_solicitacao = Solicitacao(
-        id_doacao=doacao_id,
-        id_ong=ong_id,
-        status_solicitacao='pendente'
+    try:
+        data_limite = parse_data(data.get("data_limite"))
+    except ValueError:
+        return jsonify({"msg": "Formato de data inválido. Use YYYY-MM-DD."}), 400
+
+    solicitacao = Solicitacao(
+        titulo=data.get("titulo"),
+        descricao=data.get("descricao"),
+        item_necessario=data.get("item_necessario"),
+        quantidade_necessaria=data.get("quantidade_necessaria"),
+        data_limite=data_limite,
+        status='aberta',
+        id_ong=get_user_id()
     )
-    db.session.add(nova_solicitacao)
-    db.session.flush()  # Obtém o ID da nova_solicitacao
+    db.session.add(solicitacao)
+    db.session.commit()
 
-    doacao.status = 'solicitada'
-    doacao.id_solicitacao = nova_solicitacao.id_solicitacao
-    doacao.id_ong_recebedora = ong_id
+    dados = solicitacao.to_dict()
+    indice.atualizar_solicitacao(dados)
+    return jsonify({"msg": "Solicitação criada com sucesso!", "solicitacao": dados}), 201
+
+
+@solicitacao_bp.route('/minhas', methods=['GET'])
+@jwt_required()
+@somente_leitura
+def listar_minhas_solicitacoes():
+    """Endpoint para ONGs listarem suas próprias Solicitações (com ?historico=1, também as arquivadas)."""
+    if get_user_type() != 'ong':
+        return jsonify({"msg": "Acesso negado. Apenas ONGs podem listar suas solicitações."}), 403
+
+    id_ong = get_user_id()
+    solicitacoes = com_historico(
+        lambda origem: consulta_solicitacoes(origem).filter(origem.id_ong == id_ong),
+        request.args.get("historico") == "1", Solicitacao, SolicitacaoArquivada,
+    ).order_by(Solicitacao.id_solicitacao)
+    return jsonify(serializar_solicitacoes(solicitacoes))
+
+
+@solicitacao_bp.route('/necessidades/<int:solicitacao_id>', methods=['PUT'])
+@jwt_required()
+def atualizar_solicitacao(solicitacao_id):
+    """Endpoint para ONGs atualizarem ou encerrarem (status atendida/cancelada) suas Solicitações."""
+    if get_user_type() != 'ong':
+        return jsonify({"msg": "Acesso negado."}), 403
+
+    solicitacao = db.session.get(Solicitacao, solicitacao_id)
+    if not solicitacao or solicitacao.id_ong != get_user_id():
+        return jsonify({"msg": "Solicitação não encontrada ou acesso negado."}), 404
+
+    data = request.json
+    if "status" in data and data["status"] not in STATUS_SOLICITACAO:
+        return jsonify({"msg": f"Status inválido. Use um de: {', '.join(STATUS_SOLICITACAO)}."}), 400
+
+    solicitacao.titulo = data.get("titulo", solicitacao.titulo)
+    solicitacao.descricao = data.get("descricao", solicitacao.descricao)
+    solicitacao.item_necessario = data.get("item_necessario", solicitacao.item_necessario)
+    solicitacao.quantidade_necessaria = data.get("quantidade_necessaria", solicitacao.quantidade_necessaria)
+    solicitacao.status = data.get("status", solicitacao.status)
+
+    if "data_limite" in data:
+        try:
+            solicitacao.data_limite = parse_data(data["data_limite"])
+        except ValueError:
+            return jsonify({"msg": "Formato de data inválido. Use YYYY-MM-DD."}), 400
 
     db.session.commit()
 
-    return jsonify({
-        "msg": f"Solicitação enviada com sucesso para a Doação ID {doacao_id}.",
-        "solicitacao_id": nova_solicitacao.id_solicitacao
-    }), 201
+    dados = solicitacao.to_dict()
+    indice.atualizar_solicitacao(dados)
+    return jsonify({"msg": "Solicitação atualizada com sucesso!", "solicitacao": dados})
+
+
+@solicitacao_bp.route('/doacoes-compativeis', methods=['GET'])
+@jwt_required()
+def doacoes_compativeis():
+    """Doações disponíveis que atendem às solicitações abertas da ONG, das que vencem antes primeiro."""
+    if get_user_type() != 'ong':
+        return jsonify({"msg": "Acesso negado. Apenas ONGs podem consultar doações compatíveis."}), 403
+
+    if not conta_aprovada():
+        return jsonify({"msg": "Sua conta de ONG precisa ser aprovada pelo Admin para visualizar doações."}), 403
+
+    limite = min(max(request.args.get("limite", 10, type=int), 1), LIMITE_MAXIMO)
+    indice.garantir_carregado(current_app.config.get("INDICE_TTL", INDICE_TTL_PADRAO))
+    id_ong = get_user_id()
+    return jsonify(indice.consultar_confirmando(lambda: indice.doacoes_para_ong(id_ong, limite)))
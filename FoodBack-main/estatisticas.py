@@ -0,0 +1,116 @@
+from collections import defaultdict
+from datetime import date
+from decimal import Decimal
+from sqlalchemy.exc import IntegrityError
+from extensions import db
+from models import ResumoDoacao
+from texto import normalizar
+
+# ------------------------------
+# RESUMO ESTATÍSTICO INCREMENTAL DE DOAÇÕES
+# ------------------------------
+# Cada escrita que muda o status de doações chama registrar_evento() ANTES do seu commit:
+# os totais de resumo_doacao mudam na mesma transação da doação (ou nenhum dos dois muda).
+# Os eventos são agregados em memória por grupo e aplicados com um UPDATE (ou INSERT) por grupo.
+
+# Dimensões atualizadas por evento
+DIMENSOES_POR_EVENTO = {
+    "criada": ("empresa", "tipo"),
+    "removida": ("empresa", "tipo"),
+    "expirada": ("empresa", "tipo"),
+    "reservada": ("empresa", "ong", "tipo"),
+}
+DIMENSOES = ("empresa", "ong", "tipo")
+
+
+def _campo(doacao, nome):
+    return doacao.get(nome) if isinstance(doacao, dict) else getattr(doacao, nome)
+
+
+def _chave(dimensao, doacao):
+    if dimensao == "empresa":
+        valor = _campo(doacao, "id_empresa")
+    elif dimensao == "ong":
+        valor = _campo(doacao, "id_ong_recebedora")
+    else:
+        valor = normalizar(_campo(doacao, "tipo_alimento"))[:100]
+    return None if valor in (None, '') else str(valor)
+
+
+def registrar_evento(evento, doacoes, sinal=1, dia=None):
+    """Soma (ou subtrai, com sinal=-1) as doações nos totais do evento, sem commit.
+
+    `doacoes` pode conter objetos Doacao ou dicts com id_empresa, id_ong_recebedora,
+    tipo_alimento, quantidade_valor e quantidade_unidade.
+    """
+    dia = dia or date.today()
+    grupos = defaultdict(lambda: [0, Decimal(0)])
+    for doacao in doacoes:
+        valor = _campo(doacao, "quantidade_valor")
+        unidade = _campo(doacao, "quantidade_unidade") or ''
+        for dimensao in DIMENSOES_POR_EVENTO[evento]:
+            chave = _chave(dimensao, doacao)
+            if chave is None:
+                continue
+            grupo = grupos[(dimensao, chave, unidade)]
+            grupo[0] += sinal
+            grupo[1] += sinal * Decimal(valor or 0)
+
+    for (dimensao, chave, unidade), (total, quantidade) in grupos.items():
+        _somar(dimensao, chave, dia, evento, unidade, total, quantidade)
+
+
+def _somar(dimensao, chave, dia, evento, unidade, total, quantidade):
+    filtro = (
+        ResumoDoacao.dimensao == dimensao, ResumoDoacao.chave == chave, ResumoDoacao.dia == dia,
+        ResumoDoacao.evento == evento, ResumoDoacao.unidade == unidade,
+    )
+    incremento = db.update(ResumoDoacao).where(*filtro).values(
+        total_doacoes=ResumoDoacao.total_doacoes + total,
+        quantidade_total=ResumoDoacao.quantidade_total + quantidade,
+    ).execution_options(synchronize_session=False)
+
+    if db.session.execute(incremento).rowcount:
+        return
+    try:
+        # Primeiro evento do grupo no dia. Savepoint: se outra transação inserir antes, soma nela
+        with db.session.begin_nested():
+            db.session.execute(db.insert(ResumoDoacao).values(
+                dimensao=dimensao, chave=chave, dia=dia, evento=evento, unidade=unidade,
+                total_doacoes=total, quantidade_total=quantidade,
+            ))
+    except IntegrityError:
+        db.session.execute(incremento)
+
+
+def consultar(dimensao, evento, de=None, ate=None, chave=None, por_dia=False):
+    """Totais agregados do resumo (O(grupos)), por chave e unidade (e por dia, se pedido)."""
+    colunas = [ResumoDoacao.chave, ResumoDoacao.unidade]
+    if por_dia:
+        colunas.append(ResumoDoacao.dia)
+
+    query = db.session.query(
+        *colunas,
+        db.func.sum(ResumoDoacao.total_doacoes).label('total_doacoes'),
+        db.func.sum(ResumoDoacao.quantidade_total).label('quantidade_total'),
+    ).filter(ResumoDoacao.dimensao == dimensao, ResumoDoacao.evento == evento)
+
+    if de:
+        query = query.filter(ResumoDoacao.dia >= de)
+    if ate:
+        query = query.filter(ResumoDoacao.dia <= ate)
+    if chave:
+        query = query.filter(ResumoDoacao.chave == chave)
+
+    resultado = []
+    for linha in query.group_by(*colunas).order_by(*colunas):
+        item = {
+            "chave": linha.chave,
+            "unidade": linha.unidade or None,
+            "total_doacoes": int(linha.total_doacoes or 0),
+            "quantidade_total": float(linha.quantidade_total or 0),
+        }
+        if por_dia:
+            item["dia"] = linha.dia.isoformat()
+        resultado.append(item)
+    return resultado
@@ -0,0 +1,108 @@
+import json
+import threading
+from collections import deque, namedtuple
+from flask import current_app
+
+# ------------------------------
+# BARRAMENTO DE EVENTOS DE DOAÇÃO (Server-Sent Events)
+# ------------------------------
+# As rotas de escrita publicam um evento por commit. Os eventos recentes ficam num buffer
+# circular limitado (retomada via Last-Event-ID). Assinantes não têm fila própria: cada um
+# guarda só o último ID que recebeu e espera na mesma Condition, então um assinante ocioso
+# custa um gerador parado. Em produção use workers cooperativos (ex.: gunicorn -k gevent),
+# onde cada conexão aberta é uma greenlet e não uma thread do sistema.
+# O barramento é por processo: com vários workers, cada um só transmite as escritas que fez.
+
+EVENTOS_BUFFER_PADRAO = 1000
+EVENTOS_HEARTBEAT_PADRAO = 15  # segundos entre comentários de keep-alive
+
+Evento = namedtuple('Evento', ['id', 'tipo', 'dados'])
+
+
+class BarramentoEventos:
+    """Buffer circular de eventos com espera compartilhada para os assinantes."""
+
+    def __init__(self, capacidade=EVENTOS_BUFFER_PADRAO):
+        self._eventos = deque(maxlen=capacidade)
+        self._ultimo_id = 0
+        self._cond = threading.Condition()
+
+    @property
+    def ultimo_id(self):
+        return self._ultimo_id
+
+    def publicar(self, tipo, dados):
+        with self._cond:
+            self._ultimo_id += 1
+            self._eventos.append(Evento(self._ultimo_id, tipo, dados))
+            self._cond.notify_all()
+            return self._ultimo_id
+
+    def _desde(self, ultimo_id):
+        # Chamado com o lock adquirido. O buffer é ordenado por ID, então basta pular o prefixo.
+        if not self._eventos or ultimo_id >= self._ultimo_id:
+            return []
+        inicio = max(ultimo_id - self._eventos[0].id + 1, 0)
+        return list(self._eventos)[inicio:]
+
+    def retomada_possivel(self, ultimo_id):
+        """False se eventos depois de ultimo_id já saíram do buffer (cliente precisa recarregar).
+
+        Também é False para um ID maior que o contador deste processo: ele veio de antes de um
+        reinício ou de outro worker, e esperar por ele descartaria os próximos eventos em silêncio.
+        """
+        with self._cond:
+            if ultimo_id > self._ultimo_id:
+                return False
+            if ultimo_id == self._ultimo_id:
+                return True
+            return bool(self._eventos) and self._eventos[0].id <= ultimo_id + 1
+
+    def aguardar(self, ultimo_id, timeout):
+        """Retorna os eventos posteriores a ultimo_id, esperando até timeout se ainda não houver."""
+        with self._cond:
+            if ultimo_id >= self._ultimo_id:
+                self._cond.wait(timeout)
+            return self._desde(ultimo_id)
+
+
+_barramento = None
+_barramento_lock = threading.Lock()
+
+
+def barramento():
+    global _barramento
+    if _barramento is None:
+        with _barramento_lock:
+            if _barramento is None:
+                _barramento = BarramentoEventos(
+                    capacidade=current_app.config.get("EVENTOS_BUFFER", EVENTOS_BUFFER_PADRAO)
+                )
+    return _barramento
+
+
+def publicar_evento(tipo, dados):
+    """Publica um evento de doação (criada, atualizada, reservada, removida). Chamar após o commit."""
+    return barramento().publicar(tipo, dados)
+
+
+def formatar_sse(evento):
+    return f"id: {evento.id}\nevent: {evento.tipo}\ndata: {json.dumps(evento.dados, default=str)}\n\n"
+
+
+def gerar_stream(barramento_eventos, ultimo_id, heartbeat=EVENTOS_HEARTBEAT_PADRAO):
+    """Gerador do corpo text/event-stream a partir de ultimo_id."""
+    yield "retry: 3000\n\n"
+    if not barramento_eventos.retomada_possivel(ultimo_id):
+        # Parte do histórico foi descartada: o cliente deve recarregar a listagem completa
+        ultimo_id = barramento_eventos.ultimo_id
+        yield f"id: {ultimo_id}\nevent: resync\ndata: {{}}\n\n"
+
+    while True:
+        eventos = barramento_eventos.aguardar(ultimo_id, heartbeat)
+        if not eventos:
+            yield ": ping\n\n"
+            continue
+        for evento in eventos:
+            yield formatar_sse(evento)
+            ultimo_id = evento.id
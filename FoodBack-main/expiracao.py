@@ -0,0 +1,135 @@
+import logging
+import threading
+import time
+from datetime import date, datetime
+from extensions import db
+from models import Doacao, Solicitacao
+from matching import indice
+from estatisticas import registrar_evento
+
+# ------------------------------
+# VARREDURA DE DOAÇÕES E SOLICITAÇÕES VENCIDAS
+# ------------------------------
+# Doações 'disponivel' com data_validade no passado passam a 'expirada' e solicitações 'aberta'
+# com data_limite no passado passam a 'expirada'. O trabalho é feito em lotes pequenos: cada lote
+# é um SELECT na faixa do índice (status, data) + um UPDATE por ID + commit, então a transação
+# segura os locks da tabela quente por pouco tempo.
+# Roda como thread do próprio processo (iniciar_varredor) ou pela linha de comando
+# (varrer_expirados.py).
+
+VARREDURA_LOTE_PADRAO = 500
+
+logger = logging.getLogger(__name__)
+
+
+def _varrer_em_lotes(modelo, coluna_id, coluna_data, status_ativo, hoje, tamanho_lote, ao_expirar=None,
+                     antes_do_commit=None, valores=None):
+    """Expira em lotes as linhas de `modelo` ativas com `coluna_data` < hoje. Retorna (linhas, lotes).
+
+    `valores` são colunas extras gravadas junto com o status.
+    """
+    total = 0
+    lotes = 0
+    while True:
+        ids = [i for (i,) in db.session.query(coluna_id)
+               .filter(modelo.status == status_ativo, coluna_data < hoje)
+               .order_by(coluna_data)
+               .limit(tamanho_lote)]
+        if not ids:
+            break
+
+        # Repete a condição de status: se a linha mudou desde o SELECT, ela não é tocada
+        resultado = db.session.execute(
+            db.update(modelo)
+            .where(coluna_id.in_(ids), modelo.status == status_ativo)
+            .values(status='expirada', **(valores or {}))
+            .execution_options(synchronize_session=False)
+        )
+        if antes_do_commit:
+            antes_do_commit(ids)
+        db.session.commit()
+        total += resultado.rowcount
+        lotes += 1
+        if ao_expirar:
+            ao_expirar(ids)
+        if len(ids) < tamanho_lote:
+            break
+    return total, lotes
+
+
+def _registrar_expiradas(ids):
+    # Só as linhas que este UPDATE realmente expirou entram no resumo (mesma transação)
+    expiradas = db.session.query(
+        Doacao.id_empresa, Doacao.id_ong_recebedora, Doacao.tipo_alimento,
+        Doacao.quantidade_valor, Doacao.quantidade_unidade,
+    ).filter(Doacao.id_doacao.in_(ids), Doacao.status == 'expirada').all()
+    registrar_evento("expirada", expiradas)
+
+
+def _doacoes_expiradas(ids):
+    # Import tardio: doacao.py importa módulos que dependem deste
+    from doacao import catalogo_alterado
+    catalogo_alterado("expiradas", {"ids": ids})
+
+
+def _solicitacoes_expiradas(ids):
+    for id_solicitacao in ids:
+        indice.remover_solicitacao(id_solicitacao)
+
+
+def varrer_expirados(tamanho_lote=VARREDURA_LOTE_PADRAO, hoje=None):
+    """Executa uma varredura completa e retorna as métricas da execução. Precisa de app context."""
+    hoje = hoje or date.today()
+    inicio = time.perf_counter()
+
+    doacoes, lotes_doacoes = _varrer_em_lotes(
+        Doacao, Doacao.id_doacao, Doacao.data_validade, 'disponivel', hoje, tamanho_lote, _doacoes_expiradas,
+        _registrar_expiradas, valores={"data_status": datetime.utcnow()})
+    solicitacoes, lotes_solicitacoes = _varrer_em_lotes(
+        Solicitacao, Solicitacao.id_solicitacao, Solicitacao.data_limite, 'aberta', hoje, tamanho_lote,
+        _solicitacoes_expiradas)
+
+    return {
+        "doacoes_expiradas": doacoes,
+        "solicitacoes_expiradas": solicitacoes,
+        "lotes": lotes_doacoes + lotes_solicitacoes,
+        "duracao_s": round(time.perf_counter() - inicio, 4),
+    }
+
+
+class VarredorExpiracao(threading.Thread):
+    """Thread daemon que roda varrer_expirados a cada `intervalo` segundos e acumula métricas."""
+
+    def __init__(self, app, intervalo, tamanho_lote=VARREDURA_LOTE_PADRAO):
+        super().__init__(name="varredor-expiracao", daemon=True)
+        self.app = app
+        self.intervalo = intervalo
+        self.tamanho_lote = tamanho_lote
+        self._parar = threading.Event()
+        self.execucoes = 0
+        self.total_doacoes = 0
+        self.total_solicitacoes = 0
+        self.ultima_execucao = None
+
+    def run(self):
+        while not self._parar.is_set():
+            try:
+                with self.app.app_context():
+                    metricas = varrer_expirados(self.tamanho_lote)
+                self.execucoes += 1
+                self.total_doacoes += metricas["doacoes_expiradas"]
+                self.total_solicitacoes += metricas["solicitacoes_expiradas"]
+                self.ultima_execucao = metricas
+                logger.info("Varredura de expiração: %s", metricas)
+            except Exception:
+                logger.exception("Falha na varredura de expiração")
+            self._parar.wait(self.intervalo)
+
+    def parar(self):
+        self._parar.set()
+
+
+def iniciar_varredor(app, intervalo, tamanho_lote=VARREDURA_LOTE_PADRAO):
+    varredor = VarredorExpiracao(app, intervalo, tamanho_lote)
+    varredor.start()
+    return varredor
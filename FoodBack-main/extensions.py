@@ -1,8 +1,9 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_jwt_extended import JWTManager
 from flask_bcrypt import Bcrypt
+from banco import SessaoRoteada
 
 # Inicialização das Extensões (Instâncias Globais)
-db = SQLAlchemy() 
+db = SQLAlchemy(session_options={"class_": SessaoRoteada}) # Leituras podem ir para réplicas (banco.py)
 bcrypt = Bcrypt() 
 jwt = JWTManager() 
\ No newline at end of file
@@ -0,0 +1,289 @@
+import heapq
+import math
+import re
+import threading
+import time
+from collections import defaultdict
+from extensions import db
+from models import Doacao, Empresa, ONG, Geocodificacao
+from matching import INDICE_TTL_PADRAO
+from texto import normalizar
+
+# ------------------------------
+# LOCALIZAÇÃO E BUSCA POR PROXIMIDADE
+# ------------------------------
+# Empresas e ONGs guardam latitude/longitude, informadas pelo cliente ou resolvidas pela tabela
+# local de geocodificação (CEP, prefixo de CEP ou "cidade/uf"), sem serviço externo.
+#
+# A doação fica onde está a empresa que a criou. O índice em memória divide o mapa numa grade de
+# GEO_CELULA_GRAUS graus: cada célula guarda as empresas localizadas nela. A busca percorre
+# anéis de células em volta da origem, calcula a distância exata (haversine) só das empresas
+# dessas células e para assim que nenhuma célula ainda não visitada pode ter algo mais perto.
+# Como matching.py e busca.py, o índice é por processo, carregado no primeiro uso e atualizado
+# a cada escrita em doacao.py. Como matching.py, é recarregado do banco a cada INDICE_TTL segundos,
+# para que doações criadas e empresas movidas em outro worker também apareçam nas buscas deste.
+
+RAIO_TERRA_KM = 6371.0088
+GEO_CELULA_GRAUS = 0.05  # ~5,5 km de lado no equador
+
+_CEP = re.compile(r"\b(\d{5})-?(\d{3})\b")
+
+
+def distancia_km(lat1, lon1, lat2, lon2):
+    """Distância em km pelo grande círculo (haversine)."""
+    fi1, fi2 = math.radians(lat1), math.radians(lat2)
+    dfi = fi2 - fi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dfi / 2) ** 2 + math.cos(fi1) * math.cos(fi2) * math.sin(dlambda / 2) ** 2
+    return 2 * RAIO_TERRA_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def ler_coordenadas(lat, lon):
+    """Valida um par latitude/longitude (números ou strings). Lança ValueError se inválido."""
+    try:
+        lat, lon = float(lat), float(lon)
+    except (TypeError, ValueError):
+        raise ValueError("Latitude e longitude devem ser números.")
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        raise ValueError("Coordenadas fora do intervalo (latitude -90..90, longitude -180..180).")
+    return lat, lon
+
+
+# ------------------------------
+# GEOCODIFICAÇÃO LOCAL
+# ------------------------------
+def chaves_endereco(endereco):
+    """Chaves a procurar na tabela, da mais precisa para a menos: CEP, prefixo do CEP,
+    endereço inteiro normalizado e cada trecho separado por vírgula, do último para o primeiro."""
+    if not endereco:
+        return []
+    chaves = []
+    cep = _CEP.search(endereco)
+    if cep:
+        chaves += [cep.group(1) + cep.group(2), cep.group(1)]
+    chaves.append(normalizar(endereco))
+    chaves += [normalizar(trecho) for trecho in reversed(endereco.split(",")) if trecho.strip()]
+    return list(dict.fromkeys(chave for chave in chaves if chave))
+
+
+def geocodificar(endereco):
+    """(latitude, longitude) do endereço pela tabela local, ou None se nenhuma chave for conhecida."""
+    chaves = chaves_endereco(endereco)
+    if not chaves:
+        return None
+    encontradas = {
+        linha.chave: (linha.latitude, linha.longitude)
+        for linha in db.session.query(Geocodificacao).filter(Geocodificacao.chave.in_(chaves))
+    }
+    for chave in chaves:
+        if chave in encontradas:
+            return encontradas[chave]
+    return None
+
+
+def resolver_localizacao(dados):
+    """Coordenadas de um corpo de requisição: latitude/longitude explícitas ou o endereço
+    geocodificado. Retorna None se não houver como localizar. Lança ValueError se inválidas."""
+    if dados.get("latitude") is not None or dados.get("longitude") is not None:
+        return ler_coordenadas(dados.get("latitude"), dados.get("longitude"))
+    return geocodificar(dados.get("endereco"))
+
+
+def normalizar_chave_geo(chave):
+    """Chave como gravada na tabela: CEP só com dígitos, demais textos via texto.normalizar."""
+    chave = (chave or "").strip()
+    digitos = chave.replace("-", "")
+    if digitos.isdigit():
+        return digitos
+    return normalizar(chave)
+
+
+def importar_geocodificacao(linhas, tamanho_lote=1000):
+    """Grava (ou substitui) linhas {chave, latitude, longitude} na tabela. Retorna quantas gravou."""
+    total = 0
+    for linha in linhas:
+        lat, lon = ler_coordenadas(linha["latitude"], linha["longitude"])
+        db.session.merge(Geocodificacao(chave=normalizar_chave_geo(linha["chave"]), latitude=lat, longitude=lon))
+        total += 1
+        if total % tamanho_lote == 0:
+            db.session.commit()
+    db.session.commit()
+    return total
+
+
+def localizacao_conta(tipo, id_usuario):
+    """(latitude, longitude) cadastradas da empresa/ONG, ou None."""
+    modelo, coluna_id = (Empresa, Empresa.id_empresa) if tipo == "empresa" else (ONG, ONG.id_ong)
+    linha = db.session.query(modelo.latitude, modelo.longitude).filter(coluna_id == id_usuario).first()
+    if linha is None or linha.latitude is None or linha.longitude is None:
+        return None
+    return linha.latitude, linha.longitude
+
+
+# ------------------------------
+# ÍNDICE EM GRADE
+# ------------------------------
+class IndiceGeo:
+
+    def __init__(self, tamanho_celula=GEO_CELULA_GRAUS):
+        self.tamanho_celula = tamanho_celula
+        self._lock = threading.RLock()
+        self.carregado = False
+        self._carregado_em = 0.0
+        self._limpar()
+
+    def _limpar(self):
+        self._empresas = {}                           # id_empresa -> (lat, lon, célula)
+        self._celulas = defaultdict(set)              # célula -> {id_empresa}
+        self._doacoes_por_empresa = defaultdict(set)  # id_empresa -> {id_doacao disponível}
+        self._empresa_da_doacao = {}                  # id_doacao -> id_empresa
+
+    def celula(self, lat, lon):
+        return math.floor(lat / self.tamanho_celula), math.floor(lon / self.tamanho_celula)
+
+    # ------------------------------
+    # Carga e invalidação
+    # ------------------------------
+    def carregar(self):
+        """(Re)constrói o índice a partir do banco. Precisa de app context."""
+        empresas = db.session.query(Empresa.id_empresa, Empresa.latitude, Empresa.longitude) \
+            .filter(Empresa.latitude.isnot(None), Empresa.longitude.isnot(None))
+        doacoes = db.session.query(Doacao.id_doacao, Doacao.id_empresa).filter(Doacao.status == 'disponivel')
+        with self._lock:
+            self._limpar()
+            for id_empresa, lat, lon in empresas:
+                self._posicionar(id_empresa, lat, lon)
+            for id_doacao, id_empresa in doacoes:
+                self._inserir_doacao(id_doacao, id_empresa)
+            self.carregado = True
+            self._carregado_em = time.monotonic()
+
+    def garantir_carregado(self, ttl=INDICE_TTL_PADRAO):
+        if not self.carregado or time.monotonic() - self._carregado_em > ttl:
+            self.carregar()
+
+    def invalidar(self):
+        with self._lock:
+            self.carregado = False
+
+    # ------------------------------
+    # Atualização incremental (ignorada enquanto o índice não foi carregado)
+    # ------------------------------
+    def _posicionar(self, id_empresa, lat, lon):
+        anterior = self._empresas.pop(id_empresa, None)
+        if anterior:
+            self._celulas[anterior[2]].discard(id_empresa)
+            if not self._celulas[anterior[2]]:
+                del self._celulas[anterior[2]]
+        if lat is not None and lon is not None:
+            celula = self.celula(lat, lon)
+            self._empresas[id_empresa] = (lat, lon, celula)
+            self._celulas[celula].add(id_empresa)
+
+    def _inserir_doacao(self, id_doacao, id_empresa):
+        self._doacoes_por_empresa[id_empresa].add(id_doacao)
+        self._empresa_da_doacao[id_doacao] = id_empresa
+
+    def remover_doacao(self, id_doacao):
+        with self._lock:
+            id_empresa = self._empresa_da_doacao.pop(id_doacao, None)
+            if id_empresa is not None:
+                doacoes = self._doacoes_por_empresa[id_empresa]
+                doacoes.discard(id_doacao)
+                if not doacoes:
+                    del self._doacoes_por_empresa[id_empresa]
+
+    def atualizar_doacao(self, dados):
+        """Aplica o estado atual de uma doação (dict de serializers.linha_doacao_to_dict)."""
+        if not self.carregado:
+            return
+        with self._lock:
+            self.remover_doacao(dados["id_doacao"])
+            if dados.get("status") == 'disponivel':
+                self._inserir_doacao(dados["id_doacao"], dados["id_empresa"])
+
+    def mover_empresa(self, id_empresa, lat, lon):
+        """Nova localização de uma empresa (None remove do mapa)."""
+        if not self.carregado:
+            return
+        with self._lock:
+            self._posicionar(id_empresa, lat, lon)
+
+    # ------------------------------
+    # Consulta
+    # ------------------------------
+    def _distancia_fora_do_bloco(self, lat, aneis):
+        """Menor distância possível até uma empresa fora dos `aneis` em volta da célula da origem."""
+        if aneis == 0:
+            return 0.0
+        passo = math.radians(aneis * self.tamanho_celula)
+        por_latitude = RAIO_TERRA_KM * passo
+        lat_max = math.radians(min(90.0, abs(lat) + (aneis + 1) * self.tamanho_celula))
+        por_longitude = 2 * RAIO_TERRA_KM * math.asin(min(1.0, math.cos(lat_max) * math.sin(min(passo, math.pi) / 2)))
+        return min(por_latitude, por_longitude)
+
+    def proximas(self, lat, lon, raio_km=None, minimo=None):
+        """Doações disponíveis por distância crescente: ([(distância_km, id_doacao)], completo).
+
+        Com `raio_km`, só as que estão dentro do raio. Com `minimo`, para assim que tiver pelo
+        menos essa quantidade (o resultado é sempre um prefixo exato da ordem por distância).
+        `completo` diz se não há mais nada além do que foi devolvido.
+        """
+        with self._lock:
+            ci, cj = self.celula(lat, lon)
+            candidatas = []  # heap de (distância, id_empresa)
+            resultado = []
+            vistas = 0
+            aneis = 0
+            while True:
+                if (2 * aneis + 1) ** 2 > len(self._celulas):
+                    # O bloco já é maior que o número de células ocupadas: visita o resto direto
+                    celulas = [c for c in self._celulas if max(abs(c[0] - ci), abs(c[1] - cj)) >= aneis]
+                else:
+                    celulas = self._anel(ci, cj, aneis)
+                for celula in celulas:
+                    for id_empresa in self._celulas.get(celula, ()):
+                        vistas += 1
+                        if id_empresa not in self._doacoes_por_empresa:
+                            continue
+                        e_lat, e_lon, _ = self._empresas[id_empresa]
+                        distancia = distancia_km(lat, lon, e_lat, e_lon)
+                        if raio_km is None or distancia <= raio_km:
+                            heapq.heappush(candidatas, (distancia, id_empresa))
+
+                esgotou = vistas >= len(self._empresas)
+                garantida = math.inf if esgotou else self._distancia_fora_do_bloco(lat, aneis)
+                while candidatas and candidatas[0][0] <= garantida:
+                    distancia, id_empresa = heapq.heappop(candidatas)
+                    # Na mesma empresa, as doações mais novas primeiro
+                    for id_doacao in sorted(self._doacoes_por_empresa[id_empresa], reverse=True):
+                        resultado.append((distancia, id_doacao))
+                    if minimo and len(resultado) >= minimo:
+                        return resultado, esgotou and not candidatas
+                if esgotou or (raio_km is not None and garantida > raio_km):
+                    return resultado, True
+                aneis += 1
+
+    @staticmethod
+    def _anel(ci, cj, aneis):
+        if aneis == 0:
+            return [(ci, cj)]
+        celulas = []
+        for di in range(-aneis, aneis + 1):
+            celulas.append((ci + di, cj - aneis))
+            celulas.append((ci + di, cj + aneis))
+        for dj in range(-aneis + 1, aneis):
+            celulas.append((ci - aneis, cj + dj))
+            celulas.append((ci + aneis, cj + dj))
+        return celulas
+
+    def estatisticas(self):
+        with self._lock:
+            return {
+                "empresas": len(self._empresas),
+                "celulas": len(self._celulas),
+                "doacoes": len(self._empresa_da_doacao),
+            }
+
+
+indice_geo = IndiceGeo()
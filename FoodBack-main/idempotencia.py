@@ -0,0 +1,268 @@
+import base64
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from flask import current_app, g, jsonify, make_response, request
+from flask_jwt_extended import get_jwt_identity
+
+# ------------------------------
+# CHAVES DE IDEMPOTÊNCIA DAS ESCRITAS (criar doação, reservar doação)
+# ------------------------------
+# Clientes que repetem um POST depois de um timeout mandam o mesmo cabeçalho Idempotency-Key.
+# @idempotente guarda a primeira resposta (status, corpo, tipo) sob a chave, escopada pelo usuário
+# do token, pelo método e pela rota, e devolve a cópia nas repetições (com Idempotent-Replayed:
+# true) sem executar a rota de novo:
+#   - repetição com corpo diferente na mesma chave -> 422;
+#   - repetição enquanto a primeira ainda executa -> espera por ela até IDEMPOTENCIA_ESPERA_S
+#     e então devolve a resposta dela (ou 409 com Retry-After, se ela não terminou a tempo);
+#   - só o resultado da escrita é guardado: respostas 2xx e as que a rota marca com
+#     resultado_definitivo() (a reserva que perdeu a corrida). Recusas de autorização e de
+#     validação, 5xx e exceções liberam a chave: corrigida a causa, a repetição executa de novo.
+# Sem o cabeçalho a rota funciona como antes.
+#
+# As chaves ficam em memória (por processo, LRU limitado e com TTL) ou num backend compartilhado
+# compatível com Redis (IDEMPOTENCIA_BACKEND=redis://...), para que a repetição caia em
+# qualquer worker.
+#
+# IDEMPOTENCIA_BACKEND     "memoria" (padrão) ou URL redis:// (precisa do pacote redis)
+# IDEMPOTENCIA_TTL_S       por quanto tempo a resposta guardada é devolvida (padrão 24 h)
+# IDEMPOTENCIA_MAX_CHAVES  chaves guardadas no backend em memória
+# IDEMPOTENCIA_ESPERA_S    quanto uma repetição concorrente espera pela primeira execução
+# IDEMPOTENCIA_EM_VOO_S    validade da marca "em execução" (libera a chave se o worker morrer)
+
+CABECALHO = "Idempotency-Key"
+CHAVE_MAX_CARACTERES = 255
+
+CONFIG_PADRAO = {
+    "IDEMPOTENCIA_TTL_S": 24 * 3600,
+    "IDEMPOTENCIA_MAX_CHAVES": 100_000,
+    "IDEMPOTENCIA_ESPERA_S": 10,
+    "IDEMPOTENCIA_EM_VOO_S": 60,
+}
+
+# Situação de uma chave ao chegar uma requisição
+NOVA, PRONTA, EM_ANDAMENTO, CONFLITO = "nova", "pronta", "em_andamento", "conflito"
+
+
+# ------------------------------
+# BACKENDS DE CHAVES
+# ------------------------------
+class _Registro:
+    __slots__ = ("impressao", "resposta", "expira", "pronto")
+
+    def __init__(self, impressao, expira):
+        self.impressao = impressao
+        self.resposta = None  # (status, corpo, content-type) depois de concluir
+        self.expira = expira
+        self.pronto = threading.Event()
+
+
+class ChavesMemoria:
+    """Chaves no próprio processo, em LRU limitado; registros vencidos são descartados no acesso."""
+
+    def __init__(self, max_chaves=CONFIG_PADRAO["IDEMPOTENCIA_MAX_CHAVES"]):
+        self.max_chaves = max_chaves
+        self._registros = OrderedDict()
+        self._lock = threading.Lock()
+
+    def reservar(self, chave, impressao, em_voo_s, espera_s):
+        """Retorna (situação, resposta guardada ou None, se esperou por outra requisição).
+
+        NOVA reserva a chave para quem chamou, que depois precisa chamar concluir ou liberar.
+        """
+        fim = time.monotonic() + espera_s
+        esperou = False
+        while True:
+            agora = time.monotonic()
+            with self._lock:
+                registro = self._registros.get(chave)
+                if registro is not None and registro.expira <= agora:
+                    del self._registros[chave]
+                    registro = None
+                if registro is None:
+                    self._registros[chave] = _Registro(impressao, agora + em_voo_s)
+                    self._despejar(agora)
+                    return NOVA, None, esperou
+                self._registros.move_to_end(chave)
+                if registro.impressao != impressao:
+                    return CONFLITO, None, esperou
+                if registro.resposta is not None:
+                    return PRONTA, registro.resposta, esperou
+            # Outra requisição está executando: espera ela concluir ou liberar a chave
+            restante = fim - time.monotonic()
+            esperou = True
+            if restante <= 0 or not registro.pronto.wait(restante):
+                return EM_ANDAMENTO, None, esperou
+
+    def _despejar(self, agora):
+        while self._registros:
+            registro = next(iter(self._registros.values()))
+            if len(self._registros) <= self.max_chaves and registro.expira > agora:
+                break
+            self._registros.popitem(last=False)
+
+    def concluir(self, chave, impressao, resposta, ttl_s):
+        with self._lock:
+            registro = self._registros.get(chave)
+            if registro is None:
+                return
+            registro.resposta = resposta
+            registro.expira = time.monotonic() + ttl_s
+        registro.pronto.set()
+
+    def liberar(self, chave):
+        with self._lock:
+            registro = self._registros.pop(chave, None)
+        if registro is not None:
+            registro.pronto.set()
+
+    def __len__(self):
+        return len(self._registros)
+
+
+class ChavesRedis:
+    """Chaves compartilhadas entre workers: SET NX reserva, a resposta sobrescreve com o TTL final."""
+
+    INTERVALO_CONSULTA_S = 0.05
+
+    def __init__(self, url, prefixo="foodback:idempotencia:"):
+        import redis  # Opcional: só necessário com IDEMPOTENCIA_BACKEND=redis://...
+        self._cliente = redis.Redis.from_url(url)
+        self.prefixo = prefixo
+
+    def reservar(self, chave, impressao, em_voo_s, espera_s):
+        chave = self.prefixo + chave
+        fim = time.monotonic() + espera_s
+        esperou = False
+        while True:
+            if self._cliente.set(chave, json.dumps({"impressao": impressao}), nx=True, px=int(em_voo_s * 1000)):
+                return NOVA, None, esperou
+            bruto = self._cliente.get(chave)
+            if bruto is None:
+                continue  # Venceu ou foi liberada entre o SET e o GET
+            dados = json.loads(bruto)
+            if dados["impressao"] != impressao:
+                return CONFLITO, None, esperou
+            if "status" in dados:
+                return PRONTA, (dados["status"], base64.b64decode(dados["corpo"]), dados["tipo"]), esperou
+            if time.monotonic() >= fim:
+                return EM_ANDAMENTO, None, esperou
+            esperou = True
+            time.sleep(self.INTERVALO_CONSULTA_S)
+
+    def concluir(self, chave, impressao, resposta, ttl_s):
+        status, corpo, tipo = resposta
+        self._cliente.set(self.prefixo + chave, json.dumps({
+            "impressao": impressao, "status": status, "corpo": base64.b64encode(corpo).decode("ascii"), "tipo": tipo,
+        }), ex=int(ttl_s))
+
+    def liberar(self, chave):
+        self._cliente.delete(self.prefixo + chave)
+
+    def __len__(self):
+        return 0  # Não conta as chaves do servidor compartilhado
+
+
+def criar_backend(config):
+    backend = config.get("IDEMPOTENCIA_BACKEND", "memoria")
+    if backend == "memoria":
+        return ChavesMemoria(config.get("IDEMPOTENCIA_MAX_CHAVES", CONFIG_PADRAO["IDEMPOTENCIA_MAX_CHAVES"]))
+    if backend.startswith(("redis://", "rediss://", "unix://")):
+        return ChavesRedis(backend)
+    raise ValueError(f"IDEMPOTENCIA_BACKEND inválido: {backend!r}")
+
+
+class Idempotencia:
+
+    def __init__(self, app):
+        self.backend = criar_backend(app.config)
+        self.ttl_s = app.config.get("IDEMPOTENCIA_TTL_S", CONFIG_PADRAO["IDEMPOTENCIA_TTL_S"])
+        self.espera_s = app.config.get("IDEMPOTENCIA_ESPERA_S", CONFIG_PADRAO["IDEMPOTENCIA_ESPERA_S"])
+        self.em_voo_s = app.config.get("IDEMPOTENCIA_EM_VOO_S", CONFIG_PADRAO["IDEMPOTENCIA_EM_VOO_S"])
+        self.contadores = {"executadas": 0, "repetidas": 0, "esperaram": 0, "conflitos": 0, "em_andamento": 0}
+        self._lock = threading.Lock()
+
+    def contar(self, nome):
+        with self._lock:
+            self.contadores[nome] += 1
+
+
+def iniciar_idempotencia(app):
+    app.extensions["idempotencia"] = Idempotencia(app)
+    return app.extensions["idempotencia"]
+
+
+def estatisticas_idempotencia(app):
+    idempotencia = app.extensions.get("idempotencia")
+    if idempotencia is None:
+        return None
+    return dict(idempotencia.contadores, chaves=len(idempotencia.backend))
+
+
+def _impressao():
+    """Hash do pedido: a mesma chave só vale para o mesmo corpo."""
+    return hashlib.sha256(request.get_data()).hexdigest()
+
+
+def _repetir(resposta):
+    status, corpo, tipo = resposta
+    repetida = current_app.response_class(corpo, status=status, content_type=tipo)
+    repetida.headers["Idempotent-Replayed"] = "true"
+    return repetida
+
+
+def resultado_definitivo():
+    """Marca a resposta não 2xx desta requisição como o resultado da escrita, para que
+    seja guardada sob a chave como as 2xx."""
+    g.idempotencia_definitiva = True
+
+
+def idempotente(f):
+    """Honra o cabeçalho Idempotency-Key numa rota de escrita. Usar depois de @jwt_required()."""
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        idempotencia = current_app.extensions.get("idempotencia")
+        valor = request.headers.get(CABECALHO)
+        if idempotencia is None or valor is None:
+            return f(*args, **kwargs)
+        if not valor or len(valor) > CHAVE_MAX_CARACTERES:
+            return jsonify({"msg": f"{CABECALHO} deve ter de 1 a {CHAVE_MAX_CARACTERES} caracteres."}), 400
+
+        usuario = get_jwt_identity()
+        chave = f"{usuario['tipo']}:{usuario['id']}:{request.method}:{request.path}:{valor}"
+        impressao = _impressao()
+        situacao, guardada, esperou = idempotencia.backend.reservar(
+            chave, impressao, idempotencia.em_voo_s, idempotencia.espera_s)
+        if esperou:
+            idempotencia.contar("esperaram")
+
+        if situacao == CONFLITO:
+            idempotencia.contar("conflitos")
+            return jsonify({"msg": f"{CABECALHO} já usada com outro corpo de requisição."}), 422
+        if situacao == EM_ANDAMENTO:
+            idempotencia.contar("em_andamento")
+            resposta = jsonify({"msg": "Uma requisição com esta chave ainda está em andamento."})
+            resposta.status_code = 409
+            resposta.headers["Retry-After"] = "1"
+            return resposta
+        if situacao == PRONTA:
+            idempotencia.contar("repetidas")
+            return _repetir(guardada)
+
+        try:
+            resposta = make_response(f(*args, **kwargs))
+        except BaseException:
+            idempotencia.backend.liberar(chave)
+            raise
+        idempotencia.contar("executadas")
+        definitiva = 200 <= resposta.status_code < 300 or g.pop("idempotencia_definitiva", False)
+        if not definitiva or resposta.is_streamed:
+            idempotencia.backend.liberar(chave)
+        else:
+            idempotencia.backend.concluir(
+                chave, impressao, (resposta.status_code, resposta.get_data(), resposta.content_type), idempotencia.ttl_s)
+        return resposta
+    return decorated
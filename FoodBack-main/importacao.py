@@ -0,0 +1,199 @@
+import csv
+import io
+import json
+from datetime import datetime
+from functools import lru_cache
+from sqlalchemy.exc import SQLAlchemyError
+from extensions import db
+from models import Doacao
+from quantidades import interpretar_quantidade
+from estatisticas import registrar_evento
+from outbox import registrar_lote_importado
+
+# ------------------------------
+# IMPORTAÇÃO EM LOTE DE DOAÇÕES (NDJSON / CSV em stream)
+# ------------------------------
+# O corpo é lido linha a linha direto do stream da requisição; cada linha é validada na hora
+# e as válidas vão para o banco em blocos de LOTE_TAMANHO via executemany, com commit por bloco.
+# A memória fica limitada a um bloco + até LOTE_MAX_ERROS mensagens de erro, qualquer que seja
+# o tamanho do upload.
+
+LOTE_TAMANHO_PADRAO = 500
+LOTE_MAX_ERROS_PADRAO = 1000
+
+FORMATOS = {
+    "application/x-ndjson": "ndjson",
+    "application/jsonl": "ndjson",
+    "text/csv": "csv",
+}
+
+CAMPOS_OBRIGATORIOS = ("titulo", "tipo_alimento", "quantidade", "data_disponibilidade")
+CAMPOS_TEXTO = ("titulo", "descricao", "tipo_alimento")
+
+BOM_UTF8 = b"\xef\xbb\xbf"
+FIM_POR_CODIFICACAO = "Codificação inválida. Use UTF-8. O restante do arquivo foi ignorado."
+
+
+@lru_cache(maxsize=4096)
+def _parse_data(valor):
+    # Num lote as mesmas poucas datas se repetem milhares de vezes: cada string é convertida uma vez
+    return datetime.strptime(valor, '%Y-%m-%d').date()
+
+
+def _decodificar(stream, invalida):
+    """Linhas do corpo em texto, decodificadas uma a uma. Para na primeira linha que não é
+    UTF-8 e guarda o número dela em invalida[0]."""
+    for numero, bruta in enumerate(stream, start=1):
+        if numero == 1 and bruta.startswith(BOM_UTF8):
+            bruta = bruta[len(BOM_UTF8):]
+        try:
+            yield bruta.decode('utf-8')
+        except UnicodeDecodeError:
+            invalida.append(numero)
+            return
+
+
+def _linhas_ndjson(stream):
+    # Cada linha é decodificada sozinha: bytes inválidos rejeitam só a linha em que aparecem
+    for numero, bruta in enumerate(stream, start=1):
+        if numero == 1 and bruta.startswith(BOM_UTF8):
+            bruta = bruta[len(BOM_UTF8):]
+        try:
+            linha = bruta.decode('utf-8').strip()
+        except UnicodeDecodeError:
+            yield numero, None, "Codificação inválida. Use UTF-8."
+            continue
+        if not linha:
+            continue
+        try:
+            registro = json.loads(linha)
+        except ValueError:
+            yield numero, None, "JSON inválido."
+            continue
+        if not isinstance(registro, dict):
+            yield numero, None, "Cada linha deve ser um objeto JSON."
+            continue
+        yield numero, registro, None
+
+
+def _linhas_csv(stream):
+    # Linha 1 é o cabeçalho. Um registro malformado é rejeitado e a leitura continua; uma linha
+    # que não é UTF-8 encerra a leitura (um campo entre aspas pode continuar nas linhas seguintes)
+    invalida = []
+    leitor = csv.DictReader(_decodificar(stream, invalida))
+    while True:
+        try:
+            registro = next(leitor)
+        except StopIteration:
+            break
+        except csv.Error as e:
+            yield leitor.reader.line_num, None, f"CSV malformado: {e}."
+            continue
+        yield leitor.line_num, registro, None
+    if invalida:
+        yield invalida[0], None, FIM_POR_CODIFICACAO
+
+
+def validar_linha(registro, id_empresa):
+    """Converte um registro bruto nos valores de INSERT. Lança ValueError com a mensagem do erro."""
+    faltando = [campo for campo in CAMPOS_OBRIGATORIOS if not registro.get(campo)]
+    if faltando:
+        raise ValueError(f"Campos obrigatórios faltando: {', '.join(faltando)}.")
+
+    for campo in CAMPOS_TEXTO:
+        if registro.get(campo) is not None and not isinstance(registro[campo], str):
+            raise ValueError(f"O campo '{campo}' deve ser texto.")
+
+    try:
+        data_disp = _parse_data(str(registro["data_disponibilidade"]).strip())
+        validade = registro.get("data_validade")
+        data_val = _parse_data(str(validade).strip()) if validade else None
+    except ValueError:
+        raise ValueError("Formato de data inválido. Use YYYY-MM-DD.")
+
+    quantidade = str(registro["quantidade"])[:50]
+    quantidade_valor, quantidade_unidade = interpretar_quantidade(quantidade)
+
+    return {
+        "titulo": str(registro["titulo"])[:255],
+        "descricao": registro.get("descricao") or None,
+        "tipo_alimento": str(registro["tipo_alimento"])[:100],
+        "quantidade": quantidade,
+        "quantidade_valor": quantidade_valor,
+        "quantidade_unidade": quantidade_unidade,
+        "data_disponibilidade": data_disp,
+        "data_validade": data_val,
+        "status": "disponivel",
+        "id_empresa": id_empresa,
+    }
+
+
+def importar_doacoes(stream, formato, id_empresa, tamanho_lote=LOTE_TAMANHO_PADRAO,
+                     max_erros=LOTE_MAX_ERROS_PADRAO):
+    """Importa as doações do stream e retorna o resumo {inseridas, rejeitadas, erros}.
+
+    Os blocos já gravados ficam no banco mesmo se a leitura for interrompida; o resumo diz
+    quantos entraram (interrompida=True quando o restante do corpo não foi lido).
+    """
+    linhas = _linhas_ndjson(stream) if formato == "ndjson" else _linhas_csv(stream)
+    interrompida = False
+
+    inseridas = 0
+    rejeitadas = 0
+    erros = []
+    bloco = []
+
+    def gravar(bloco):
+        db.session.execute(db.insert(Doacao), bloco)
+        registrar_evento("criada", bloco)
+        registrar_lote_importado(bloco, id_empresa)
+        db.session.commit()
+
+    def gravar_ou_interromper(bloco, numero):
+        """Grava o bloco; se o banco falhar, desfaz só este bloco e registra o erro."""
+        try:
+            gravar(bloco)
+            return True
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            erros.append({"linha": numero, "erro": f"Falha ao gravar {len(bloco)} doações: {e.__class__.__name__}. "
+                                                    "O restante do arquivo foi ignorado."})
+            return False
+
+    for numero, registro, erro in linhas:
+        if erro is None:
+            try:
+                bloco.append(validar_linha(registro, id_empresa))
+            except ValueError as e:
+                erro = str(e)
+
+        if erro is not None:
+            interrompida = interrompida or erro == FIM_POR_CODIFICACAO
+            rejeitadas += 1
+            if len(erros) < max_erros:
+                erros.append({"linha": numero, "erro": erro})
+            continue
+
+        if len(bloco) >= tamanho_lote:
+            if not gravar_ou_interromper(bloco, numero):
+                rejeitadas += len(bloco)
+                interrompida = True
+                bloco = []
+                break
+            inseridas += len(bloco)
+            bloco = []
+
+    if bloco:
+        if gravar_ou_interromper(bloco, numero):
+            inseridas += len(bloco)
+        else:
+            rejeitadas += len(bloco)
+            interrompida = True
+
+    return {
+        "inseridas": inseridas,
+        "rejeitadas": rejeitadas,
+        "erros": erros,
+        "erros_omitidos": max(rejeitadas - len(erros), 0),
+        "interrompida": interrompida,
+    }
@@ -0,0 +1,67 @@
+from decimal import Decimal
+from flask import current_app
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # orjson é opcional: sem ele fica o json da biblioteca padrão
+    orjson = None
+
+# ------------------------------
+# PROVEDOR JSON RÁPIDO (orjson quando instalado)
+# ------------------------------
+# Substitui o provedor padrão do Flask (app.json): jsonify, request.get_json e os corpos
+# guardados no cache passam por aqui. Com orjson a serialização roda em C e já devolve bytes,
+# sem o passo str -> encode. As chaves continuam ordenadas, como no provedor padrão, e a saída
+# vai em UTF-8 (sem escapes \uXXXX). Datas, Decimal e demais tipos seguem as regras do Flask.
+
+
+def _padrao(obj):
+    # Tipos que o orjson não conhece: mesmo tratamento do provedor padrão do Flask
+    if isinstance(obj, Decimal):
+        return str(obj)
+    return DefaultJSONProvider.default(obj)
+
+
+class ProvedorJSONRapido(DefaultJSONProvider):
+    """Provedor JSON do app: orjson se disponível, senão o json da biblioteca padrão."""
+
+    ensure_ascii = False
+
+    def _opcoes(self):
+        # Datas vão para _padrao, que usa o formato do Flask (HTTP date), como no provedor padrão
+        opcoes = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if self.sort_keys:
+            opcoes |= orjson.OPT_SORT_KEYS
+        if self.compact is False or (self.compact is None and self._app.debug):
+            opcoes |= orjson.OPT_INDENT_2
+        return opcoes
+
+    def dumps_bytes(self, obj):
+        """Serializa direto para bytes UTF-8 (o formato dos corpos de resposta)."""
+        if orjson is not None:
+            return orjson.dumps(obj, default=_padrao, option=self._opcoes())
+        return self.dumps(obj).encode('utf-8')
+
+    def dumps(self, obj, **kwargs):
+        if orjson is not None and not kwargs:
+            return orjson.dumps(obj, default=_padrao, option=self._opcoes()).decode('utf-8')
+        return super().dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if orjson is not None and not kwargs:
+            return orjson.loads(s)
+        return super().loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self.dumps_bytes(obj), mimetype=self.mimetype)
+
+
+def json_bytes(obj):
+    """Corpo JSON em bytes pelo provedor do app atual (funciona também com o provedor padrão)."""
+    provedor = current_app.json
+    if hasattr(provedor, 'dumps_bytes'):
+        return provedor.dumps_bytes(obj)
+    return provedor.dumps(obj).encode('utf-8')
+
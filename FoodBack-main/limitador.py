@@ -0,0 +1,225 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from flask import current_app, jsonify, make_response, request
+
+# ------------------------------
+# CONTROLE DE ADMISSÃO DAS ROTAS COM BCRYPT (login e registro)
+# ------------------------------
+# Cada tentativa de login/registro gasta CPU de bcrypt. Antes de qualquer hash, @limitar:
+#   1. consome um token do balde do IP do cliente e (no login) confere o balde do email;
+#   2. reserva uma vaga entre as operações bcrypt em andamento no processo.
+# Se faltar token ou vaga a resposta é 429 com Retry-After, sem tocar no banco nem no bcrypt.
+# O balde do email só é cobrado quando a senha não confere (resposta 401): logins certos não
+# gastam as tentativas da conta, e quem tenta adivinhar a senha de alguém não consegue
+# bloqueá-la com requisições que nem chegam à verificação.
+#
+# Os baldes ficam em memória (por processo) ou num backend compartilhado compatível com Redis
+# (LIMITE_BACKEND=redis://...), para que vários workers dividam o mesmo limite.
+#
+# LIMITE_HABILITADO        liga/desliga o controle (padrão ligado)
+# LIMITE_BACKEND           "memoria" (padrão) ou URL redis:// (precisa do pacote redis)
+# LIMITE_LOGIN_IP          "N/S": rajada de N tentativas, repostas à taxa de N a cada S segundos
+# LIMITE_LOGIN_EMAIL       idem, por email tentado
+# LIMITE_REGISTRO_IP       idem, para o registro
+# BCRYPT_MAX_EM_VOO        requisições com bcrypt em andamento ao mesmo tempo no processo
+#                          (padrão 2 x BCRYPT_MAX_WORKERS: o pool ocupado + uma fila curta)
+
+LIMITES_PADRAO = {
+    "LIMITE_LOGIN_IP": "30/60",
+    "LIMITE_LOGIN_EMAIL": "5/300",
+    "LIMITE_REGISTRO_IP": "10/3600",
+}
+BALDES_EM_MEMORIA_MAX = 100_000
+
+
+def interpretar_limite(texto):
+    """'30/60' -> (capacidade 30, taxa 0.5 token/s)."""
+    capacidade, segundos = texto.split("/")
+    capacidade = int(capacidade)
+    return capacidade, capacidade / float(segundos)
+
+
+# ------------------------------
+# BACKENDS DE BALDES (token bucket)
+# ------------------------------
+class BaldesMemoria:
+    """Baldes no próprio processo, em LRU limitado (IPs/emails antigos são esquecidos)."""
+
+    def __init__(self, max_baldes=BALDES_EM_MEMORIA_MAX):
+        self.max_baldes = max_baldes
+        self._baldes = OrderedDict()
+        self._lock = threading.Lock()
+
+    def consumir(self, chave, capacidade, taxa, custo=1, cobrar=True):
+        """Retorna (permitido, segundos até haver tokens suficientes).
+
+        Com cobrar=False só confere se há tokens, sem descontá-los.
+        """
+        agora = time.monotonic()
+        with self._lock:
+            tokens, antes = self._baldes.get(chave, (capacidade, agora))
+            tokens = min(capacidade, tokens + (agora - antes) * taxa)
+            if tokens >= custo:
+                permitido, espera = True, 0.0
+                if cobrar:
+                    tokens -= custo
+            else:
+                permitido, espera = False, (custo - tokens) / taxa
+            self._baldes[chave] = (tokens, agora)
+            self._baldes.move_to_end(chave)
+            while len(self._baldes) > self.max_baldes:
+                self._baldes.popitem(last=False)
+        return permitido, espera
+
+
+# Mesmo algoritmo, atômico no servidor; o relógio é o do Redis (igual para todos os workers)
+_SCRIPT_BALDE = """
+local capacidade = tonumber(ARGV[1])
+local taxa = tonumber(ARGV[2])
+local custo = tonumber(ARGV[3])
+local cobrar = tonumber(ARGV[4])
+local relogio = redis.call('TIME')
+local agora = tonumber(relogio[1]) + tonumber(relogio[2]) / 1000000
+local dados = redis.call('HMGET', KEYS[1], 't', 'ts')
+local tokens = tonumber(dados[1]) or capacidade
+local antes = tonumber(dados[2]) or agora
+tokens = math.min(capacidade, tokens + (agora - antes) * taxa)
+local permitido = 0
+local espera = 0
+if tokens >= custo then
+    permitido = 1
+    if cobrar == 1 then
+        tokens = tokens - custo
+    end
+else
+    espera = (custo - tokens) / taxa
+end
+redis.call('HSET', KEYS[1], 't', tostring(tokens), 'ts', tostring(agora))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacidade / taxa) + 1)
+return {permitido, tostring(espera)}
+"""
+
+
+class BaldesRedis:
+    """Baldes compartilhados entre workers em qualquer servidor compatível com Redis (EVAL + Lua)."""
+
+    def __init__(self, url, prefixo="foodback:limite:"):
+        import redis  # Opcional: só necessário com LIMITE_BACKEND=redis://...
+        self._cliente = redis.Redis.from_url(url)
+        self._script = self._cliente.register_script(_SCRIPT_BALDE)
+        self.prefixo = prefixo
+
+    def consumir(self, chave, capacidade, taxa, custo=1, cobrar=True):
+        permitido, espera = self._script(keys=[self.prefixo + chave], args=[capacidade, taxa, custo, int(cobrar)])
+        return bool(int(permitido)), float(espera)
+
+
+def criar_backend(config):
+    backend = config.get("LIMITE_BACKEND", "memoria")
+    if backend == "memoria":
+        return BaldesMemoria()
+    if backend.startswith(("redis://", "rediss://", "unix://")):
+        return BaldesRedis(backend)
+    raise ValueError(f"LIMITE_BACKEND inválido: {backend!r}")
+
+
+# ------------------------------
+# LIMITE DE BCRYPT EM ANDAMENTO
+# ------------------------------
+class VagasBcrypt:
+    """Semáforo não bloqueante: sem vaga livre a requisição é recusada na hora."""
+
+    def __init__(self, maximo):
+        self.maximo = maximo
+        self._semaforo = threading.BoundedSemaphore(maximo)
+
+    def tentar(self):
+        return self._semaforo.acquire(blocking=False)
+
+    def liberar(self):
+        self._semaforo.release()
+
+
+class Limitador:
+
+    def __init__(self, app):
+        self.habilitado = app.config.get("LIMITE_HABILITADO", True)
+        self.backend = criar_backend(app.config)
+        self.limites = {
+            nome: interpretar_limite(app.config.get(nome, padrao)) for nome, padrao in LIMITES_PADRAO.items()
+        }
+        maximo = app.config.get("BCRYPT_MAX_EM_VOO") or 2 * app.config.get("BCRYPT_MAX_WORKERS", 4)
+        self.vagas = VagasBcrypt(maximo)
+        self.rejeicoes = {"ip": 0, "email": 0, "bcrypt": 0}
+        self._lock = threading.Lock()
+
+    def rejeitar(self, motivo):
+        with self._lock:
+            self.rejeicoes[motivo] += 1
+
+    def consumir(self, limite, chave, cobrar=True):
+        capacidade, taxa = self.limites[limite]
+        return self.backend.consumir(f"{limite}:{chave}", capacidade, taxa, cobrar=cobrar)
+
+
+def iniciar_limitador(app):
+    app.extensions["limitador"] = Limitador(app)
+    return app.extensions["limitador"]
+
+
+def estatisticas_limitador(app):
+    limitador = app.extensions.get("limitador")
+    return dict(limitador.rejeicoes) if limitador else {"ip": 0, "email": 0, "bcrypt": 0}
+
+
+def _muitas_tentativas(mensagem, espera):
+    resposta = jsonify({"msg": mensagem})
+    resposta.status_code = 429
+    resposta.headers["Retry-After"] = str(max(1, math.ceil(espera)))
+    return resposta
+
+
+def limitar(rota):
+    """Controle de admissão de uma rota com bcrypt ('login' ou 'registro')."""
+    limite_ip = f"LIMITE_{rota.upper()}_IP"
+    limite_email = f"LIMITE_{rota.upper()}_EMAIL"
+
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            limitador = current_app.extensions.get("limitador")
+            if limitador is None or not limitador.habilitado:
+                return f(*args, **kwargs)
+
+            permitido, espera = limitador.consumir(limite_ip, request.remote_addr or "desconhecido")
+            if not permitido:
+                limitador.rejeitar("ip")
+                return _muitas_tentativas("Muitas tentativas deste endereço. Tente novamente mais tarde.", espera)
+
+            email = None
+            if limite_email in limitador.limites:
+                dados = request.get_json(silent=True)
+                email = dados.get("email") if isinstance(dados, dict) else None
+                email = email.strip().lower() if isinstance(email, str) else None
+                if email:
+                    permitido, espera = limitador.consumir(limite_email, email, cobrar=False)
+                    if not permitido:
+                        limitador.rejeitar("email")
+                        return _muitas_tentativas("Muitas tentativas para este email. Tente novamente mais tarde.",
+                                                  espera)
+
+            if not limitador.vagas.tentar():
+                limitador.rejeitar("bcrypt")
+                return _muitas_tentativas("Servidor ocupado. Tente novamente em instantes.", 1)
+            try:
+                resposta = make_response(f(*args, **kwargs))
+            finally:
+                limitador.vagas.liberar()
+            if email and resposta.status_code == 401:
+                limitador.consumir(limite_email, email)
+            return resposta
+        return decorated
+    return decorator
@@ -0,0 +1,219 @@
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import defaultdict
+from datetime import date
+from extensions import db
+from models import Doacao, Solicitacao
+from texto import normalizar
+
+# ------------------------------
+# ÍNDICE DE COMPATIBILIDADE ENTRE SOLICITAÇÕES (necessidades) E DOAÇÕES (ofertas)
+# ------------------------------
+# Mantém em memória, por tipo de alimento normalizado, duas listas ordenadas:
+#   - solicitações abertas por data_limite (mais urgentes primeiro)
+#   - doações disponíveis por data_validade (vencem antes, saem antes)
+# As rotas de escrita atualizam o índice incrementalmente; cada consulta é um bisect e uma
+# varredura curta do início da lista, sem tocar no banco.
+# O índice é carregado do banco no primeiro uso e é por processo (cada worker tem o seu).
+# Como só o worker que atendeu a escrita aplica a atualização, os demais defasam:
+#   - o índice é recarregado do banco a cada INDICE_TTL segundos (padrão 30; vale também para geo.py);
+#   - consultar_confirmando() confere no banco, pela chave primária, se as doações e solicitações
+#     devolvidas ainda estão disponíveis/abertas, e tira do índice as que não estão antes de
+#     repetir a consulta. Uma doação reservada em outro worker nunca é oferecida.
+
+SEM_DATA = date.max  # Registros sem data limite/validade vão para o fim da fila
+INDICE_TTL_PADRAO = 30
+
+
+def _data_ou_max(valor):
+    if valor is None:
+        return SEM_DATA
+    if isinstance(valor, str):
+        return date.fromisoformat(valor)
+    return valor
+
+
+class IndiceCompatibilidade:
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.carregado = False
+        self._carregado_em = 0.0
+        self._limpar()
+
+    def _limpar(self):
+        self._solicitacoes = {}                          # id -> registro
+        self._solicitacoes_por_tipo = defaultdict(list)  # tipo -> [(data_limite, id)]
+        self._solicitacoes_por_ong = defaultdict(set)    # id_ong -> {id}
+        self._doacoes = {}                               # id -> registro
+        self._doacoes_por_tipo = defaultdict(list)       # tipo -> [(data_validade, id)]
+
+    # ------------------------------
+    # Carga e invalidação
+    # ------------------------------
+    def carregar(self):
+        """(Re)constrói o índice a partir do banco. Precisa de app context."""
+        solicitacoes = db.session.query(
+            Solicitacao.id_solicitacao, Solicitacao.titulo, Solicitacao.item_necessario,
+            Solicitacao.quantidade_necessaria, Solicitacao.data_limite, Solicitacao.id_ong,
+        ).filter(Solicitacao.status == 'aberta')
+        doacoes = db.session.query(
+            Doacao.id_doacao, Doacao.titulo, Doacao.tipo_alimento, Doacao.quantidade,
+            Doacao.data_validade, Doacao.data_disponibilidade, Doacao.id_empresa,
+        ).filter(Doacao.status == 'disponivel')
+
+        with self._lock:
+            self._limpar()
+            for linha in solicitacoes:
+                self._inserir_solicitacao(dict(linha._mapping))
+            for linha in doacoes:
+                self._inserir_doacao(dict(linha._mapping))
+            self.carregado = True
+            self._carregado_em = time.monotonic()
+
+    def garantir_carregado(self, ttl=INDICE_TTL_PADRAO):
+        if not self.carregado or time.monotonic() - self._carregado_em > ttl:
+            self.carregar()
+
+    def invalidar(self):
+        """Força recarga no próximo uso (ex.: após importação em lote ou varredura)."""
+        with self._lock:
+            self.carregado = False
+
+    # ------------------------------
+    # Atualização incremental (ignorada enquanto o índice não foi carregado)
+    # ------------------------------
+    def _inserir_solicitacao(self, registro):
+        registro["_tipo"] = normalizar(registro["item_necessario"])
+        registro["_limite"] = _data_ou_max(registro["data_limite"])
+        self._solicitacoes[registro["id_solicitacao"]] = registro
+        insort(self._solicitacoes_por_tipo[registro["_tipo"]], (registro["_limite"], registro["id_solicitacao"]))
+        self._solicitacoes_por_ong[registro["id_ong"]].add(registro["id_solicitacao"])
+
+    def _inserir_doacao(self, registro):
+        registro["_tipo"] = normalizar(registro["tipo_alimento"])
+        registro["_validade"] = _data_ou_max(registro["data_validade"])
+        self._doacoes[registro["id_doacao"]] = registro
+        insort(self._doacoes_por_tipo[registro["_tipo"]], (registro["_validade"], registro["id_doacao"]))
+
+    @staticmethod
+    def _remover_da_lista(lista, chave):
+        i = bisect_left(lista, chave)
+        if i < len(lista) and lista[i] == chave:
+            del lista[i]
+
+    def remover_solicitacao(self, id_solicitacao):
+        with self._lock:
+            registro = self._solicitacoes.pop(id_solicitacao, None)
+            if registro:
+                self._remover_da_lista(self._solicitacoes_por_tipo[registro["_tipo"]], (registro["_limite"], id_solicitacao))
+                self._solicitacoes_por_ong[registro["id_ong"]].discard(id_solicitacao)
+
+    def remover_doacao(self, id_doacao):
+        with self._lock:
+            registro = self._doacoes.pop(id_doacao, None)
+            if registro:
+                self._remover_da_lista(self._doacoes_por_tipo[registro["_tipo"]], (registro["_validade"], id_doacao))
+
+    def atualizar_solicitacao(self, dados):
+        """Aplica o estado atual de uma solicitação (dict de Solicitacao.to_dict)."""
+        if not self.carregado:
+            return
+        with self._lock:
+            self.remover_solicitacao(dados["id_solicitacao"])
+            if dados.get("status") == 'aberta':
+                self._inserir_solicitacao({campo: dados.get(campo) for campo in (
+                    "id_solicitacao", "titulo", "item_necessario", "quantidade_necessaria", "data_limite", "id_ong")})
+
+    def atualizar_doacao(self, dados):
+        """Aplica o estado atual de uma doação (dict de serializers.linha_doacao_to_dict)."""
+        if not self.carregado:
+            return
+        with self._lock:
+            self.remover_doacao(dados["id_doacao"])
+            if dados.get("status") == 'disponivel':
+                self._inserir_doacao({campo: dados.get(campo) for campo in (
+                    "id_doacao", "titulo", "tipo_alimento", "quantidade", "data_validade",
+                    "data_disponibilidade", "id_empresa")})
+
+    # ------------------------------
+    # Consultas
+    # ------------------------------
+    def solicitacoes_para_doacao(self, tipo_alimento, data_disponibilidade=None, limite=10, hoje=None):
+        """Solicitações abertas do mesmo tipo, mais urgentes primeiro, que a doação ainda atende a tempo."""
+        hoje = hoje or date.today()
+        inicio = max(_data_ou_max(data_disponibilidade) if data_disponibilidade else hoje, hoje)
+        with self._lock:
+            lista = self._solicitacoes_por_tipo.get(normalizar(tipo_alimento), [])
+            i = bisect_left(lista, (inicio, 0))
+            return [_publico(self._solicitacoes[id_s]) for _, id_s in lista[i:i + limite]]
+
+    def doacoes_para_ong(self, id_ong, limite=10, hoje=None):
+        """Doações disponíveis para os tipos que a ONG tem em solicitações abertas.
+
+        Ordena por validade (as que vencem antes primeiro), ignorando as já vencidas.
+        """
+        hoje = hoje or date.today()
+        with self._lock:
+            # Para cada tipo, guarda a solicitação mais urgente da ONG, que a doação vai atender
+            por_tipo = {}
+            for id_s in self._solicitacoes_por_ong.get(id_ong, ()):
+                registro = self._solicitacoes[id_s]
+                atual = por_tipo.get(registro["_tipo"])
+                if atual is None or registro["_limite"] < atual["_limite"]:
+                    por_tipo[registro["_tipo"]] = registro
+
+            candidatas = []
+            for tipo, solicitacao in por_tipo.items():
+                lista = self._doacoes_por_tipo.get(tipo, [])
+                i = bisect_left(lista, (hoje, 0))
+                for validade, id_d in lista[i:i + limite]:
+                    candidatas.append((validade, id_d, solicitacao["id_solicitacao"]))
+
+            candidatas.sort()
+            resultado = []
+            for _, id_d, id_s in candidatas[:limite]:
+                item = _publico(self._doacoes[id_d])
+                item["id_solicitacao"] = id_s
+                resultado.append(item)
+            return resultado
+
+    def consultar_confirmando(self, consultar):
+        """Executa `consultar()` e confere no banco os itens devolvidos.
+
+        Doações que não estão mais 'disponivel' e solicitações que não estão mais 'aberta'
+        (alteradas em outro worker) saem do índice e a consulta é repetida.
+        """
+        while True:
+            resultado = consultar()
+            vencidas = _fora_do_status(Doacao.id_doacao, Doacao.status, 'disponivel',
+                                       {item["id_doacao"] for item in resultado if "id_doacao" in item})
+            fechadas = _fora_do_status(Solicitacao.id_solicitacao, Solicitacao.status, 'aberta',
+                                       {item["id_solicitacao"] for item in resultado if "id_solicitacao" in item})
+            if not vencidas and not fechadas:
+                return resultado
+            for id_doacao in vencidas:
+                self.remover_doacao(id_doacao)
+            for id_solicitacao in fechadas:
+                self.remover_solicitacao(id_solicitacao)
+
+
+def _fora_do_status(coluna_id, coluna_status, status, ids):
+    """IDs de `ids` cuja linha no banco não está mais em `status` (ou não existe)."""
+    if not ids:
+        return set()
+    return ids - {i for (i,) in db.session.query(coluna_id).filter(coluna_id.in_(ids), coluna_status == status)}
+
+
+def _publico(registro):
+    """Cópia do registro sem os campos internos do índice, com datas em ISO."""
+    item = {}
+    for campo, valor in registro.items():
+        if campo.startswith('_'):
+            continue
+        item[campo] = valor.isoformat() if isinstance(valor, date) else valor
+    return item
+
+
+indice = IndiceCompatibilidade()
@@ -0,0 +1,246 @@
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+from flask import g, has_request_context, request, request_started, request_finished
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# ------------------------------
+# MÉTRICAS POR ENDPOINT (latência, SQL, bcrypt, tamanho da resposta)
+# ------------------------------
+# Os sinais request_started/request_finished do Flask abrem e fecham o estado da requisição em `g`;
+# os eventos de cursor do SQLAlchemy (em todas as engines) somam consultas e tempo de banco nele,
+# e credenciais.py soma o tempo de bcrypt. No fim da requisição tudo é agregado por endpoint e
+# exposto no formato texto do Prometheus em /api/admin/metrics (ver admin.py).
+# Os números são por processo: com vários workers, cada um expõe os seus.
+#
+# SLOW_REQUEST_MS  requisições mais lentas que isso (ms) são logadas com a lista de consultas
+#                  (padrão 0 = desligado)
+
+BUCKETS_LATENCIA = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+BUCKETS_CONSULTAS = (1, 2, 3, 5, 10, 20, 50, 100)
+BUCKETS_TAMANHO = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+LENTAS_GUARDADAS = 50          # últimas requisições lentas mantidas para /api/admin/metrics/lentas
+CONSULTAS_POR_LENTA = 100      # limite de instruções guardadas por requisição lenta
+
+logger = logging.getLogger(__name__)
+
+
+class Histograma:
+    """Histograma cumulativo no formato do Prometheus (buckets, soma e contagem)."""
+
+    __slots__ = ('limites', 'contagens', 'soma', 'total')
+
+    def __init__(self, limites):
+        self.limites = limites
+        self.contagens = [0] * len(limites)
+        self.soma = 0.0
+        self.total = 0
+
+    def observar(self, valor):
+        for i, limite in enumerate(self.limites):
+            if valor <= limite:
+                self.contagens[i] += 1
+                break
+        self.soma += valor
+        self.total += 1
+
+    def linhas(self, nome, rotulos):
+        acumulado = 0
+        for limite, contagem in zip(self.limites, self.contagens):
+            acumulado += contagem
+            yield f'{nome}_bucket{{{rotulos},le="{limite}"}} {acumulado}'
+        yield f'{nome}_bucket{{{rotulos},le="+Inf"}} {self.total}'
+        yield f'{nome}_sum{{{rotulos}}} {self.soma:.6f}'
+        yield f'{nome}_count{{{rotulos}}} {self.total}'
+
+
+class EstadoRequisicao:
+    """Medições da requisição em andamento (guardado em g)."""
+
+    __slots__ = ('inicio', 'consultas', 'tempo_db', 'tempo_bcrypt', 'operacoes_bcrypt', 'instrucoes', '_pilha')
+
+    def __init__(self, guardar_instrucoes):
+        self.inicio = time.perf_counter()
+        self.consultas = 0
+        self.tempo_db = 0.0
+        self.tempo_bcrypt = 0.0
+        self.operacoes_bcrypt = 0
+        self.instrucoes = [] if guardar_instrucoes else None
+        self._pilha = []
+
+
+class MetricasEndpoint:
+
+    def __init__(self):
+        self.latencia = Histograma(BUCKETS_LATENCIA)
+        self.consultas_por_requisicao = Histograma(BUCKETS_CONSULTAS)
+        self.tamanho_resposta = Histograma(BUCKETS_TAMANHO)
+        self.status = defaultdict(int)
+        self.consultas = 0
+        self.tempo_db = 0.0
+        self.tempo_bcrypt = 0.0
+        self.operacoes_bcrypt = 0
+
+
+class Metricas:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints = defaultdict(MetricasEndpoint)
+        self.lentas = deque(maxlen=LENTAS_GUARDADAS)
+        self.limite_lenta_ms = 0
+
+    def registrar(self, endpoint, metodo, status, estado, tamanho):
+        duracao = time.perf_counter() - estado.inicio
+        with self._lock:
+            m = self._endpoints[(endpoint, metodo)]
+            m.latencia.observar(duracao)
+            m.consultas_por_requisicao.observar(estado.consultas)
+            if tamanho is not None:
+                m.tamanho_resposta.observar(tamanho)
+            m.status[status] += 1
+            m.consultas += estado.consultas
+            m.tempo_db += estado.tempo_db
+            m.tempo_bcrypt += estado.tempo_bcrypt
+            m.operacoes_bcrypt += estado.operacoes_bcrypt
+        return duracao
+
+    def limpar(self):
+        with self._lock:
+            self._endpoints.clear()
+            self.lentas.clear()
+
+    def texto_prometheus(self, extras=()):
+        """Todas as séries no formato texto de exposição do Prometheus (versão 0.0.4)."""
+        with self._lock:
+            itens = sorted(self._endpoints.items())
+            linhas = [
+                "# HELP foodback_http_requests_total Requisições atendidas por endpoint, método e status.",
+                "# TYPE foodback_http_requests_total counter",
+            ]
+            for (endpoint, metodo), m in itens:
+                for status, total in sorted(m.status.items()):
+                    linhas.append(f'foodback_http_requests_total{{{_rotulos(endpoint, metodo)},'
+                                  f'status="{status}"}} {total}')
+
+            for nome, ajuda, atributo in (
+                ("foodback_http_request_duration_seconds", "Latência das requisições.", "latencia"),
+                ("foodback_db_statements_per_request", "Consultas SQL por requisição.", "consultas_por_requisicao"),
+                ("foodback_http_response_size_bytes", "Tamanho do corpo das respostas.", "tamanho_resposta"),
+            ):
+                linhas += [f"# HELP {nome} {ajuda}", f"# TYPE {nome} histogram"]
+                for (endpoint, metodo), m in itens:
+                    linhas.extend(getattr(m, atributo).linhas(nome, _rotulos(endpoint, metodo)))
+
+            for nome, ajuda, atributo, formato in (
+                ("foodback_db_statements_total", "Consultas SQL executadas.", "consultas", "{}"),
+                ("foodback_db_time_seconds_total", "Tempo gasto no banco.", "tempo_db", "{:.6f}"),
+                ("foodback_bcrypt_operations_total", "Operações bcrypt (hash e verificação).",
+                 "operacoes_bcrypt", "{}"),
+                ("foodback_bcrypt_time_seconds_total", "Tempo gasto em bcrypt.", "tempo_bcrypt", "{:.6f}"),
+            ):
+                linhas += [f"# HELP {nome} {ajuda}", f"# TYPE {nome} counter"]
+                for (endpoint, metodo), m in itens:
+                    valor = formato.format(getattr(m, atributo))
+                    linhas.append(f'{nome}{{{_rotulos(endpoint, metodo)}}} {valor}')
+
+        for nome, tipo, ajuda, valor in extras:
+            linhas += [f"# HELP {nome} {ajuda}", f"# TYPE {nome} {tipo}", f"{nome} {valor}"]
+        return "\n".join(linhas) + "\n"
+
+
+def _rotulos(endpoint, metodo):
+    return f'endpoint="{endpoint}",method="{metodo}"'
+
+
+metricas = Metricas()
+
+
+# ------------------------------
+# GANCHOS (sinais do Flask e eventos do SQLAlchemy)
+# ------------------------------
+def _estado():
+    return g.get('_metricas') if has_request_context() else None
+
+
+def _inicio_requisicao(remetente, **extra):
+    g._metricas = EstadoRequisicao(guardar_instrucoes=metricas.limite_lenta_ms > 0)
+
+
+def _fim_requisicao(remetente, response, **extra):
+    estado = _estado()
+    if estado is None:
+        return
+    endpoint = request.endpoint or "sem_rota"
+    # Respostas em stream não têm tamanho conhecido
+    tamanho = None if response.is_streamed else response.calculate_content_length()
+    duracao = metricas.registrar(endpoint, request.method, response.status_code, estado, tamanho)
+
+    duracao_ms = duracao * 1000
+    if metricas.limite_lenta_ms and duracao_ms >= metricas.limite_lenta_ms:
+        lenta = {
+            "endpoint": endpoint,
+            "metodo": request.method,
+            "caminho": request.full_path.rstrip('?'),
+            "status": response.status_code,
+            "duracao_ms": round(duracao_ms, 2),
+            "consultas": estado.consultas,
+            "tempo_db_ms": round(estado.tempo_db * 1000, 2),
+            "tempo_bcrypt_ms": round(estado.tempo_bcrypt * 1000, 2),
+            "instrucoes": estado.instrucoes,
+        }
+        metricas.lentas.append(lenta)
+        logger.warning("Requisição lenta %s %s: %.1fms, %d consultas (%.1fms no banco)\n%s",
+                       request.method, lenta["caminho"], duracao_ms, estado.consultas, estado.tempo_db * 1000,
+                       "\n".join(f"  {i['duracao_ms']:8.2f}ms  {i['sql']}" for i in estado.instrucoes or ()))
+
+
+def _antes_consulta(conn, cursor, statement, parameters, context, executemany):
+    estado = _estado()
+    if estado is not None:
+        estado._pilha.append(time.perf_counter())
+
+
+def _depois_consulta(conn, cursor, statement, parameters, context, executemany):
+    estado = _estado()
+    if estado is None or not estado._pilha:
+        return
+    duracao = time.perf_counter() - estado._pilha.pop()
+    estado.consultas += 1
+    estado.tempo_db += duracao
+    if estado.instrucoes is not None and len(estado.instrucoes) < CONSULTAS_POR_LENTA:
+        estado.instrucoes.append({"sql": " ".join(statement.split())[:500], "duracao_ms": round(duracao * 1000, 3)})
+
+
+def _erro_consulta(contexto):
+    # Consulta que falhou não dispara after_cursor_execute: descarta o início pendente
+    estado = _estado()
+    if estado is not None and estado._pilha:
+        estado._pilha.pop()
+
+
+def registrar_bcrypt(segundos):
+    """Soma uma operação bcrypt à requisição atual (chamado por credenciais.py)."""
+    estado = _estado()
+    if estado is not None:
+        estado.tempo_bcrypt += segundos
+        estado.operacoes_bcrypt += 1
+
+
+_eventos_instalados = False
+
+
+def iniciar_metricas(app):
+    """Liga a instrumentação ao app. Os eventos de engine valem para todas as engines (primário e réplicas)."""
+    global _eventos_instalados
+    metricas.limite_lenta_ms = app.config.get("SLOW_REQUEST_MS", 0)
+    request_started.connect(_inicio_requisicao, app)
+    request_finished.connect(_fim_requisicao, app)
+    if not _eventos_instalados:
+        event.listen(Engine, "before_cursor_execute", _antes_consulta)
+        event.listen(Engine, "after_cursor_execute", _depois_consulta)
+        event.listen(Engine, "handle_error", _erro_consulta)
+        _eventos_instalados = True
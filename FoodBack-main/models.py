@@ -1,6 +1,9 @@
 from extensions import db
 from datetime import datetime
 from sqlalchemy.sql import func # Importa 'func' para usar funções do banco (como data/hora automáticas)
+from sqlalchemy.dialects import sqlite
+from sqlalchemy.orm import validates
+from quantidades import interpretar_quantidade
 
 # =========================================================
 # CLASSES DE USUÁRIO (Admin, Empresa, ONG)
@@ -18,6 +21,10 @@ class Admin(db.Model):
 
 class Empresa(db.Model):
     __tablename__ = 'empresa'
+    # Fila de contas pendentes (is_approved=False, rejeitado_em NULL) paginada por (data_cadastro, id)
+    __table_args__ = (
+        db.Index('ix_empresa_aprovacao_cadastro', 'is_approved', 'rejeitado_em', 'data_cadastro', 'id_empresa'),
+    )
     id_empresa = db.Column(db.Integer, primary_key=True)
     cnpj = db.Column(db.String(20), unique=True, nullable=True)
     nome_empresa = db.Column(db.String(255), nullable=False)
@@ -25,8 +32,12 @@ class Empresa(db.Model):
     senha = db.Column(db.String(255), nullable=False)
     telefone = db.Column(db.String(50))
     endereco = db.Column(db.String(255))
+    # Localização (informada ou geocodificada pela tabela local, ver geo.py); as doações ficam aqui
+    latitude = db.Column(db.Float)
+    longitude = db.Column(db.Float)
     data_cadastro = db.Column(db.DateTime, default=datetime.utcnow) 
     is_approved = db.Column(db.Boolean, default=False) 
+    rejeitado_em = db.Column(db.DateTime) # Preenchido quando o Admin rejeita; tira a conta da fila de pendentes
 
     # O relacionamento é definido na classe Doacao/Solicitacao
     
@@ -35,6 +46,10 @@ class Empresa(db.Model):
 
 class ONG(db.Model):
     __tablename__ = 'ong'
+    # Fila de contas pendentes (is_approved=False, rejeitado_em NULL) paginada por (data_cadastro, id)
+    __table_args__ = (
+        db.Index('ix_ong_aprovacao_cadastro', 'is_approved', 'rejeitado_em', 'data_cadastro', 'id_ong'),
+    )
     id_ong = db.Column(db.Integer, primary_key=True)
     cnpj = db.Column(db.String(20), unique=True, nullable=True)
     nome_ong = db.Column(db.String(255), nullable=False)
@@ -42,32 +57,91 @@ class ONG(db.Model):
     senha = db.Column(db.String(255), nullable=False)
     telefone = db.Column(db.String(50))
     endereco = db.Column(db.String(255))
+    # Origem padrão da busca por proximidade da ONG (ver geo.py)
+    latitude = db.Column(db.Float)
+    longitude = db.Column(db.Float)
     data_cadastro = db.Column(db.DateTime, default=datetime.utcnow)
     is_approved = db.Column(db.Boolean, default=False) 
+    rejeitado_em = db.Column(db.DateTime) # Preenchido quando o Admin rejeita; tira a conta da fila de pendentes
 
     # O relacionamento é definido na classe Doacao/Solicitacao
     
     def get_id(self):
         return self.id_ong
 
+# =========================================================
+# TABELA LOCAL DE GEOCODIFICAÇÃO (sem serviço externo)
+# =========================================================
+
+class Geocodificacao(db.Model):
+    """Coordenadas conhecidas por chave: CEP (8 dígitos), prefixo de CEP (5 dígitos) ou texto
+    normalizado como "recife/pe". Populada por `flask importar-geocodificacao` (ver geo.py)."""
+    __tablename__ = 'geocodificacao'
+    chave = db.Column(db.String(255), primary_key=True)
+    latitude = db.Column(db.Float, nullable=False)
+    longitude = db.Column(db.Float, nullable=False)
+
+# =========================================================
+# ÍNDICE UNIFICADO DE CREDENCIAIS (email -> tipo, id, hash)
+# =========================================================
+
+class Credencial(db.Model):
+    """Espelho de login de Admin/Empresa/ONG: o login vira uma única consulta pela PK (email).
+
+    Mantido em sincronia por auth.register, seed_admin e a aprovação de contas (credenciais.py).
+    """
+    __tablename__ = 'credencial'
+    __table_args__ = (
+        db.UniqueConstraint('tipo', 'id_usuario', name='uq_credencial_usuario'),
+    )
+    email = db.Column(db.String(255), primary_key=True)
+    tipo = db.Column(db.String(20), nullable=False) # admin, empresa, ong
+    id_usuario = db.Column(db.Integer, nullable=False)
+    senha = db.Column(db.String(255), nullable=False)
+    is_approved = db.Column(db.Boolean, default=False)
+    # Incrementada a cada mudança de aprovação: tokens emitidos com versão antiga deixam de valer
+    versao = db.Column(db.Integer, nullable=False, default=1)
+
 # =========================================================
 # CLASSE DE DOAÇÃO
 # =========================================================
 
 class Doacao(db.Model):
     __tablename__ = 'doacao'
+    # Índices compostos usados pela listagem paginada (keyset) de doações disponíveis:
+    # cada página vira uma leitura de faixa no índice, sem ordenar a tabela inteira.
+    __table_args__ = (
+        db.Index('ix_doacao_status_criacao', 'status', 'data_criacao', 'id_doacao'),
+        db.Index('ix_doacao_status_tipo_criacao', 'status', 'tipo_alimento', 'data_criacao', 'id_doacao'),
+        # Usado pela varredura de doações vencidas (expiracao.py)
+        db.Index('ix_doacao_status_validade', 'status', 'data_validade'),
+        # Busca textual (/api/doacoes/busca); só existe no MySQL, nos outros bancos busca.py usa índice em memória
+        db.Index('ix_doacao_fulltext', 'titulo', 'descricao', mysql_prefix='FULLTEXT').ddl_if(dialect='mysql'),
+    )
+
     id_doacao = db.Column(db.Integer, primary_key=True)
     titulo = db.Column(db.String(255), nullable=False)
     descricao = db.Column(db.Text)
     tipo_alimento = db.Column(db.String(100), nullable=False)
     quantidade = db.Column(db.String(50), nullable=False)
+    # Quantidade interpretada na escrita (ver quantidades.py), usada nas estatísticas
+    quantidade_valor = db.Column(db.Numeric(14, 3))
+    quantidade_unidade = db.Column(db.String(20))
     data_validade = db.Column(db.Date) # Melhor usar data de validade para alimentos
+    data_disponibilidade = db.Column(db.Date) # A partir de quando a doação pode ser retirada
     
-    # status: disponivel -> reservado (por ONG) -> concluida
+    # status: disponivel -> reservado (por ONG) -> concluida; disponivel -> expirada (validade vencida)
     status = db.Column(db.String(50), default='disponivel') 
     
-    data_criacao = db.Column(db.DateTime(timezone=True), server_default=func.now())
+    # No SQLite o CURRENT_TIMESTAMP não tem microssegundos; o variant grava/compara no mesmo
+    # formato para que o cursor (data_criacao, id_doacao) funcione também nos testes locais.
+    data_criacao = db.Column(
+        db.DateTime(timezone=True).with_variant(sqlite.DATETIME(truncate_microseconds=True), 'sqlite'),
+        server_default=func.now()
+    )
     data_atualizacao = db.Column(db.DateTime(timezone=True), onupdate=func.now()) # Novo campo
+    # Última mudança de status (reserva, expiração), em UTC: o arquivamento conta a idade daqui
+    data_status = db.Column(db.DateTime)
 
     # Chave Estrangeira para a Empresa (quem doou)
     id_empresa = db.Column(db.Integer, db.ForeignKey('empresa.id_empresa'), nullable=False)
@@ -83,20 +157,12 @@ class Doacao(db.Model):
     id_solicitacao = db.Column(db.Integer, db.ForeignKey('solicitacao.id_solicitacao'), nullable=True)
     solicitacao_atendida = db.relationship('Solicitacao', backref='doacao_atendimento', foreign_keys=[id_solicitacao])
 
-    def to_dict(self):
-        return {
-            'id_doacao': self.id_doacao,
-            'titulo': self.titulo,
-            'descricao': self.descricao,
-            'tipo_alimento': self.tipo_alimento,
-            'quantidade': self.quantidade,
-            'data_validade': self.data_validade.isoformat() if self.data_validade else None,
-            'status': self.status,
-            'id_empresa': self.id_empresa,
-            'id_ong_recebedora': self.id_ong_recebedora,
-            'id_solicitacao': self.id_solicitacao,
-            'data_criacao': self.data_criacao.isoformat() if self.data_criacao else None,
-        }
+    @validates('quantidade')
+    def _interpretar_quantidade(self, chave, valor):
+        self.quantidade_valor, self.quantidade_unidade = interpretar_quantidade(valor)
+        return valor
+
+    # A serialização para a API fica em serializers.py (consulta em lote, sem N+1)
 
 
 # =========================================================
@@ -105,14 +171,24 @@ class Doacao(db.Model):
 
 class Solicitacao(db.Model):
     __tablename__ = 'solicitacao'
+    # Usado pela varredura de solicitações vencidas (expiracao.py)
+    __table_args__ = (
+        db.Index('ix_solicitacao_status_limite', 'status', 'data_limite'),
+        # ONGs interessadas num tipo de alimento (notificações, ver outbox.py)
+        db.Index('ix_solicitacao_status_item', 'status', 'item_necessario'),
+        # Solicitações encerradas antigas a mover para o arquivo (arquivamento.py)
+        db.Index('ix_solicitacao_status_criacao', 'status', 'data_criacao'),
+    )
     id_solicitacao = db.Column(db.Integer, primary_key=True)
     
     titulo = db.Column(db.String(255), nullable=False)
     descricao = db.Column(db.Text)
     item_necessario = db.Column(db.String(100), nullable=False)
     quantidade_necessaria = db.Column(db.String(50), nullable=False)
+    quantidade_necessaria_valor = db.Column(db.Numeric(14, 3))
+    quantidade_necessaria_unidade = db.Column(db.String(20))
     data_limite = db.Column(db.Date) # Data limite para receber
-    status = db.Column(db.String(50), default='aberta') # aberta, atendida, cancelada
+    status = db.Column(db.String(50), default='aberta') # aberta, atendida, cancelada, expirada
     
     data_criacao = db.Column(db.DateTime(timezone=True), server_default=func.now())
     
@@ -121,6 +197,11 @@ class Solicitacao(db.Model):
     # Relacionamento: ONG que criou a solicitação
     ong = db.relationship('ONG', backref='solicitacoes', foreign_keys=[id_ong])
 
+    @validates('quantidade_necessaria')
+    def _interpretar_quantidade(self, chave, valor):
+        self.quantidade_necessaria_valor, self.quantidade_necessaria_unidade = interpretar_quantidade(valor)
+        return valor
+
     def to_dict(self):
         return {
             'id_solicitacao': self.id_solicitacao,
@@ -132,4 +213,85 @@ class Solicitacao(db.Model):
             'status': self.status,
             'id_ong': self.id_ong,
             'data_criacao': self.data_criacao.isoformat() if self.data_criacao else None,
-        }
\ No newline at end of file
+        }
+
+
+# =========================================================
+# RESUMO ESTATÍSTICO (mantido incrementalmente, ver estatisticas.py)
+# =========================================================
+
+class ResumoDoacao(db.Model):
+    """Totais por dimensão (empresa, ong, tipo), dia, evento e unidade.
+
+    Cada mudança de status de doação soma aqui na mesma transação, então os painéis
+    agregam O(grupos) linhas em vez de varrer a tabela doacao.
+    """
+    __tablename__ = 'resumo_doacao'
+    __table_args__ = (
+        db.UniqueConstraint('dimensao', 'chave', 'dia', 'evento', 'unidade', name='uq_resumo_doacao'),
+        db.Index('ix_resumo_dimensao_evento_dia', 'dimensao', 'evento', 'dia'),
+    )
+    id_resumo = db.Column(db.Integer, primary_key=True)
+    dimensao = db.Column(db.String(20), nullable=False) # empresa, ong, tipo
+    chave = db.Column(db.String(100), nullable=False)   # id da empresa/ONG ou tipo de alimento normalizado
+    dia = db.Column(db.Date, nullable=False)
+    evento = db.Column(db.String(20), nullable=False)   # criada, reservada, removida, expirada
+    unidade = db.Column(db.String(20), nullable=False, default='')
+    total_doacoes = db.Column(db.Integer, nullable=False, default=0)
+    quantidade_total = db.Column(db.Numeric(16, 3), nullable=False, default=0)
+
+
+# =========================================================
+# OUTBOX DE NOTIFICAÇÕES (gravada na transação da escrita, ver outbox.py)
+# =========================================================
+
+class MensagemOutbox(db.Model):
+    """Uma mudança de doação a notificar (id_ong nulo, ainda a expandir) ou uma entrega para uma ONG."""
+    __tablename__ = 'outbox'
+    __table_args__ = (
+        # Próximas mensagens prontas para os entregadores
+        db.Index('ix_outbox_status_proxima', 'status', 'proxima_tentativa'),
+    )
+    id_mensagem = db.Column(db.Integer, primary_key=True)
+    evento = db.Column(db.String(30), nullable=False)  # criada, atualizada, reservada, removida, lote_importado
+    id_ong = db.Column(db.Integer)                     # destinatário; NULL = descobrir as ONGs interessadas
+    payload = db.Column(db.Text, nullable=False)       # JSON com os dados da doação
+    status = db.Column(db.String(20), nullable=False, default='pendente')  # pendente, morta (desistiu)
+    tentativas = db.Column(db.Integer, nullable=False, default=0)
+    proxima_tentativa = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    # Reserva temporária de um entregador: outros só pegam a mensagem depois que ela vence
+    dono = db.Column(db.String(64))
+    reservada_ate = db.Column(db.DateTime)
+    ultimo_erro = db.Column(db.String(500))
+    criada_em = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+
+# =========================================================
+# ARQUIVO (linhas encerradas antigas, fora das tabelas quentes; ver arquivamento.py)
+# =========================================================
+
+def _tabela_arquivo(nome, modelo, *indices):
+    """Tabela com as mesmas colunas de `modelo` (sem FKs nem defaults) mais a data do arquivamento."""
+    colunas = [
+        db.Column(coluna.name, coluna.type, primary_key=coluna.primary_key, nullable=coluna.nullable,
+                  autoincrement=False)
+        for coluna in modelo.__table__.columns
+    ]
+    return db.Table(nome, db.metadata, *colunas, db.Column('arquivada_em', db.DateTime, nullable=False), *indices)
+
+
+class DoacaoArquivada(db.Model):
+    """Doação concluída/expirada movida de `doacao`; mesmos nomes de atributos, só leitura."""
+    __table__ = _tabela_arquivo(
+        'doacao_arquivo', Doacao,
+        db.Index('ix_doacao_arquivo_empresa', 'id_empresa', 'id_doacao'),
+        db.Index('ix_doacao_arquivo_ong', 'id_ong_recebedora', 'id_doacao'),
+    )
+
+
+class SolicitacaoArquivada(db.Model):
+    """Solicitação encerrada movida de `solicitacao`; mesmos nomes de atributos, só leitura."""
+    __table__ = _tabela_arquivo(
+        'solicitacao_arquivo', Solicitacao,
+        db.Index('ix_solicitacao_arquivo_ong', 'id_ong', 'id_solicitacao'),
+    )
@@ -0,0 +1,397 @@
+import hashlib
+import hmac
+import json
+import logging
+import random
+import smtplib
+import threading
+import time
+import urllib.request
+import uuid
+from datetime import date, datetime, timedelta
+from email.message import EmailMessage
+from flask import current_app
+from extensions import db
+from models import MensagemOutbox, ONG, Solicitacao
+
+# ------------------------------
+# OUTBOX TRANSACIONAL E ENTREGADORES DE NOTIFICAÇÕES
+# ------------------------------
+# As rotas de escrita de doacao.py (e a importação em lote) chamam registrar_mensagem() ANTES do
+# commit: a linha da outbox entra na mesma transação da doação, então não existe doação sem aviso
+# nem aviso de doação que sofreu rollback. Depois do commit a rota só acorda os entregadores
+# (acordar_entregadores) e responde; nenhuma entrega acontece na thread da requisição.
+#
+# Um pool de threads por processo drena a outbox em lotes. Cada entregador reserva um lote com
+# UPDATE ... WHERE (compare-and-set em dono/reservada_ate), então vários workers e processos
+# dividem a fila sem pegar a mesma mensagem; reservas vencidas (entregador que morreu) voltam
+# para a fila. Uma mudança de doação (id_ong nulo) é expandida numa entrega por ONG aprovada com
+# solicitação aberta do mesmo tipo de alimento; cada entrega é tentada no destino configurado e,
+# se falhar, volta com espera exponencial (com jitter) até NOTIFICACAO_MAX_TENTATIVAS, quando
+# fica 'morta' para inspeção. A entrega é "pelo menos uma vez": um processo que morre entre a
+# entrega e o commit dela faz a mensagem ser entregue de novo quando a reserva vencer.
+#
+# NOTIFICACAO_DESTINO          "" (desligado, padrão), "memoria", "webhook" ou "email"
+# NOTIFICACAO_WORKERS          threads entregadoras por processo (padrão 2; 0 = só via CLI)
+# NOTIFICACAO_LOTE             mensagens reservadas por vez (padrão 100)
+# NOTIFICACAO_INTERVALO        segundos entre verificações com a fila vazia (padrão 5)
+# NOTIFICACAO_MAX_TENTATIVAS   tentativas antes de desistir (padrão 8)
+# NOTIFICACAO_BACKOFF_S        espera da 1ª repetição; dobra a cada falha (padrão 2)
+# NOTIFICACAO_BACKOFF_MAX_S    teto da espera (padrão 600)
+# NOTIFICACAO_WEBHOOK_URL      destino "webhook": recebe um POST JSON por entrega
+# NOTIFICACAO_WEBHOOK_SEGREDO  opcional: assina o corpo (HMAC-SHA256 em X-FoodBack-Assinatura)
+# NOTIFICACAO_TIMEOUT          segundos por tentativa de entrega (padrão 10)
+# SMTP_HOST, SMTP_PORTA, SMTP_USUARIO, SMTP_SENHA, SMTP_REMETENTE   destino "email"
+
+CAMPOS_MENSAGEM = ("id_doacao", "titulo", "tipo_alimento", "quantidade", "data_validade",
+                   "data_disponibilidade", "id_empresa", "id_ong_recebedora")
+RESERVA_SEGUNDOS = 60  # uma mensagem reservada e não concluída volta para a fila depois disso
+
+logger = logging.getLogger(__name__)
+
+
+def _campo(doacao, nome):
+    return doacao.get(nome) if isinstance(doacao, dict) else getattr(doacao, nome, None)
+
+
+def _json(dados):
+    return json.dumps(dados, default=str, ensure_ascii=False)
+
+
+# ------------------------------
+# ESCRITA (na transação da rota)
+# ------------------------------
+def outbox_habilitada():
+    return "outbox" in current_app.extensions
+
+
+def registrar_mensagem(evento, doacao):
+    """Acrescenta à sessão a mensagem de uma mudança de doação, sem commit.
+
+    `doacao` é um objeto Doacao (ou linha/dict com os campos de CAMPOS_MENSAGEM).
+    """
+    if not outbox_habilitada():
+        return
+    if _campo(doacao, "id_doacao") is None and not isinstance(doacao, dict):
+        db.session.flush()  # Doação nova: precisa do ID no payload
+    dados = {campo: _campo(doacao, campo) for campo in CAMPOS_MENSAGEM}
+    db.session.add(MensagemOutbox(evento=evento, payload=_json(dados)))
+
+
+def registrar_lote_importado(doacoes, id_empresa):
+    """Uma mensagem por tipo de alimento de um bloco importado (as linhas ainda não têm ID)."""
+    if not outbox_habilitada():
+        return
+    por_tipo = {}
+    for doacao in doacoes:
+        por_tipo[doacao["tipo_alimento"]] = por_tipo.get(doacao["tipo_alimento"], 0) + 1
+    for tipo, total in por_tipo.items():
+        dados = {"id_empresa": id_empresa, "tipo_alimento": tipo, "total": total}
+        db.session.add(MensagemOutbox(evento="lote_importado", payload=_json(dados)))
+
+
+def acordar_entregadores():
+    """Chamar após o commit: o pool pega a mensagem nova sem esperar o próximo ciclo."""
+    entregadores = current_app.extensions.get("outbox")
+    if entregadores:
+        entregadores.acordar()
+
+
+# ------------------------------
+# DESTINOS (onde cada entrega é feita)
+# ------------------------------
+class DestinoMemoria:
+    """Guarda as entregas numa lista (testes e desenvolvimento). falhar(n) simula n falhas."""
+
+    def __init__(self, config=None):
+        self.entregues = []
+        self._falhas = 0
+        self._lock = threading.Lock()
+
+    def falhar(self, vezes):
+        with self._lock:
+            self._falhas = vezes
+
+    def entregar(self, id_ong, evento, dados):
+        with self._lock:
+            if self._falhas:
+                self._falhas -= 1
+                raise RuntimeError("falha simulada")
+            self.entregues.append({"id_ong": id_ong, "evento": evento, "doacao": dados})
+
+
+class DestinoWebhook:
+    """POST JSON {id_ong, evento, doacao} na URL configurada; qualquer resposta fora de 2xx é falha."""
+
+    def __init__(self, config):
+        self.url = config["NOTIFICACAO_WEBHOOK_URL"]
+        self.segredo = config.get("NOTIFICACAO_WEBHOOK_SEGREDO")
+        self.timeout = config.get("NOTIFICACAO_TIMEOUT", 10)
+
+    def entregar(self, id_ong, evento, dados):
+        corpo = _json({"id_ong": id_ong, "evento": evento, "doacao": dados}).encode('utf-8')
+        cabecalhos = {"Content-Type": "application/json"}
+        if self.segredo:
+            assinatura = hmac.new(self.segredo.encode('utf-8'), corpo, hashlib.sha256).hexdigest()
+            cabecalhos["X-FoodBack-Assinatura"] = f"sha256={assinatura}"
+        requisicao = urllib.request.Request(self.url, data=corpo, headers=cabecalhos, method='POST')
+        with urllib.request.urlopen(requisicao, timeout=self.timeout):
+            pass  # urlopen lança HTTPError para status >= 400
+
+
+class DestinoEmail:
+    """Um e-mail por entrega para o endereço cadastrado da ONG."""
+
+    ASSUNTOS = {
+        "criada": "Nova doação de {tipo_alimento}",
+        "atualizada": "Doação de {tipo_alimento} atualizada",
+        "reservada": "Doação de {tipo_alimento} não está mais disponível",
+        "removida": "Doação de {tipo_alimento} retirada",
+        "lote_importado": "{total} novas doações de {tipo_alimento}",
+    }
+
+    def __init__(self, config):
+        self.host = config.get("SMTP_HOST", "localhost")
+        self.porta = int(config.get("SMTP_PORTA", 25))
+        self.usuario = config.get("SMTP_USUARIO")
+        self.senha = config.get("SMTP_SENHA")
+        self.remetente = config.get("SMTP_REMETENTE", "nao-responda@foodback.local")
+        self.timeout = config.get("NOTIFICACAO_TIMEOUT", 10)
+
+    def entregar(self, id_ong, evento, dados):
+        email = db.session.query(ONG.email).filter(ONG.id_ong == id_ong).scalar()
+        if not email:
+            return  # ONG removida: nada a entregar
+        mensagem = EmailMessage()
+        mensagem["From"] = self.remetente
+        mensagem["To"] = email
+        mensagem["Subject"] = self.ASSUNTOS.get(evento, "Atualização de doação").format_map(
+            {"tipo_alimento": dados.get("tipo_alimento"), "total": dados.get("total")})
+        mensagem.set_content("\n".join(f"{campo}: {valor}" for campo, valor in dados.items() if valor is not None))
+        with smtplib.SMTP(self.host, self.porta, timeout=self.timeout) as smtp:
+            if self.usuario:
+                smtp.starttls()
+                smtp.login(self.usuario, self.senha)
+            smtp.send_message(mensagem)
+
+
+DESTINOS = {
+    "memoria": DestinoMemoria,
+    "webhook": DestinoWebhook,
+    "email": DestinoEmail,
+}
+
+
+# ------------------------------
+# DRENAGEM
+# ------------------------------
+def ongs_interessadas(tipo_alimento, hoje=None):
+    """ONGs aprovadas com solicitação aberta (e ainda no prazo) do tipo de alimento.
+
+    A comparação fica no SQL, sobre o índice (status, item_necessario): no MySQL a collation
+    utf8mb4_unicode_ci já ignora acentos e maiúsculas, então 'Pão' encontra 'pao' (ver busca.py).
+    """
+    hoje = hoje or date.today()
+    consulta = (
+        db.session.query(Solicitacao.id_ong)
+        .join(ONG, ONG.id_ong == Solicitacao.id_ong)
+        .filter(
+            Solicitacao.status == 'aberta',
+            Solicitacao.item_necessario == tipo_alimento,
+            db.or_(Solicitacao.data_limite.is_(None), Solicitacao.data_limite >= hoje),
+            ONG.is_approved == True,
+        )
+        .distinct()
+    )
+    return sorted(id_ong for (id_ong,) in consulta)
+
+
+class Entregadores:
+    """Pool de threads que drena a outbox. Um por app, em app.extensions["outbox"]."""
+
+    def __init__(self, app, destino):
+        self.app = app
+        self.destino = destino
+        config = app.config
+        self.workers = config.get("NOTIFICACAO_WORKERS", 2)
+        self.tamanho_lote = config.get("NOTIFICACAO_LOTE", 100)
+        self.intervalo = config.get("NOTIFICACAO_INTERVALO", 5)
+        self.max_tentativas = config.get("NOTIFICACAO_MAX_TENTATIVAS", 8)
+        self.backoff = config.get("NOTIFICACAO_BACKOFF_S", 2)
+        self.backoff_max = config.get("NOTIFICACAO_BACKOFF_MAX_S", 600)
+        self.contadores = {"expandidas": 0, "entregues": 0, "falhas": 0, "mortas": 0, "lotes": 0}
+        self.segundos_entrega = 0.0
+        self._lock = threading.Lock()
+        self._criar_threads()
+
+    def _criar_threads(self):
+        self._acordar = threading.Event()
+        self._parar = threading.Event()
+        self._iniciado = False
+        self._threads = [
+            threading.Thread(target=self._executar, name=f"entregador-outbox-{i}", daemon=True)
+            for i in range(self.workers)
+        ]
+
+    def iniciar(self):
+        """Inicia as threads na primeira requisição do processo (não no mestre pré-carregado nem na CLI)."""
+        if self._iniciado:
+            return
+        with self._lock:
+            if self._iniciado:
+                return
+            self._iniciado = True
+            for thread in self._threads:
+                thread.start()
+
+    def reiniciar_apos_fork(self):
+        """No processo filho as threads do pai não existem mais: prepara outras (iniciadas sob demanda)."""
+        self._lock = threading.Lock()
+        self._criar_threads()
+
+    def parar(self):
+        self._parar.set()
+        self._acordar.set()
+
+    def acordar(self):
+        self.iniciar()
+        self._acordar.set()
+
+    def _contar(self, nome, quantidade=1):
+        with self._lock:
+            self.contadores[nome] += quantidade
+
+    def estatisticas(self):
+        with self._lock:
+            return dict(self.contadores, segundos_entrega=round(self.segundos_entrega, 6))
+
+    def _executar(self):
+        while not self._parar.is_set():
+            try:
+                with self.app.app_context():
+                    processadas = self.drenar_lote()
+            except Exception:
+                logger.exception("Falha drenando a outbox")
+                processadas = 0
+            if not processadas:
+                # Fila vazia (ou só mensagens esperando o backoff): dorme até o próximo ciclo ou um aviso
+                self._acordar.wait(self.intervalo)
+                self._acordar.clear()
+
+    def _reservar(self, agora):
+        """Reserva até tamanho_lote mensagens prontas para este entregador e as retorna."""
+        dono = uuid.uuid4().hex
+        ids = [i for (i,) in db.session.query(MensagemOutbox.id_mensagem)
+               .filter(MensagemOutbox.status == 'pendente', MensagemOutbox.proxima_tentativa <= agora,
+                       db.or_(MensagemOutbox.reservada_ate.is_(None), MensagemOutbox.reservada_ate < agora))
+               .order_by(MensagemOutbox.proxima_tentativa, MensagemOutbox.id_mensagem)
+               .limit(self.tamanho_lote)]
+        if not ids:
+            db.session.rollback()
+            return []
+        # Repete a condição: se outro entregador reservou uma delas no meio tempo, ela não muda de dono
+        db.session.execute(
+            db.update(MensagemOutbox)
+            .where(MensagemOutbox.id_mensagem.in_(ids), MensagemOutbox.status == 'pendente',
+                   db.or_(MensagemOutbox.reservada_ate.is_(None), MensagemOutbox.reservada_ate < agora))
+            .values(dono=dono, reservada_ate=agora + timedelta(seconds=RESERVA_SEGUNDOS))
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        return (MensagemOutbox.query.filter(MensagemOutbox.dono == dono)
+                .order_by(MensagemOutbox.id_mensagem).all())
+
+    def _espera(self, tentativas):
+        base = min(self.backoff * (2 ** (tentativas - 1)), self.backoff_max)
+        return base * random.uniform(0.5, 1.0)  # jitter: falhas simultâneas não voltam juntas
+
+    def drenar_lote(self, agora=None):
+        """Processa um lote reservado. Retorna quantas mensagens tratou. Precisa de app context."""
+        agora = agora or datetime.utcnow()
+        mensagens = self._reservar(agora)
+        if not mensagens:
+            return 0
+        self._contar("lotes")
+        # Passada a reserva, outro entregador pode pegar o resto do lote: para antes disso
+        prazo = time.monotonic() + RESERVA_SEGUNDOS * 0.8
+
+        tratadas = 0
+        for mensagem in mensagens:
+            if time.monotonic() > prazo:
+                break
+            self._tratar(mensagem, agora)
+            db.session.commit()  # Uma mensagem por commit: uma falha adiante não reentrega esta
+            tratadas += 1
+        return tratadas
+
+    def _tratar(self, mensagem, agora):
+        dados = json.loads(mensagem.payload)
+        if mensagem.id_ong is None:
+            # Mudança de doação: vira uma entrega por ONG interessada, na mesma transação
+            for id_ong in ongs_interessadas(dados.get("tipo_alimento")):
+                db.session.add(MensagemOutbox(evento=mensagem.evento, id_ong=id_ong, payload=mensagem.payload))
+                self._contar("expandidas")
+            db.session.delete(mensagem)
+            return
+
+        inicio = time.perf_counter()
+        try:
+            self.destino.entregar(mensagem.id_ong, mensagem.evento, dados)
+        except Exception as e:
+            mensagem.tentativas += 1
+            mensagem.ultimo_erro = f"{type(e).__name__}: {e}"[:500]
+            mensagem.dono = mensagem.reservada_ate = None
+            self._contar("falhas")
+            if mensagem.tentativas >= self.max_tentativas:
+                mensagem.status = 'morta'
+                self._contar("mortas")
+                logger.warning("Desistindo da mensagem %s da outbox: %s", mensagem.id_mensagem, e)
+            else:
+                mensagem.proxima_tentativa = agora + timedelta(seconds=self._espera(mensagem.tentativas))
+            return
+        with self._lock:
+            self.segundos_entrega += time.perf_counter() - inicio
+        self._contar("entregues")
+        db.session.delete(mensagem)
+
+    def drenar(self, max_lotes=None):
+        """Drena até a fila ficar sem mensagens prontas (uso pela CLI). Retorna quantas tratou."""
+        total = 0
+        lotes = 0
+        while max_lotes is None or lotes < max_lotes:
+            processadas = self.drenar_lote()
+            if not processadas:
+                break
+            total += processadas
+            lotes += 1
+        return total
+
+
+def criar_destino(config):
+    nome = config.get("NOTIFICACAO_DESTINO")
+    if nome not in DESTINOS:
+        raise ValueError(f"NOTIFICACAO_DESTINO inválido: {nome!r}")
+    return DESTINOS[nome](config)
+
+
+def iniciar_outbox(app):
+    """Liga a outbox se NOTIFICACAO_DESTINO estiver configurado; o pool sobe na primeira requisição."""
+    if not app.config.get("NOTIFICACAO_DESTINO"):
+        return None
+    entregadores = Entregadores(app, criar_destino(app.config))
+    app.extensions["outbox"] = entregadores
+    app.before_request(entregadores.iniciar)
+    return entregadores
+
+
+def estatisticas_outbox(app):
+    """Contadores do pool e mensagens na fila (pendentes e mortas). Precisa de app context."""
+    entregadores = app.extensions.get("outbox")
+    if entregadores is None:
+        return None
+    estatisticas = entregadores.estatisticas()
+    por_status = dict(db.session.query(MensagemOutbox.status, db.func.count())
+                      .group_by(MensagemOutbox.status).all())
+    estatisticas["pendentes"] = por_status.get("pendente", 0)
+    estatisticas["mortas_na_fila"] = por_status.get("morta", 0)
+    return estatisticas
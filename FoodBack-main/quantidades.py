@@ -0,0 +1,62 @@
+import re
+from decimal import Decimal, InvalidOperation
+from texto import normalizar
+
+# ------------------------------
+# INTERPRETAÇÃO DE QUANTIDADES ("2,5 kg", "500g", "3 litros", "12 unidades")
+# ------------------------------
+# Quantidade e unidade continuam guardadas como texto livre, mas cada escrita também grava
+# o valor numérico numa unidade normalizada (kg, l, un, ...), o que permite somar no banco.
+
+# unidade escrita -> (unidade normalizada, fator de conversão)
+UNIDADES = {
+    "kg": ("kg", 1), "kgs": ("kg", 1), "quilo": ("kg", 1), "quilos": ("kg", 1),
+    "kilo": ("kg", 1), "kilos": ("kg", 1), "quilograma": ("kg", 1), "quilogramas": ("kg", 1),
+    "g": ("kg", Decimal("0.001")), "gr": ("kg", Decimal("0.001")), "grama": ("kg", Decimal("0.001")),
+    "gramas": ("kg", Decimal("0.001")),
+    "t": ("kg", 1000), "ton": ("kg", 1000), "tonelada": ("kg", 1000), "toneladas": ("kg", 1000),
+    "l": ("l", 1), "lt": ("l", 1), "lts": ("l", 1), "litro": ("l", 1), "litros": ("l", 1),
+    "ml": ("l", Decimal("0.001")), "mililitro": ("l", Decimal("0.001")), "mililitros": ("l", Decimal("0.001")),
+    "un": ("un", 1), "und": ("un", 1), "unid": ("un", 1), "unidade": ("un", 1), "unidades": ("un", 1),
+    "duzia": ("un", 12), "duzias": ("un", 12),
+    "cx": ("cx", 1), "caixa": ("cx", 1), "caixas": ("cx", 1),
+    "pct": ("pct", 1), "pacote": ("pct", 1), "pacotes": ("pct", 1),
+    "cesta": ("cesta", 1), "cestas": ("cesta", 1),
+}
+
+UNIDADE_SEM_NOME = "un"  # "10" sem unidade conta como 10 unidades
+
+# Número em pt-BR: "1.500,5" (ponto de milhar e vírgula decimal) ou "2,5" / "2.5" sem milhar.
+# Depois do número só pode vir a unidade; "10x5" ou "1,5,3" não são quantidades.
+_QUANTIDADE = re.compile(
+    r"^\s*(?:(?P<milhar>\d{1,3}(?:\.\d{3})+(?:,\d+)?)|(?P<simples>\d+(?:[.,]\d+)?))"
+    r"\s*(?P<unidade>[a-z]*)(?=\s|$)"
+)
+
+
+def interpretar_quantidade(texto):
+    """Retorna (valor Decimal, unidade normalizada) ou (None, None) se não houver número
+    ou se o número vier seguido de algo que não é unidade.
+
+    Unidades desconhecidas são mantidas como escritas (normalizadas), sem conversão.
+    """
+    if texto is None:
+        return None, None
+    encontrado = _QUANTIDADE.match(normalizar(str(texto)))
+    if not encontrado:
+        return None, None
+
+    if encontrado.group("milhar"):
+        numero = encontrado.group("milhar").replace('.', '').replace(',', '.')
+    else:
+        numero = encontrado.group("simples").replace(',', '.')
+    unidade = encontrado.group("unidade")
+    try:
+        valor = Decimal(numero)
+    except InvalidOperation:
+        return None, None
+
+    if not unidade:
+        return valor, UNIDADE_SEM_NOME
+    normalizada, fator = UNIDADES.get(unidade, (unidade[:20], 1))
+    return valor * fator, normalizada
@@ -7,24 +7,60 @@ from getpass import getpass
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 try:
-    # Importa as instâncias necessárias do app.py e os modelos
-    from app import app, db, bcrypt
-    from models import Admin
+    # Só a fábrica: os modelos e extensões são importados dentro das funções, já com o app criado
+    from app import create_app
 except ImportError as e:
     print(f"Erro ao importar módulos: {e}")
     print("Verifique se as dependências (flask, flask_sqlalchemy, etc.) estão instaladas e se app.py/models.py estão no diretório correto.")
     sys.exit(1)
 
 
+def existe_admin():
+    """True se já há algum administrador no banco. Precisa de app context."""
+    from models import Admin
+    return Admin.query.first() is not None
+
+
+def criar_admin(nome, email, senha):
+    """Cria o administrador e sua credencial. Retorna (sucesso, mensagem). Precisa de app context."""
+    from extensions import db
+    from models import Admin
+    from credenciais import gerar_hash, buscar_credencial, registrar_credencial
+
+    if buscar_credencial(email):
+        return False, "Este email já está cadastrado para outro usuário."
+
+    # Hash da senha
+    hashed_password = gerar_hash(senha)
+
+    # Cria e salva o objeto Admin
+    try:
+        admin_user = Admin(
+            nome=nome,
+            email=email,
+            senha=hashed_password
+        )
+        db.session.add(admin_user)
+        db.session.flush()  # Obtém o ID do admin para o índice de credenciais
+        registrar_credencial(email, "admin", admin_user.get_id(), hashed_password, is_approved=True)
+        db.session.commit()
+        return True, f"Usuário Administrador criado e salvo no banco de dados. Nome: {nome}, Email: {email}"
+
+    except Exception as e:
+        db.session.rollback()
+        return False, f"Erro ao criar o usuário administrador: {e}"
+
+
 def seed_admin():
     """Cria um usuário Administrador inicial no banco de dados."""
-    
+    app = create_app(com_rotas=False)
+
     # Executa a operação dentro do contexto da aplicação Flask
     with app.app_context():
         print("--- Criador de Administrador Inicial ---")
-        
+
         # 1. Verifica se já existe algum administrador
-        if Admin.query.first():
+        if existe_admin():
             print("Um administrador já existe no banco de dados. Operação cancelada.")
             return
 
@@ -34,7 +70,7 @@ def seed_admin():
         # NOTA: O 'getpass' oculta a senha digitada no terminal
         nome = input("Nome do Administrador: ")
         email = input("Email (será usado para login): ")
-        
+
         # Loop para garantir que as senhas coincidam
         while True:
             senha1 = getpass("Senha: ")
@@ -42,27 +78,11 @@ def seed_admin():
             if senha1 == senha2:
                 break
             print("As senhas não coincidem. Tente novamente.")
-            
-        # 3. Hash da senha
-        hashed_password = bcrypt.generate_password_hash(senha1).decode('utf-8')
-
-        # 4. Cria e salva o objeto Admin
-        try:
-            admin_user = Admin(
-                nome=nome,
-                email=email,
-                senha=hashed_password
-            )
-            
-            db.session.add(admin_user)
-            db.session.commit()
-            print("\n✅ Sucesso! Usuário Administrador criado e salvo no banco de dados.")
-            print(f"Nome: {nome}, Email: {email}")
-            
-        except Exception as e:
-            db.session.rollback()
-            print(f"\n❌ Erro ao criar o usuário administrador: {e}")
+
+        # 3. Cria o admin (hash + Admin + credencial)
+        sucesso, mensagem = criar_admin(nome, email, senha1)
+        print(f"\n✅ Sucesso! {mensagem}" if sucesso else f"\n❌ {mensagem}")
 
 
 if __name__ == '__main__':
-    seed_admin()
\ No newline at end of file
+    seed_admin()
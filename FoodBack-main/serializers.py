@@ -0,0 +1,228 @@
+import csv
+import io
+from extensions import db
+from models import Doacao, Empresa, ONG, Solicitacao, SolicitacaoArquivada
+from json_rapido import json_bytes
+
+# ------------------------------
+# SERIALIZAÇÃO EM LOTE DE DOAÇÕES E SOLICITAÇÕES
+# ------------------------------
+# Em vez de carregar objetos Doacao e buscar Empresa/ONG/Solicitacao linha a linha (N+1),
+# uma única consulta traz só as colunas da resposta, com os nomes relacionados via OUTER JOIN.
+# Cada modelo tem um serializador gerado uma vez na importação a partir da lista de campos:
+# ele lê a tupla da linha por posição e monta o dict num único literal, sem getattr por campo.
+
+
+def _iso(valor):
+    return valor.isoformat() if valor else None
+
+
+def _numero(valor):
+    return float(valor) if valor is not None else None
+
+
+def compilar_serializador(campos):
+    """Gera `serializar(linha) -> dict` para linhas com as colunas de `campos`, na mesma ordem.
+
+    `campos` é uma sequência de (chave JSON, coluna, conversor ou None).
+    """
+    escopo = {}
+    itens = []
+    for posicao, (chave, _coluna, conversor) in enumerate(campos):
+        if conversor is None:
+            itens.append(f"{chave!r}: linha[{posicao}]")
+        else:
+            escopo[f"_conv{posicao}"] = conversor
+            itens.append(f"{chave!r}: _conv{posicao}(linha[{posicao}])")
+    codigo = "def serializar(linha):\n    return {" + ", ".join(itens) + "}\n"
+    exec(compile(codigo, "<serializador>", "exec"), escopo)
+    return escopo["serializar"]
+
+
+# ------------------------------
+# DOAÇÕES
+# ------------------------------
+CAMPOS_DOACAO = (
+    ("id_doacao", Doacao.id_doacao, None),
+    ("titulo", Doacao.titulo, None),
+    ("descricao", Doacao.descricao, None),
+    ("tipo_alimento", Doacao.tipo_alimento, None),
+    ("quantidade", Doacao.quantidade, None),
+    ("quantidade_valor", Doacao.quantidade_valor, _numero),
+    ("quantidade_unidade", Doacao.quantidade_unidade, None),
+    ("data_disponibilidade", Doacao.data_disponibilidade, _iso),
+    ("data_validade", Doacao.data_validade, _iso),
+    ("status", Doacao.status, None),
+    ("data_criacao", Doacao.data_criacao, _iso),
+    ("id_empresa", Doacao.id_empresa, None),
+    ("empresa", Empresa.nome_empresa.label('empresa'), None),
+    ("id_solicitacao_vinculada", Doacao.id_solicitacao, None),
+    ("solicitacao_atendida", Solicitacao.titulo.label('solicitacao_atendida'), None),
+    ("id_ong_recebedora", Doacao.id_ong_recebedora, None),
+    ("ong_recebedora", ONG.nome_ong.label('ong_recebedora'), None),
+)
+
+COLUNAS_DOACAO = tuple(coluna for _chave, coluna, _conversor in CAMPOS_DOACAO)
+
+# Converte uma linha de consulta_doacoes() no dicionário JSON da API
+linha_doacao_to_dict = compilar_serializador(CAMPOS_DOACAO)
+
+
+def _colunas_da_origem(colunas, modelo, origem):
+    """Troca as colunas de `modelo` pelas de mesmo nome em `origem` (a tabela de arquivo)."""
+    if origem is modelo:
+        return colunas
+    return tuple(getattr(origem, coluna.key) if getattr(coluna, "class_", None) is modelo else coluna
+                 for coluna in colunas)
+
+
+def consulta_doacoes(origem=Doacao):
+    """Retorna a consulta base (só colunas) usada por todas as listagens de doações.
+
+    Filtros e ordenação podem ser encadeados normalmente sobre as colunas de `origem`:
+    Doacao ou DoacaoArquivada (mesmas colunas e mesma ordem, então o mesmo serializador).
+    """
+    if origem is Doacao:
+        return (
+            db.session.query(*COLUNAS_DOACAO)
+            .select_from(Doacao)
+            .outerjoin(Empresa, Empresa.id_empresa == Doacao.id_empresa)
+            .outerjoin(ONG, ONG.id_ong == Doacao.id_ong_recebedora)
+            .outerjoin(Solicitacao, Solicitacao.id_solicitacao == Doacao.id_solicitacao)
+        )
+    # A solicitação atendida por uma doação arquivada pode estar viva ou já arquivada também
+    colunas = tuple(
+        db.func.coalesce(Solicitacao.titulo, SolicitacaoArquivada.titulo).label('solicitacao_atendida')
+        if chave == "solicitacao_atendida" else coluna
+        for (chave, _c, _conv), coluna in zip(CAMPOS_DOACAO, _colunas_da_origem(COLUNAS_DOACAO, Doacao, origem))
+    )
+    return (
+        db.session.query(*colunas)
+        .select_from(origem)
+        .outerjoin(Empresa, Empresa.id_empresa == origem.id_empresa)
+        .outerjoin(ONG, ONG.id_ong == origem.id_ong_recebedora)
+        .outerjoin(Solicitacao, Solicitacao.id_solicitacao == origem.id_solicitacao)
+        .outerjoin(SolicitacaoArquivada, SolicitacaoArquivada.id_solicitacao == origem.id_solicitacao)
+    )
+
+
+def serializar_doacoes(linhas):
+    """Serializa um conjunto de linhas já buscadas (ou uma consulta) de consulta_doacoes()."""
+    return list(map(linha_doacao_to_dict, linhas))
+
+
+def serializar_doacao(id_doacao):
+    """Serializa uma única doação pelo ID (uma consulta). Retorna None se não existir."""
+    linha = consulta_doacoes().filter(Doacao.id_doacao == id_doacao).first()
+    return linha_doacao_to_dict(linha) if linha else None
+
+
+# ------------------------------
+# SOLICITAÇÕES
+# ------------------------------
+CAMPOS_SOLICITACAO = (
+    ("id_solicitacao", Solicitacao.id_solicitacao, None),
+    ("titulo", Solicitacao.titulo, None),
+    ("descricao", Solicitacao.descricao, None),
+    ("item_necessario", Solicitacao.item_necessario, None),
+    ("quantidade_necessaria", Solicitacao.quantidade_necessaria, None),
+    ("data_limite", Solicitacao.data_limite, _iso),
+    ("status", Solicitacao.status, None),
+    ("id_ong", Solicitacao.id_ong, None),
+    ("data_criacao", Solicitacao.data_criacao, _iso),
+)
+
+COLUNAS_SOLICITACAO = tuple(coluna for _chave, coluna, _conversor in CAMPOS_SOLICITACAO)
+
+# Mesmo formato de Solicitacao.to_dict, a partir de uma linha de consulta_solicitacoes()
+linha_solicitacao_to_dict = compilar_serializador(CAMPOS_SOLICITACAO)
+
+
+def consulta_solicitacoes(origem=Solicitacao):
+    """Consulta base (só colunas) das listagens de solicitações, em Solicitacao ou SolicitacaoArquivada."""
+    return db.session.query(*_colunas_da_origem(COLUNAS_SOLICITACAO, Solicitacao, origem)).select_from(origem)
+
+
+def serializar_solicitacoes(linhas):
+    return list(map(linha_solicitacao_to_dict, linhas))
+
+
+# ------------------------------
+# STREAM DE LISTAGENS GRANDES
+# ------------------------------
+STREAM_LOTE_PADRAO = 1000
+
+
+def stream_json_array(consulta, serializar, tamanho_lote=STREAM_LOTE_PADRAO):
+    """Gera o array JSON da consulta em pedaços, lendo o banco por cursor do lado do servidor.
+
+    Só um lote de linhas fica em memória por vez. Deve rodar dentro de stream_with_context.
+    """
+    yield b"["
+    primeiro = True
+    lote = []
+    for linha in consulta.yield_per(tamanho_lote):
+        lote.append(serializar(linha))
+        if len(lote) >= tamanho_lote:
+            pedaco = json_bytes(lote)[1:-1]
+            yield pedaco if primeiro else b"," + pedaco
+            primeiro = False
+            lote = []
+    if lote:
+        pedaco = json_bytes(lote)[1:-1]
+        yield pedaco if primeiro else b"," + pedaco
+    yield b"]"
+
+
+def stream_ndjson(consulta, serializar, tamanho_lote=STREAM_LOTE_PADRAO):
+    """Gera um objeto JSON por linha (NDJSON), lendo o banco por cursor do lado do servidor.
+
+    A primeira linha sai sozinha (o cliente recebe dados assim que a consulta responde); depois,
+    um pedaço por lote. Deve rodar dentro de stream_with_context.
+    """
+    lote = []
+    enviadas = 0
+    for linha in consulta.yield_per(tamanho_lote):
+        lote.append(json_bytes(serializar(linha)))
+        if len(lote) >= tamanho_lote or not enviadas:
+            enviadas += len(lote)
+            yield b"\n".join(lote) + b"\n"
+            lote = []
+    if lote:
+        yield b"\n".join(lote) + b"\n"
+
+
+def _celula_csv(valor):
+    # Texto começando com = + - @ vira fórmula ao abrir a planilha: prefixa com apóstrofo
+    if isinstance(valor, str) and valor[:1] in ("=", "+", "-", "@"):
+        return "'" + valor
+    return valor
+
+
+def stream_csv(consulta, campos, serializar, tamanho_lote=STREAM_LOTE_PADRAO):
+    """Gera o CSV (cabeçalho = chaves de `campos`) da consulta, um pedaço por lote de linhas.
+
+    O cabeçalho sai antes de a consulta rodar. Deve rodar dentro de stream_with_context.
+    """
+    chaves = [chave for chave, _coluna, _conversor in campos]
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+
+    def esvaziar():
+        pedaco = buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+        return pedaco
+
+    escritor.writerow(chaves)
+    yield esvaziar()
+    pendentes = 0
+    for linha in consulta.yield_per(tamanho_lote):
+        dados = serializar(linha)
+        escritor.writerow([_celula_csv(dados[chave]) for chave in chaves])
+        pendentes += 1
+        if pendentes >= tamanho_lote:
+            yield esvaziar()
+            pendentes = 0
+    if pendentes:
+        yield esvaziar()
@@ -0,0 +1,64 @@
+import os
+import sys
+
+import pytest
+
+# Os módulos do projeto são importados pelo nome (from models import ...), como em app.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _limpar_estado_do_processo():
+    """Caches e índices são por processo (globais dos módulos): cada teste começa do zero."""
+    import contas
+    from busca import indice_busca
+    from cache import invalidar_catalogo
+    from geo import indice_geo
+    from matching import indice
+
+    if contas._cache is not None:
+        contas._cache.limpar()
+    invalidar_catalogo()
+    for indice_em_memoria in (indice, indice_busca, indice_geo):
+        indice_em_memoria.invalidar()
+
+
+@pytest.fixture
+def criar_app(tmp_path):
+    """Fábrica de apps num SQLite temporário, com as tabelas criadas. `config` sobrepõe o padrão."""
+    from app import create_app
+    from extensions import db
+
+    criados = []
+
+    def criar(**config):
+        app = create_app({
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / f'teste_{len(criados)}.db'}",
+            "SQLALCHEMY_ENGINE_OPTIONS": {},
+            "SQLALCHEMY_BINDS": {},
+            "JWT_SECRET_KEY": "x" * 40,
+            "BCRYPT_LOG_ROUNDS": 4,
+            "LIMITE_HABILITADO": False,
+            "NOTIFICACAO_DESTINO": "",
+            **config,
+        })
+        with app.app_context():
+            db.create_all()
+        criados.append(app)
+        return app
+
+    _limpar_estado_do_processo()
+    yield criar
+    for app in criados:
+        entregadores = app.extensions.get("outbox")
+        if entregadores is not None:
+            entregadores.parar()
+    _limpar_estado_do_processo()
+
+
+def cabecalho(app, id_usuario, tipo, **claims):
+    """Authorization com um token emitido direto (sem passar pelo login)."""
+    from flask_jwt_extended import create_access_token
+
+    with app.app_context():
+        token = create_access_token(identity={"id": id_usuario, "tipo": tipo}, additional_claims=claims)
+    return {"Authorization": f"Bearer {token}"}
@@ -0,0 +1,56 @@
+import pytest
+
+from conftest import cabecalho
+from extensions import db
+from models import Credencial, Empresa
+
+# ------------------------------
+# APROVAÇÃO DE CONTAS E VERSÃO DOS TOKENS (credenciais.definir_aprovacao, admin.aplicar_aprovacao)
+# ------------------------------
+# A versão da credencial só muda quando a aprovação muda: reaprovar não revoga os tokens da conta.
+
+
+@pytest.fixture
+def app(criar_app):
+    app = criar_app()
+    with app.app_context():
+        db.session.add(Empresa(id_empresa=1, nome_empresa="Empresa", email="e@teste", senha="x"))
+        db.session.add(Credencial(email="e@teste", tipo="empresa", id_usuario=1, senha="x", versao=1))
+        db.session.commit()
+    return app
+
+
+def _versao(app):
+    with app.app_context():
+        return db.session.get(Credencial, "e@teste").versao
+
+
+def _aprovar(app, rota):
+    admin = cabecalho(app, 1, "admin")
+    if rota == "individual":
+        resposta = app.test_client().post("/api/admin/approve", headers=admin,
+                                          json={"user_id": 1, "user_type": "empresa"})
+    else:
+        resposta = app.test_client().post("/api/admin/approve/lote", headers=admin,
+                                          json={"acao": "aprovar", "empresas": [1]})
+    assert resposta.status_code == 200
+
+
+@pytest.mark.parametrize("rota", ["individual", "lote"])
+def test_reaprovar_nao_revoga_os_tokens(app, rota):
+    _aprovar(app, rota)
+    versao = _versao(app)
+    assert versao == 2
+
+    _aprovar(app, rota)
+    assert _versao(app) == versao
+
+
+def test_rejeitar_conta_aprovada_revoga_os_tokens(app):
+    _aprovar(app, "lote")
+    admin = cabecalho(app, 1, "admin")
+    cliente = app.test_client()
+    for _ in range(2):
+        resposta = cliente.post("/api/admin/approve/lote", headers=admin, json={"acao": "rejeitar", "empresas": [1]})
+        assert resposta.status_code == 200
+    assert _versao(app) == 3
@@ -0,0 +1,96 @@
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from arquivamento import arquivar
+from conftest import cabecalho
+from extensions import db
+from models import Doacao, DoacaoArquivada, Empresa, ONG, Solicitacao, SolicitacaoArquivada
+
+# ------------------------------
+# ARQUIVAMENTO E LEITURA COM HISTÓRICO (arquivamento.py)
+# ------------------------------
+
+AGORA = datetime(2026, 7, 1, 12, 0, 0)
+ANTIGA = AGORA - timedelta(days=200)
+RECENTE = AGORA - timedelta(days=1)
+
+
+@pytest.fixture
+def app(criar_app):
+    app = criar_app()
+    with app.app_context():
+        db.session.add(Empresa(id_empresa=1, nome_empresa="Empresa", email="e@teste", senha="x", is_approved=True))
+        db.session.add(ONG(id_ong=1, nome_ong="ONG", email="o@teste", senha="x", is_approved=True))
+        db.session.commit()
+    return app
+
+
+def _doacao(id_doacao, status, data_criacao=ANTIGA, data_status=None, id_solicitacao=None):
+    db.session.add(Doacao(id_doacao=id_doacao, titulo=f"Doação {id_doacao}", tipo_alimento="arroz",
+                          quantidade="1 kg", data_disponibilidade=date(2026, 1, 1), id_empresa=1,
+                          status=status, data_criacao=data_criacao, data_status=data_status,
+                          id_solicitacao=id_solicitacao))
+
+
+def _ids(coluna):
+    return sorted(i for (i,) in db.session.query(coluna))
+
+
+def test_move_em_lotes_so_as_encerradas_antigas(app):
+    with app.app_context():
+        for id_doacao in range(1, 6):
+            _doacao(id_doacao, "concluida")
+        _doacao(6, "disponivel")                          # ainda no catálogo
+        _doacao(7, "concluida", data_criacao=RECENTE)     # criada há pouco
+        _doacao(8, "solicitada", data_status=RECENTE)     # antiga, mas reservada ontem
+        db.session.commit()
+
+        metricas = arquivar(idade_dias=180, tamanho_lote=2, agora=AGORA)
+
+        assert metricas["doacoes_arquivadas"] == 5
+        assert metricas["lotes"] == 3
+        assert _ids(Doacao.id_doacao) == [6, 7, 8]
+        assert _ids(DoacaoArquivada.id_doacao) == [1, 2, 3, 4, 5]
+        assert {a.arquivada_em for a in DoacaoArquivada.query} == {AGORA}
+
+        # Nada mais a mover: a segunda execução não repete nem duplica
+        assert arquivar(idade_dias=180, tamanho_lote=2, agora=AGORA)["doacoes_arquivadas"] == 0
+
+
+def test_solicitacao_so_sai_depois_das_doacoes_que_apontam_para_ela(app):
+    with app.app_context():
+        for id_solicitacao in (1, 2):
+            db.session.add(Solicitacao(id_solicitacao=id_solicitacao, titulo="Pedido", item_necessario="arroz",
+                                       quantidade_necessaria="1 kg", status="atendida", id_ong=1,
+                                       data_criacao=ANTIGA))
+        _doacao(1, "concluida", id_solicitacao=1)                          # vai junto para o arquivo
+        _doacao(2, "solicitada", data_status=RECENTE, id_solicitacao=2)    # fica: prende a solicitação 2
+        db.session.commit()
+
+        metricas = arquivar(idade_dias=180, agora=AGORA)
+
+        assert (metricas["doacoes_arquivadas"], metricas["solicitacoes_arquivadas"]) == (1, 1)
+        assert _ids(SolicitacaoArquivada.id_solicitacao) == [1]
+        assert _ids(Solicitacao.id_solicitacao) == [2]
+
+
+def test_minhas_so_traz_o_arquivo_com_historico(app):
+    with app.app_context():
+        for id_doacao in (4, 1, 3):
+            _doacao(id_doacao, "concluida")
+        _doacao(2, "disponivel")
+        _doacao(5, "disponivel")
+        db.session.commit()
+        arquivar(idade_dias=180, agora=AGORA)
+
+    cliente = app.test_client()
+    empresa = cabecalho(app, 1, "empresa")
+    quentes = cliente.get("/api/doacoes/minhas", headers=empresa).get_json()
+    todas = cliente.get("/api/doacoes/minhas?historico=1", headers=empresa).get_json()
+
+    assert [d["id_doacao"] for d in quentes] == [2, 5]
+    assert [d["id_doacao"] for d in todas] == [1, 2, 3, 4, 5]
+    # As linhas do arquivo saem no mesmo formato, com os nomes do JOIN
+    assert {d["status"] for d in todas if d["id_doacao"] in (1, 3, 4)} == {"concluida"}
+    assert {d["empresa"] for d in todas} == {"Empresa"}
@@ -0,0 +1,84 @@
+import pytest
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event
+
+from app import create_app
+from cache import invalidar_catalogo
+from extensions import db
+from models import Doacao, Empresa, ONG, Solicitacao
+
+# ------------------------------
+# NÚMERO DE CONSULTAS DAS LISTAGENS (sem N+1)
+# ------------------------------
+# As listagens serializam as doações a partir de uma única consulta com os nomes relacionados
+# via OUTER JOIN (serializers.consulta_doacoes). O número de comandos SQL de uma requisição
+# não pode crescer com o tamanho da lista.
+
+
+def _criar_app(tmp_path, total):
+    app = create_app({
+        "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / f'consultas_{total}.db'}",
+        "SQLALCHEMY_ENGINE_OPTIONS": {},
+        "SQLALCHEMY_BINDS": {},
+        "JWT_SECRET_KEY": "x" * 40,
+        "LIMITE_HABILITADO": False,
+        "NOTIFICACAO_DESTINO": "",
+    })
+    with app.app_context():
+        db.create_all()
+        db.session.add(Empresa(id_empresa=1, nome_empresa="Empresa", email="e@teste", senha="x", is_approved=True))
+        db.session.add(ONG(id_ong=1, nome_ong="ONG", email="o@teste", senha="x", is_approved=True))
+        db.session.add(Solicitacao(id_solicitacao=1, titulo="Arroz", item_necessario="arroz",
+                                   quantidade_necessaria="10 kg", status="aberta", id_ong=1))
+        # Metade reservada pela ONG e vinculada à solicitação, para passar pelos três JOINs
+        for i in range(total):
+            reservada = i % 2 == 1
+            db.session.add(Doacao(
+                titulo=f"Doação {i}", tipo_alimento="arroz", quantidade="1 kg", id_empresa=1,
+                status="solicitada" if reservada else "disponivel",
+                id_ong_recebedora=1 if reservada else None, id_solicitacao=1 if reservada else None,
+            ))
+        db.session.commit()
+    return app
+
+
+def _cabecalho(app, id_usuario, tipo):
+    with app.app_context():
+        token = create_access_token(identity={"id": id_usuario, "tipo": tipo})
+    return {"Authorization": f"Bearer {token}"}
+
+
+def _consultas(app, cliente, url, cabecalho):
+    """Comandos SQL executados por uma requisição GET (depois de aquecer caches de conta)."""
+    cliente.get(url, headers=cabecalho)
+    invalidar_catalogo()
+    comandos = []
+
+    def contar(conn, cursor, statement, parameters, context, executemany):
+        comandos.append(statement)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, "before_cursor_execute", contar)
+    try:
+        resposta = cliente.get(url, headers=cabecalho)
+    finally:
+        event.remove(engine, "before_cursor_execute", contar)
+    assert resposta.status_code == 200
+    return len(comandos), resposta.get_json()
+
+
+@pytest.mark.parametrize("url, tipo", [
+    ("/api/doacoes/minhas", "empresa"),
+    ("/api/doacoes/disponiveis?limite=200", "admin"),
+])
+def test_listagem_com_numero_constante_de_consultas(tmp_path, url, tipo):
+    totais = {}
+    for total in (1, 40):
+        app = _criar_app(tmp_path, total)
+        cliente = app.test_client()
+        comandos, corpo = _consultas(app, cliente, url, _cabecalho(app, 1, tipo))
+        doacoes = corpo if isinstance(corpo, list) else corpo["doacoes"]
+        assert doacoes, "a listagem deveria trazer doações"
+        totais[total] = comandos
+    assert totais[1] == totais[40], f"consultas crescem com a lista: {totais}"
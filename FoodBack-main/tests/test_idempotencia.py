@@ -0,0 +1,163 @@
+import hashlib
+import json
+import threading
+import time
+
+import pytest
+
+from conftest import cabecalho
+from extensions import db
+from idempotencia import CONFLITO, EM_ANDAMENTO, NOVA, PRONTA, ChavesMemoria
+from models import Credencial, Doacao, Empresa, ONG
+
+# ------------------------------
+# IDEMPOTENCY-KEY NAS ESCRITAS (idempotencia.py)
+# ------------------------------
+
+DOACAO = {"titulo": "Arroz", "tipo_alimento": "arroz", "quantidade": "5 kg", "data_disponibilidade": "2026-01-10"}
+
+
+@pytest.fixture
+def app(criar_app):
+    app = criar_app(IDEMPOTENCIA_ESPERA_S=0)
+    with app.app_context():
+        db.session.add(Empresa(id_empresa=1, nome_empresa="Empresa", email="e@teste", senha="x", is_approved=True))
+        db.session.add(Credencial(email="e@teste", tipo="empresa", id_usuario=1, senha="x", is_approved=True, versao=1))
+        for id_ong in (1, 2):
+            db.session.add(ONG(id_ong=id_ong, nome_ong=f"ONG {id_ong}", email=f"o{id_ong}@teste", senha="x",
+                               is_approved=True))
+            db.session.add(Credencial(email=f"o{id_ong}@teste", tipo="ong", id_usuario=id_ong, senha="x",
+                                      is_approved=True, versao=1))
+        db.session.commit()
+    return app
+
+
+def _empresa(app, aprovado=True):
+    return cabecalho(app, 1, "empresa", aprovado=aprovado, versao=1)
+
+
+def _com_chave(cabecalhos, chave="chave-1"):
+    return dict(cabecalhos, **{"Idempotency-Key": chave})
+
+
+def _total_doacoes(app):
+    with app.app_context():
+        return db.session.query(Doacao).count()
+
+
+def test_repeticao_devolve_a_primeira_resposta_sem_executar_de_novo(app):
+    cliente = app.test_client()
+    primeira = cliente.post("/api/doacoes/", json=DOACAO, headers=_com_chave(_empresa(app)))
+    repetida = cliente.post("/api/doacoes/", json=DOACAO, headers=_com_chave(_empresa(app)))
+
+    assert primeira.status_code == repetida.status_code == 201
+    assert repetida.headers["Idempotent-Replayed"] == "true"
+    assert repetida.get_json() == primeira.get_json()
+    assert _total_doacoes(app) == 1
+
+
+def test_mesma_chave_com_outro_corpo_e_conflito(app):
+    cliente = app.test_client()
+    cliente.post("/api/doacoes/", json=DOACAO, headers=_com_chave(_empresa(app)))
+    resposta = cliente.post("/api/doacoes/", json=dict(DOACAO, titulo="Feijão"), headers=_com_chave(_empresa(app)))
+
+    assert resposta.status_code == 422
+    assert _total_doacoes(app) == 1
+
+
+def test_erro_de_validacao_libera_a_chave(app):
+    cliente = app.test_client()
+    invalida = cliente.post("/api/doacoes/", json=dict(DOACAO, data_disponibilidade="10/01/2026"),
+                            headers=_com_chave(_empresa(app)))
+    corrigida = cliente.post("/api/doacoes/", json=DOACAO, headers=_com_chave(_empresa(app)))
+
+    assert invalida.status_code == 400
+    assert corrigida.status_code == 201
+    assert "Idempotent-Replayed" not in corrigida.headers
+
+
+def test_conta_nao_aprovada_libera_a_chave(app):
+    cliente = app.test_client()
+    recusada = cliente.post("/api/doacoes/", json=DOACAO, headers=_com_chave(_empresa(app, aprovado=False)))
+    aprovada = cliente.post("/api/doacoes/", json=DOACAO, headers=_com_chave(_empresa(app)))
+
+    assert recusada.status_code == 403
+    assert aprovada.status_code == 201
+    assert "Idempotent-Replayed" not in aprovada.headers
+
+
+def test_reserva_perdida_e_guardada(app):
+    cliente = app.test_client()
+    criada = cliente.post("/api/doacoes/", json=DOACAO, headers=_empresa(app)).get_json()["doacao"]
+    url = f"/api/solicitacoes/{criada['id_doacao']}"
+    ong_1 = cabecalho(app, 1, "ong", aprovado=True, versao=1)
+    ong_2 = cabecalho(app, 2, "ong", aprovado=True, versao=1)
+
+    assert cliente.post(url, headers=ong_2).status_code == 201
+    perdida = cliente.post(url, headers=_com_chave(ong_1))
+    repetida = cliente.post(url, headers=_com_chave(ong_1))
+
+    assert perdida.status_code == repetida.status_code == 403
+    assert repetida.headers["Idempotent-Replayed"] == "true"
+
+
+def test_repeticao_enquanto_a_primeira_executa_recebe_409(app):
+    # Outra requisição com a mesma chave e o mesmo corpo está em execução
+    usuario_chave = "empresa:1:POST:/api/doacoes/:chave-1"
+    impressao = hashlib.sha256(json.dumps(DOACAO).encode()).hexdigest()
+    app.extensions["idempotencia"].backend.reservar(usuario_chave, impressao, 60, 0)
+
+    resposta = app.test_client().post("/api/doacoes/", data=json.dumps(DOACAO), content_type="application/json",
+                                      headers=_com_chave(_empresa(app)))
+
+    assert resposta.status_code == 409
+    assert resposta.headers["Retry-After"] == "1"
+    assert _total_doacoes(app) == 0
+
+
+# ------------------------------
+# Backend em memória
+# ------------------------------
+def test_repeticao_concorrente_espera_a_primeira_terminar():
+    chaves = ChavesMemoria()
+    assert chaves.reservar("k", "corpo", em_voo_s=60, espera_s=0)[0] == NOVA
+
+    resultado = {}
+    esperando = threading.Thread(
+        target=lambda: resultado.update(r=chaves.reservar("k", "corpo", em_voo_s=60, espera_s=5)))
+    esperando.start()
+    time.sleep(0.05)
+    chaves.concluir("k", "corpo", (201, b"{}", "application/json"), ttl_s=60)
+    esperando.join(5)
+
+    assert resultado["r"] == (PRONTA, (201, b"{}", "application/json"), True)
+
+
+def test_repeticao_concorrente_desiste_no_prazo():
+    chaves = ChavesMemoria()
+    chaves.reservar("k", "corpo", em_voo_s=60, espera_s=0)
+
+    situacao, resposta, esperou = chaves.reservar("k", "corpo", em_voo_s=60, espera_s=0.05)
+
+    assert (situacao, resposta, esperou) == (EM_ANDAMENTO, None, True)
+
+
+def test_liberar_acorda_quem_espera_e_devolve_a_chave():
+    chaves = ChavesMemoria()
+    chaves.reservar("k", "corpo", em_voo_s=60, espera_s=0)
+    resultado = {}
+    esperando = threading.Thread(
+        target=lambda: resultado.update(r=chaves.reservar("k", "corpo", em_voo_s=60, espera_s=5)))
+    esperando.start()
+    time.sleep(0.05)
+    chaves.liberar("k")
+    esperando.join(5)
+
+    assert resultado["r"] == (NOVA, None, True)
+
+
+def test_chave_com_outra_impressao_e_conflito():
+    chaves = ChavesMemoria()
+    chaves.reservar("k", "corpo", em_voo_s=60, espera_s=0)
+
+    assert chaves.reservar("k", "outro corpo", em_voo_s=60, espera_s=0)[0] == CONFLITO
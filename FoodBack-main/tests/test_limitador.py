@@ -0,0 +1,91 @@
+import threading
+
+import pytest
+
+from extensions import db
+from limitador import BaldesMemoria, VagasBcrypt
+from models import Credencial, Empresa
+
+# ------------------------------
+# CONTROLE DE ADMISSÃO DO LOGIN (limitador.py)
+# ------------------------------
+
+
+@pytest.fixture
+def app(criar_app):
+    app = criar_app(LIMITE_HABILITADO=True, LIMITE_LOGIN_IP="100/60", LIMITE_LOGIN_EMAIL="3/300")
+    app.test_client().post("/api/auth/register", json={
+        "nome": "Empresa", "email": "e@teste", "senha": "certa", "tipo": "empresa", "cnpj": "1"})
+    with app.app_context():
+        db.session.get(Empresa, db.session.get(Credencial, "e@teste").id_usuario).is_approved = True
+        db.session.get(Credencial, "e@teste").is_approved = True
+        db.session.commit()
+    return app
+
+
+def _login(cliente, senha, email="e@teste"):
+    return cliente.post("/api/auth/login", json={"email": email, "senha": senha}).status_code
+
+
+def test_login_certo_nao_gasta_tentativas_do_email(app):
+    cliente = app.test_client()
+    assert [_login(cliente, "certa") for _ in range(6)] == [200] * 6
+    assert [_login(cliente, "errada") for _ in range(3)] == [401] * 3
+
+
+def test_balde_do_email_so_e_cobrado_nas_senhas_erradas(app):
+    cliente = app.test_client()
+    assert [_login(cliente, "errada") for _ in range(3)] == [401] * 3
+
+    # Sem tentativas: nem a senha certa passa até o balde encher de novo
+    resposta = cliente.post("/api/auth/login", json={"email": "e@teste", "senha": "certa"})
+    assert resposta.status_code == 429
+    assert int(resposta.headers["Retry-After"]) >= 1
+    # O balde é por email: outro email continua livre
+    assert _login(cliente, "errada", email="outro@teste") == 401
+
+
+@pytest.mark.parametrize("email", [5, 1.5, ["e@teste"]])
+def test_email_que_nao_e_texto_nao_quebra_o_limitador(app, email):
+    assert app.test_client().post("/api/auth/login", json={"email": email, "senha": "x"}).status_code == 401
+
+
+def test_sem_vaga_de_bcrypt_responde_429(app):
+    vagas = app.extensions["limitador"].vagas
+    ocupadas = 0
+    while vagas.tentar():
+        ocupadas += 1
+    try:
+        resposta = app.test_client().post("/api/auth/login", json={"email": "e@teste", "senha": "certa"})
+        assert resposta.status_code == 429
+        assert app.extensions["limitador"].rejeicoes["bcrypt"] == 1
+    finally:
+        for _ in range(ocupadas):
+            vagas.liberar()
+    assert _login(app.test_client(), "certa") == 200
+
+
+# ------------------------------
+# Peças isoladas
+# ------------------------------
+def test_balde_consultado_sem_cobrar_nao_perde_tokens():
+    baldes = BaldesMemoria()
+    for _ in range(10):
+        assert baldes.consumir("k", capacidade=1, taxa=0.001, cobrar=False)[0]
+    assert baldes.consumir("k", capacidade=1, taxa=0.001)[0]
+    permitido, espera = baldes.consumir("k", capacidade=1, taxa=0.001, cobrar=False)
+    assert not permitido and espera > 0
+
+
+def test_vagas_de_bcrypt_recusam_sem_bloquear():
+    vagas = VagasBcrypt(2)
+    assert vagas.tentar() and vagas.tentar()
+
+    resultado = []
+    concorrente = threading.Thread(target=lambda: resultado.append(vagas.tentar()))
+    concorrente.start()
+    concorrente.join(1)
+    assert resultado == [False]
+
+    vagas.liberar()
+    assert vagas.tentar()
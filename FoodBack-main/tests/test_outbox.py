@@ -0,0 +1,148 @@
+import json
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from conftest import cabecalho
+from extensions import db
+from models import Credencial, Empresa, MensagemOutbox, ONG, Solicitacao
+from outbox import RESERVA_SEGUNDOS, Entregadores
+
+# ------------------------------
+# OUTBOX E ENTREGADORES (outbox.py), com o destino "memoria"
+# ------------------------------
+# Sem threads (NOTIFICACAO_WORKERS=0): os testes drenam a fila chamando drenar_lote com o relógio
+# que quiserem, como faz `flask drenar-outbox`.
+
+AGORA = datetime(2026, 1, 10, 12, 0, 0)
+BACKOFF_S = 10
+
+
+@pytest.fixture
+def app(criar_app):
+    app = criar_app(NOTIFICACAO_DESTINO="memoria", NOTIFICACAO_WORKERS=0, NOTIFICACAO_BACKOFF_S=BACKOFF_S,
+                    NOTIFICACAO_MAX_TENTATIVAS=3)
+    with app.app_context():
+        db.session.add(Empresa(id_empresa=1, nome_empresa="Empresa", email="e@teste", senha="x", is_approved=True))
+        db.session.add(Credencial(email="e@teste", tipo="empresa", id_usuario=1, senha="x", is_approved=True, versao=1))
+        # Só a ONG 1 se interessa: a 2 quer outro tipo, a 3 não foi aprovada, a 4 já passou do prazo
+        for id_ong, aprovada, item, limite in [(1, True, "arroz", None), (2, True, "leite", None),
+                                              (3, False, "arroz", None), (4, True, "arroz", date(2020, 1, 1))]:
+            db.session.add(ONG(id_ong=id_ong, nome_ong=f"ONG {id_ong}", email=f"o{id_ong}@teste", senha="x",
+                               is_approved=aprovada))
+            db.session.add(Solicitacao(titulo="Pedido", item_necessario=item, quantidade_necessaria="1 kg",
+                                       status="aberta", data_limite=limite, id_ong=id_ong))
+        db.session.commit()
+    return app
+
+
+def _entregadores(app):
+    return app.extensions["outbox"]
+
+
+def _criar_doacao(app, tipo="arroz"):
+    resposta = app.test_client().post("/api/doacoes/", headers=cabecalho(app, 1, "empresa", aprovado=True, versao=1),
+                                      json={"titulo": "Doação", "tipo_alimento": tipo, "quantidade": "2 kg",
+                                            "data_disponibilidade": "2026-01-10"})
+    assert resposta.status_code == 201
+    return resposta.get_json()["doacao"]
+
+
+def _mensagens():
+    return MensagemOutbox.query.order_by(MensagemOutbox.id_mensagem).all()
+
+
+def test_mudanca_vira_uma_entrega_por_ong_interessada(app):
+    doacao = _criar_doacao(app)
+    entregadores = _entregadores(app)
+    with app.app_context():
+        [mensagem] = _mensagens()
+        assert mensagem.id_ong is None
+
+        assert entregadores.drenar_lote() == 1
+        assert [(m.id_ong, m.evento) for m in _mensagens()] == [(1, "criada")]
+
+        assert entregadores.drenar_lote() == 1
+        assert _mensagens() == []
+
+    [entrega] = entregadores.destino.entregues
+    assert (entrega["id_ong"], entrega["evento"]) == (1, "criada")
+    assert entrega["doacao"]["id_doacao"] == doacao["id_doacao"]
+
+
+def test_doacao_sem_ong_interessada_nao_gera_entrega(app):
+    _criar_doacao(app, tipo="feijão")
+    with app.app_context():
+        _entregadores(app).drenar()
+        assert _mensagens() == []
+    assert _entregadores(app).destino.entregues == []
+
+
+def test_falha_volta_para_a_fila_com_espera_exponencial(app):
+    entregadores = _entregadores(app)
+    with app.app_context():
+        db.session.add(MensagemOutbox(evento="criada", id_ong=1, payload=json.dumps({"id_doacao": 7}),
+                                      proxima_tentativa=AGORA))
+        db.session.commit()
+        entregadores.destino.falhar(2)
+
+        esperas = []
+        momento = AGORA
+        for tentativa in (1, 2):
+            assert entregadores.drenar_lote(momento) == 1
+            [mensagem] = _mensagens()
+            assert mensagem.tentativas == tentativa
+            assert mensagem.status == "pendente"
+            assert mensagem.dono is None and mensagem.reservada_ate is None
+            assert mensagem.ultimo_erro == "RuntimeError: falha simulada"
+            esperas.append((mensagem.proxima_tentativa - momento).total_seconds())
+            # Antes da hora marcada ninguém pega a mensagem
+            assert entregadores.drenar_lote(mensagem.proxima_tentativa - timedelta(seconds=1)) == 0
+            momento = mensagem.proxima_tentativa
+
+        assert entregadores.drenar_lote(momento) == 1
+        assert _mensagens() == []
+
+    # Espera base dobra a cada falha, com jitter entre 50% e 100%
+    assert BACKOFF_S * 0.5 <= esperas[0] <= BACKOFF_S
+    assert BACKOFF_S <= esperas[1] <= 2 * BACKOFF_S
+    assert [e["id_ong"] for e in entregadores.destino.entregues] == [1]
+
+
+def test_mensagem_morre_depois_do_maximo_de_tentativas(app):
+    entregadores = _entregadores(app)
+    with app.app_context():
+        db.session.add(MensagemOutbox(evento="criada", id_ong=1, payload="{}", proxima_tentativa=AGORA))
+        db.session.commit()
+        entregadores.destino.falhar(100)
+
+        momento = AGORA
+        for _ in range(3):
+            assert entregadores.drenar_lote(momento) == 1
+            momento = _mensagens()[0].proxima_tentativa
+
+        [mensagem] = _mensagens()
+        assert (mensagem.status, mensagem.tentativas) == ("morta", 3)
+        # Mortas ficam para inspeção e não são mais tentadas
+        assert entregadores.drenar_lote(momento + timedelta(days=1)) == 0
+
+    assert entregadores.estatisticas()["mortas"] == 1
+    assert entregadores.destino.entregues == []
+
+
+def test_reserva_impede_outro_entregador_ate_vencer(app):
+    primeiro = _entregadores(app)
+    segundo = Entregadores(app, primeiro.destino)
+    with app.app_context():
+        db.session.add(MensagemOutbox(evento="criada", id_ong=1, payload="{}", proxima_tentativa=AGORA))
+        db.session.commit()
+
+        [reservada] = primeiro._reservar(AGORA)
+        id_mensagem, dono = reservada.id_mensagem, reservada.dono
+        assert dono is not None
+        assert segundo._reservar(AGORA + timedelta(seconds=RESERVA_SEGUNDOS - 1)) == []
+
+        # O primeiro morreu sem concluir: vencida a reserva, a mensagem volta para a fila
+        [retomada] = segundo._reservar(AGORA + timedelta(seconds=RESERVA_SEGUNDOS + 1))
+        assert retomada.id_mensagem == id_mensagem
+        assert retomada.dono != dono
@@ -0,0 +1,26 @@
+from decimal import Decimal
+
+import pytest
+
+from quantidades import interpretar_quantidade
+
+
+@pytest.mark.parametrize("texto, esperado", [
+    ("2,5 kg", (Decimal("2.5"), "kg")),
+    ("2.5 kg", (Decimal("2.5"), "kg")),
+    ("500g", (Decimal("0.500"), "kg")),
+    ("3 litros de leite", (Decimal("3"), "l")),
+    ("12", (Decimal("12"), "un")),
+    ("1.500,5 kg", (Decimal("1500.5"), "kg")),
+    ("1.000 kg", (Decimal("1000"), "kg")),
+    ("1.000", (Decimal("1000"), "un")),
+    ("2.000.000 g", (Decimal("2000.000"), "kg")),
+    ("1.5000 kg", (Decimal("1.5000"), "kg")),
+])
+def test_interpreta_numeros_pt_br(texto, esperado):
+    assert interpretar_quantidade(texto) == esperado
+
+
+@pytest.mark.parametrize("texto", [None, "", "kg", "muito", "10x5", "1,5,3 kg", "1.500,5,2 kg", "2kg5"])
+def test_rejeita_texto_que_nao_e_quantidade(texto):
+    assert interpretar_quantidade(texto) == (None, None)
@@ -0,0 +1,18 @@
+import unicodedata
+
+# ------------------------------
+# NORMALIZAÇÃO DE TEXTO (comparação sem acento e sem maiúsculas)
+# ------------------------------
+
+
+def remover_acentos(texto):
+    """'Pão de Açúcar' -> 'Pao de Acucar'."""
+    decomposto = unicodedata.normalize('NFKD', texto)
+    return ''.join(c for c in decomposto if not unicodedata.combining(c))
+
+
+def normalizar(texto):
+    """Chave de comparação: sem acentos, minúscula e sem espaços nas pontas ('' para None)."""
+    if not texto:
+        return ''
+    return remover_acentos(texto).casefold().strip()
@@ -0,0 +1,34 @@
+import os
+import sys
+import argparse
+import json
+import time
+
+# Adiciona o diretório raiz do projeto (onde está o app.py) ao caminho de importação do Python.
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import create_app
+from expiracao import varrer_expirados, VARREDURA_LOTE_PADRAO
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Expira doações e solicitações vencidas.")
+    parser.add_argument("--lote", type=int, default=VARREDURA_LOTE_PADRAO, help="linhas por transação")
+    parser.add_argument("--intervalo", type=int, default=0,
+                        help="se > 0, repete a varredura a cada N segundos até ser interrompido")
+    args = parser.parse_args()
+
+    # Sem blueprints e sem o varredor em thread: este processo já é a varredura
+    app = create_app({"VARREDOR_INTERVALO": 0}, com_rotas=False)
+
+    while True:
+        with app.app_context():
+            metricas = varrer_expirados(args.lote)
+        print(json.dumps(metricas))
+        if args.intervalo <= 0:
+            break
+        time.sleep(args.intervalo)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,11 @@
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import create_app
+
+# Ponto de entrada WSGI para produção, por exemplo:
+#   gunicorn --preload -w 4 -b 0.0.0.0:5000 wsgi:app
+# Com --preload o app é montado uma vez no mestre e os workers herdam tudo já importado
+# (as conexões de banco são refeitas em cada worker depois do fork; ver app.py).
+app = create_app()